@@ -0,0 +1,146 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Benchmarks of the extraction of animation curves to NumPy archives.
+
+"""
+import os
+import shutil
+import tempfile
+
+import pyfbsdk
+
+from tk_motionbuilder import anim_curves, fbx_file
+
+from bench_publish import _load_hook
+from fixtures import BenchItem, BenchSetting, reset_session
+
+
+def _extract_per_key(path):
+    """
+    Extracts the curves decoding and converting every key in python, for
+    comparison with anim_curves.extract_curves().
+    """
+    import numpy
+
+    data = open(path, "rb").read()
+    (times, values, left_tangents, right_tangents) = ([], [], [], [])
+    for node in fbx_file.iter_nodes(data):
+        if node.name != "Objects":
+            continue
+        for curve in node.children():
+            if curve.name != "AnimationCurve":
+                continue
+            arrays = dict((child.name, child.properties[0]) for child in curve.children())
+            attribute_index = 0
+            remaining = arrays["KeyAttrRefCount"][0]
+            previous_left = None
+            for (key_time, key_value) in zip(arrays["KeyTime"], arrays["KeyValueFloat"]):
+                if remaining == 0:
+                    attribute_index += 1
+                    remaining = arrays["KeyAttrRefCount"][attribute_index]
+                remaining -= 1
+                attribute = arrays["KeyAttrDataFloat"][attribute_index * 4:attribute_index * 4 + 4]
+                times.append(key_time / float(fbx_file.TICKS_PER_SECOND))
+                values.append(key_value)
+                right_tangents.append(attribute[0])
+                left_tangents.append(attribute[0] if previous_left is None else previous_left)
+                previous_left = attribute[1]
+    return (numpy.array(times), numpy.array(values, dtype=numpy.float32),
+            numpy.array(left_tangents, dtype=numpy.float32),
+            numpy.array(right_tangents, dtype=numpy.float32))
+
+
+def _read_channel(path, mmap_mode):
+    """
+    Loads an archive and sums the values of its last channel.
+    """
+    curves = anim_curves.load_archive(path, mmap_mode)
+    offsets = curves["channel_offsets"]
+    return float(curves["values"][offsets[-2]:offsets[-1]].sum())
+
+
+def run(runner, num_joints=50, num_keys=2000):
+    """
+    :param runner: Runner the benchmarks are measured with
+    :param num_joints: Number of joints of the skeleton, each having 6 curves
+    :param num_keys: Number of keys of every curve
+    """
+    if not anim_curves.is_available():
+        print "anim_curves benchmarks skipped, NumPy can't be imported"
+        return
+
+    publish_curves = _load_hook("publish_curves.py")
+    label = "%d joints, %d keys" % (num_joints, num_keys)
+
+    folder = tempfile.mkdtemp(prefix="tk-motionbuilder-bench-")
+    try:
+        reset_session()
+        pyfbsdk.FBApplication.animation = (num_joints, num_keys)
+        path = os.path.join(folder, "scene.v001.fbx")
+        pyfbsdk.FBApplication().FileSave(path)
+
+        expected_keys = num_joints * 6 * num_keys
+        curves = anim_curves.extract_curves(path)
+        if len(curves["values"]) != expected_keys:
+            raise AssertionError("extracted %d keys" % (len(curves["values"]),))
+        per_key_values = _extract_per_key(path)[1]
+        if sorted(per_key_values) != sorted(curves["values"]):
+            raise AssertionError("per key and vectorized extractions differ")
+        if len(curves["unkeyed_characters"]):
+            raise AssertionError("keyed character reported as unkeyed")
+
+        # the skeleton is only keyed in the first take
+        pyfbsdk.FBApplication.takes = [("Take 001", 0, 100), ("Take 002", 0, 100)]
+        takes_path = os.path.join(folder, "takes.v001.fbx")
+        pyfbsdk.FBApplication().FileSave(takes_path)
+        unkeyed_characters = anim_curves.extract_curves(
+            takes_path, take_name="Take 002")["unkeyed_characters"]
+        if list(unkeyed_characters) != ["Character1"]:
+            raise AssertionError("unkeyed characters %s" % (list(unkeyed_characters),))
+        pyfbsdk.FBApplication().FileOpen(path)
+
+        runner.measure(
+            "anim_curves.extract_per_key[%s]" % (label,),
+            lambda: _extract_per_key(path),
+        )
+        runner.measure(
+            "anim_curves.extract[%s]" % (label,),
+            lambda: anim_curves.extract_curves(path),
+        )
+
+        for compress in (False, True):
+            def setup():
+                session_item = BenchItem()
+                item = BenchItem(session_item)
+                plugin = publish_curves.MotionBuilderCurvesPublishPlugin()
+                settings = {"Compress": BenchSetting(compress)}
+                plugin.validate(settings, item)
+                return (plugin, settings, item)
+
+            runner.measure(
+                "publish.publish_curves[%s, %s]"
+                % (label, "compressed" if compress else "stored"),
+                lambda state: state[0].publish(state[1], state[2]),
+                setup=setup,
+            )
+
+        for (compress, mmap_mode) in ((False, "r"), (False, None), (True, None)):
+            archive_path = os.path.join(folder, "curves_%d.npz" % (compress,))
+            anim_curves.write_archive(curves, archive_path, compress)
+            runner.measure(
+                "anim_curves.load_archive[%s, %s, %s]" % (
+                    label, "compressed" if compress else "stored", "mmap" if mmap_mode else "read"),
+                lambda: _read_channel(archive_path, mmap_mode),
+            )
+    finally:
+        reset_session()
+        shutil.rmtree(folder, ignore_errors=True)
@@ -0,0 +1,83 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Benchmarks of context switches going through the file open callback.
+
+"""
+import os
+
+import pyfbsdk
+import tank
+import tk_motionbuilder
+from tk_motionbuilder import MenuGenerator
+
+from fixtures import BenchContext, BenchEngine, reset_session
+
+# module level name, not mangled
+_engine_refresh = getattr(tk_motionbuilder, "__engine_refresh")
+
+
+def _start_session(num_commands, context_change_allowed, window=0):
+    os.environ["TANK_MOTIONBUILDER_CONTEXT_CHANGE_WINDOW"] = str(window)
+    reset_session()
+
+    def start_engine(engine_name, tk, context):
+        engine = BenchEngine(
+            context,
+            num_commands,
+            menu_generator_class=MenuGenerator,
+            context_change_allowed=context_change_allowed
+        )
+        engine.post_app_init()
+        return engine
+
+    tank.platform.set_engine_factory(start_engine)
+    tank.platform.start_engine("tk-motionbuilder", None, BenchContext("shot_000"))
+
+
+def _switch_contexts(num_switches):
+    for index in range(num_switches):
+        _engine_refresh(None, BenchContext("shot_%03d" % (index + 1)))
+
+
+def _open_burst(num_switches, window):
+    _switch_contexts(num_switches)
+    # let the coalescing window elapse
+    pyfbsdk.idle(window / 1000.0)
+    stats = tk_motionbuilder.get_engine_refresh_stats()
+    assert stats["run"] == 1, stats
+
+
+def run(runner, sizes, num_switches=20):
+    """
+    :param runner: Runner the benchmarks are measured with
+    :param sizes: Numbers of registered commands to benchmark with
+    :param num_switches: Number of context switches per run
+    """
+    for size in sizes:
+        runner.measure(
+            "context_switch.engine_refresh[%d commands, x%d]" % (size, num_switches),
+            lambda state: _switch_contexts(num_switches),
+            setup=lambda: _start_session(size, False),
+            switches=num_switches,
+        )
+        runner.measure(
+            "context_switch.engine_refresh_in_place[%d commands, x%d]" % (size, num_switches),
+            lambda state: _switch_contexts(num_switches),
+            setup=lambda: _start_session(size, True),
+            switches=num_switches,
+        )
+        runner.measure(
+            "context_switch.engine_refresh_burst[%d commands, x%d]" % (size, num_switches),
+            lambda state: _open_burst(num_switches, 50),
+            setup=lambda: _start_session(size, False, window=50),
+            switches=num_switches,
+        )
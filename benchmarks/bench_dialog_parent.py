@@ -0,0 +1,68 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Benchmarks of looking up the parent of the dialogs apps show.
+
+"""
+from PySide import QtGui
+from tk_motionbuilder import get_main_window
+
+from fixtures import reset_session
+
+
+def _open_session(num_tool_windows):
+    """
+    Opens a session where the main window comes after a number of floating
+    tool windows, and looks it up once.
+    """
+    reset_session()
+    QtGui.TOP_LEVEL_WIDGETS[:] = [
+        QtGui.QDialog("Tool %d" % index) for index in range(num_tool_windows)]
+    main_window = QtGui.QWidget("MotionBuilder")
+    QtGui.TOP_LEVEL_WIDGETS.append(main_window)
+    get_main_window()
+    return main_window
+
+
+def _show_dialogs(main_window, num_dialogs):
+    for index in range(num_dialogs):
+        if get_main_window() is not main_window:
+            raise AssertionError("wrong dialog parent")
+
+
+def _replace_main_window(main_window):
+    """
+    Deletes the cached main window and checks the next lookup finds its
+    replacement.
+    """
+    main_window.deleteLater()
+    replacement = QtGui.QWidget("MotionBuilder")
+    QtGui.TOP_LEVEL_WIDGETS.append(replacement)
+    if get_main_window() is not replacement:
+        raise AssertionError("destroyed main window returned")
+
+
+def run(runner, num_tool_windows=200, num_dialogs=100):
+    """
+    :param runner: Runner the benchmarks are measured with
+    :param num_tool_windows: Number of floating windows open in the session
+    :param num_dialogs: Number of dialogs shown per run
+    """
+    runner.measure(
+        "dialog_parent.lookup[%d windows, x%d]" % (num_tool_windows, num_dialogs),
+        lambda main_window: _show_dialogs(main_window, num_dialogs),
+        setup=lambda: _open_session(num_tool_windows),
+    )
+    runner.measure(
+        "dialog_parent.main_window_destroyed[%d windows]" % num_tool_windows,
+        _replace_main_window,
+        setup=lambda: _open_session(num_tool_windows),
+    )
@@ -0,0 +1,81 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Benchmarks of the reading of saved FBX files, without loading them.
+
+"""
+import os
+import shutil
+import tempfile
+
+import pyfbsdk
+
+from tk_motionbuilder import fbx_file
+
+from fixtures import reset_session
+
+
+def _save_scene(path, size, num_takes):
+    """
+    Saves a scene of about the given size in bytes holding the given number
+    of takes.
+    """
+    reset_session()
+    pyfbsdk.FBApplication.save_size = size
+    pyfbsdk.FBApplication.takes = [
+        ("Take %03d" % index, index * 10, index * 10 + 100) for index in range(num_takes)
+    ]
+    pyfbsdk.FBApplication().FileSave(path)
+
+
+def _read_metadata(paths, num_takes):
+    for path in paths:
+        metadata = fbx_file.read_metadata(path, include_thumbnail=True)
+        if len(metadata["takes"]) != num_takes or metadata["thumbnail"] is None:
+            raise AssertionError("incomplete metadata read from %s" % (path,))
+
+
+def run(runner, file_sizes=(64, 512), num_files=1000, num_takes=20):
+    """
+    :param runner: Runner the benchmarks are measured with
+    :param file_sizes: Sizes of the single large files read, in MB
+    :param num_files: Number of small files read in a row
+    :param num_takes: Number of takes held by every file
+    """
+    folder = tempfile.mkdtemp(prefix="tk-motionbuilder-bench-")
+    try:
+        for size_mb in file_sizes:
+            path = os.path.join(folder, "scene_%dmb.fbx" % size_mb)
+            _save_scene(path, size_mb * 1024 * 1024, num_takes)
+
+            runner.measure(
+                "fbx_file.read_metadata[%d MB]" % size_mb,
+                lambda: _read_metadata([path], num_takes),
+            )
+            # reads the whole file, for comparison
+            runner.measure(
+                "fbx_file.content_hash[%d MB]" % size_mb,
+                lambda: fbx_file.content_hash(path),
+            )
+            os.remove(path)
+
+        paths = []
+        for index in range(num_files):
+            paths.append(os.path.join(folder, "shot_%04d.fbx" % index))
+            _save_scene(paths[-1], 256 * 1024, num_takes)
+
+        runner.measure(
+            "fbx_file.read_metadata[%d files]" % num_files,
+            lambda: _read_metadata(paths, num_takes),
+        )
+    finally:
+        reset_session()
+        shutil.rmtree(folder, ignore_errors=True)
@@ -0,0 +1,121 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Benchmarks of building and removing the Shotgun menu.
+
+"""
+import pyfbsdk
+from sgtk.platform import qt
+from tk_motionbuilder import MenuGenerator
+from tk_motionbuilder.menu_model import iter_applied
+from tk_motionbuilder.menu_generation import _get_menu_state
+
+from fixtures import BenchContext, BenchEngine, reset_session
+
+
+def _create_generator(num_commands, num_favourites=0):
+    reset_session()
+    engine = BenchEngine(BenchContext("shot_010"), num_commands, num_favourites=num_favourites)
+    return MenuGenerator(engine, "Shotgun")
+
+
+def _create_menu(num_commands):
+    generator = _create_generator(num_commands)
+    generator.create_menu()
+    return generator
+
+
+def _create_twin_menu(num_commands):
+    """
+    Builds a menu where every command has a twin whose label only differs by
+    an accent. Labels are stripped of unicode, so both end up with the same
+    caption in the menu.
+
+    :returns: Tuple of the clicks to simulate, the commands run so far and
+        the command every click should run
+    """
+    reset_session()
+    engine = BenchEngine(BenchContext("shot_010"), num_commands)
+    executed = []
+    for (cmd_name, cmd_details) in engine.commands.items():
+        twin_name = cmd_name + u"\u0301"
+        engine.commands[twin_name] = {
+            "properties": cmd_details["properties"],
+            "callback": lambda name=twin_name: executed.append(name),
+        }
+        cmd_details["callback"] = lambda name=cmd_name: executed.append(name)
+
+    MenuGenerator(engine, "Shotgun").create_menu()
+
+    clicks = []
+    expected = []
+    for node in iter_applied(_get_menu_state("Shotgun")["applied"]):
+        if node.command in engine.commands:
+            clicks.append(pyfbsdk.FBEventMenu(node.item_id, node.label))
+            expected.append(node.command)
+    return (clicks, executed, expected)
+
+
+def _click_all(data):
+    """
+    Clicks every command of the menu and checks each one ran its own callback.
+    """
+    (clicks, executed, expected) = data
+    sg_menu = pyfbsdk.FBMenuManager().GetMenu("Shotgun")
+    for event in clicks:
+        sg_menu.OnMenuActivate.fire(sg_menu, event)
+    qt.process_events()
+    if executed != expected:
+        raise AssertionError("menu events dispatched to the wrong commands")
+
+
+def _click_one(data):
+    """
+    Clicks a single command and waits for it to run.
+    """
+    (clicks, executed, expected) = data
+    sg_menu = pyfbsdk.FBMenuManager().GetMenu("Shotgun")
+    sg_menu.OnMenuActivate.fire(sg_menu, clicks[0])
+    qt.process_events()
+    if executed != expected[:1]:
+        raise AssertionError("menu event dispatched to the wrong command")
+
+
+def run(runner, sizes):
+    """
+    :param runner: Runner the benchmarks are measured with
+    :param sizes: Numbers of registered commands to benchmark with
+    """
+    runner.measure("menu.click_to_execute", _click_one, setup=lambda: _create_twin_menu(10))
+
+    for size in sizes:
+        runner.measure(
+            "menu.create_menu[%d commands]" % size,
+            lambda generator: generator.create_menu(),
+            setup=lambda: _create_generator(size),
+        )
+
+    for size in sizes:
+        runner.measure(
+            "menu.create_menu[%d commands, %d favourites]" % (size, size // 10),
+            lambda generator: generator.create_menu(),
+            setup=lambda: _create_generator(size, size // 10),
+        )
+        runner.measure(
+            "menu.destroy_menu[%d commands]" % size,
+            lambda generator: generator.destroy_menu(),
+            setup=lambda: _create_menu(size),
+        )
+        runner.measure(
+            "menu.dispatch[%d commands, same labels]" % (size * 2),
+            _click_all,
+            setup=lambda: _create_twin_menu(size),
+        )
@@ -0,0 +1,266 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Benchmarks of the validation of the publish hooks.
+
+"""
+import os
+import imp
+import time
+import shutil
+import tempfile
+
+import tank
+import pyfbsdk
+
+from fixtures import BenchItem, BenchPublishPlugin, BenchSetting, BenchTemplate, reset_session
+
+HOOKS_FOLDER = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), os.pardir, "hooks", "tk-multi-publish2", "basic")
+
+
+def _load_hook(file_name):
+    """
+    Loads a publish hook on top of the base plugin stand-in.
+    """
+    tank.hook_baseclass = BenchPublishPlugin
+    module_name = "bench_hook_%s" % os.path.splitext(file_name)[0]
+    return imp.load_source(module_name, os.path.join(HOOKS_FOLDER, file_name))
+
+
+class _StorageLatency(object):
+    """
+    Counts the file system calls the hooks make, as pyfbsdk calls, and delays
+    each one to mimic network storage.
+    """
+
+    FUNCTIONS = ((os.path, "exists"), (os.path, "isfile"), (os, "listdir"), (os, "stat"))
+
+    def __init__(self):
+        self.latency = 0.0
+        self._originals = []
+
+    def install(self):
+        for (module, name) in self.FUNCTIONS:
+            original = getattr(module, name)
+            self._originals.append((module, name, original))
+            setattr(module, name, self._wrap("%s.%s" % (module.__name__, name), original))
+
+    def uninstall(self):
+        for (module, name, original) in self._originals:
+            setattr(module, name, original)
+        self._originals = []
+
+    def _wrap(self, call_name, original):
+        def wrapper(*args, **kwargs):
+            pyfbsdk._count(call_name)
+            if self.latency:
+                time.sleep(self.latency)
+            return original(*args, **kwargs)
+        return wrapper
+
+
+def _create_work_area(folder, num_versions):
+    """
+    Creates scene.v001.fbx up to the given version, returns the first one.
+    """
+    for version in range(1, num_versions + 1):
+        open(os.path.join(folder, "scene.v%03d.fbx" % version), "w").close()
+    return os.path.join(folder, "scene.v001.fbx")
+
+
+def _validate(plugin, item):
+    try:
+        plugin.validate({"Publish Template": BenchSetting(None)}, item)
+    except Exception:
+        # validation failing is the expected outcome when versions exist
+        pass
+
+
+def _publish_session(plugin, save_once):
+    """
+    Publishes the session and versions it up, as the publisher does.
+    """
+    settings = {"Publish Template": BenchSetting(None), "Save Once": BenchSetting(save_once)}
+    item = BenchItem()
+    plugin.validate(settings, item)
+    plugin.publish(settings, item)
+    plugin.finalize(settings, item)
+
+
+def _publish_to_template(plugin, buffer_size, deduplicate=False):
+    """
+    Publishes the session to a publish template, copying the saved file.
+    """
+    settings = {
+        "Publish Template": BenchSetting("publish_template"),
+        "Copy Buffer Size": BenchSetting(buffer_size),
+        "Checksum Field": BenchSetting("sg_checksum"),
+        "Deduplicate Publishes": BenchSetting(deduplicate),
+    }
+    item = BenchItem()
+    item.properties["work_template"] = BenchTemplate(None)
+    plugin.validate(settings, item)
+    plugin.publish(settings, item)
+    if not item.properties["publish_kwargs"]["sg_fields"]["sg_checksum"]:
+        raise AssertionError("checksum not published")
+
+
+def _republish(plugin, changed):
+    """
+    Publishes the next version of a session that was published before,
+    checking whether it was deduplicated.
+    """
+    if changed:
+        pyfbsdk.FBApplication.scene_revision += 1
+    _publish_to_template(plugin, 16, deduplicate=True)
+    publish_path = plugin.parent.engine.templates["publish_template"].path
+    linked = os.stat(publish_path).st_nlink > 1
+    if linked == changed:
+        raise AssertionError("%s session %s" % (
+            "changed" if changed else "unchanged", "linked" if linked else "copied"))
+
+
+def _start_version_control(plugin, save_once):
+    plugin.publish({"Save Once": BenchSetting(save_once)}, BenchItem())
+
+
+def run(runner, version_counts=(1, 100, 500), network_latency=0.001):
+    """
+    :param runner: Runner the benchmarks are measured with
+    :param version_counts: Numbers of existing versions in the work area
+    :param network_latency: Delay of every file system call in the network
+        storage configurations, in seconds
+    """
+    publish_session = _load_hook("publish_session.py")
+    start_version_control = _load_hook("start_version_control.py")
+
+    storage = _StorageLatency()
+    folder = tempfile.mkdtemp(prefix="tk-motionbuilder-bench-")
+    storage.install()
+    try:
+        for num_versions in version_counts:
+            work_area = os.path.join(folder, "versions_%d" % num_versions)
+            os.makedirs(work_area)
+            path = _create_work_area(work_area, num_versions)
+
+            def setup():
+                reset_session()
+                pyfbsdk.FBApplication._fbx_file_name = path
+                return publish_session.MotionBuilderSessionPublishPlugin()
+
+            runner.measure(
+                "publish.publish_session.validate[%d versions]" % num_versions,
+                lambda plugin: _validate(plugin, BenchItem()),
+                setup=setup,
+            )
+
+            storage.latency = network_latency
+            runner.measure(
+                "publish.publish_session.validate[%d versions, %g ms storage]"
+                % (num_versions, network_latency * 1000.0),
+                lambda plugin: _validate(plugin, BenchItem()),
+                setup=setup,
+            )
+            storage.latency = 0.0
+
+        unversioned_path = os.path.join(folder, "scene.fbx")
+        open(unversioned_path, "w").close()
+
+        def setup():
+            reset_session()
+            pyfbsdk.FBApplication._fbx_file_name = unversioned_path
+            return start_version_control.MotionBuilderStartVersionControlPlugin()
+
+        runner.measure(
+            "publish.start_version_control.validate",
+            lambda plugin: _validate(plugin, BenchItem()),
+            setup=setup,
+        )
+
+        # publishing a scene saved to a size_mb file
+        size_mb = 64
+
+        for buffer_size in (1, 16):
+            def setup():
+                work_area = tempfile.mkdtemp(dir=folder)
+                reset_session()
+                pyfbsdk.FBApplication.save_size = size_mb * 1024 * 1024
+                pyfbsdk.FBApplication._fbx_file_name = os.path.join(work_area, "scene.v001.fbx")
+                plugin = publish_session.MotionBuilderSessionPublishPlugin()
+                plugin.parent.engine.templates["publish_template"] = BenchTemplate(
+                    os.path.join(work_area, "publish", "scene.v001.fbx"))
+                return plugin
+
+            runner.measure(
+                "publish.publish_session.publish_to_template[%d MB, %d MB buffer]"
+                % (size_mb, buffer_size),
+                lambda plugin: _publish_to_template(plugin, buffer_size),
+                setup=setup,
+                size_mb=size_mb,
+            )
+        for changed in (True, False):
+            def setup():
+                work_area = tempfile.mkdtemp(dir=folder)
+                reset_session()
+                pyfbsdk.FBApplication.save_size = size_mb * 1024 * 1024
+                plugin = publish_session.MotionBuilderSessionPublishPlugin()
+                plugin.parent.cache_location = os.path.join(work_area, "cache")
+                templates = plugin.parent.engine.templates
+
+                # publish version 1, then move on to version 2
+                pyfbsdk.FBApplication._fbx_file_name = os.path.join(work_area, "scene.v001.fbx")
+                templates["publish_template"] = BenchTemplate(
+                    os.path.join(work_area, "publish", "scene.v001.fbx"))
+                _publish_to_template(plugin, 16, deduplicate=True)
+                pyfbsdk.FBApplication._fbx_file_name = os.path.join(work_area, "scene.v002.fbx")
+                templates["publish_template"] = BenchTemplate(
+                    os.path.join(work_area, "publish", "scene.v002.fbx"))
+                return plugin
+
+            runner.measure(
+                "publish.publish_session.republish[%d MB, %s]"
+                % (size_mb, "changed" if changed else "unchanged"),
+                lambda plugin: _republish(plugin, changed),
+                setup=setup,
+            )
+
+        for save_once in (False, True):
+            mode = "save once" if save_once else "save twice"
+
+            def setup():
+                work_area = tempfile.mkdtemp(dir=folder)
+                reset_session()
+                pyfbsdk.FBApplication.save_size = size_mb * 1024 * 1024
+                pyfbsdk.FBApplication._fbx_file_name = os.path.join(work_area, "scene.v001.fbx")
+                return publish_session.MotionBuilderSessionPublishPlugin()
+
+            runner.measure(
+                "publish.publish_session.publish_finalize[%d MB, %s]" % (size_mb, mode),
+                lambda plugin: _publish_session(plugin, save_once),
+                setup=setup,
+            )
+
+            def setup():
+                work_area = tempfile.mkdtemp(dir=folder)
+                reset_session()
+                pyfbsdk.FBApplication.save_size = size_mb * 1024 * 1024
+                pyfbsdk.FBApplication._fbx_file_name = os.path.join(work_area, "scene.fbx")
+                return start_version_control.MotionBuilderStartVersionControlPlugin()
+
+            runner.measure(
+                "publish.start_version_control.publish[%d MB, %s]" % (size_mb, mode),
+                lambda plugin: _start_version_control(plugin, save_once),
+                setup=setup,
+            )
+    finally:
+        storage.uninstall()
+        shutil.rmtree(folder)
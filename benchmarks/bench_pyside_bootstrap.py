@@ -0,0 +1,54 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Benchmarks of the PySide setup run on every engine start.
+
+"""
+import os
+import sys
+
+from tk_motionbuilder import add_pyside_paths
+
+from fixtures import reset_session
+
+_PYSIDE_ROOT = os.path.join("install", "engines", "tk-motionbuilder", "resources", "pyside")
+
+
+def _start_session():
+    reset_session()
+    return (list(sys.path), os.environ.get("PATH", ""))
+
+
+def _restart(saved, num_restarts):
+    (saved_sys_path, saved_env_path) = saved
+    try:
+        for index in range(num_restarts):
+            add_pyside_paths(os.path.join(_PYSIDE_ROOT, "python"), os.path.join(_PYSIDE_ROOT, "lib"))
+        if len(sys.path) != len(saved_sys_path) + 1:
+            raise AssertionError("sys.path grew by %d entries"
+                                 % (len(sys.path) - len(saved_sys_path)))
+        if len(os.environ["PATH"]) > len(saved_env_path) + len(_PYSIDE_ROOT) + 10:
+            raise AssertionError("PATH grew on every restart")
+    finally:
+        sys.path[:] = saved_sys_path
+        os.environ["PATH"] = saved_env_path
+
+
+def run(runner, num_restarts=1000):
+    """
+    :param runner: Runner the benchmarks are measured with
+    :param num_restarts: Number of engine starts simulated
+    """
+    runner.measure(
+        "pyside_bootstrap.add_paths[x%d]" % num_restarts,
+        lambda saved: _restart(saved, num_restarts),
+        setup=_start_session,
+    )
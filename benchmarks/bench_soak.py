@@ -0,0 +1,95 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Soak test restarting the engine many times in a row, checking that event
+handlers and the objects they keep alive don't accumulate.
+
+"""
+import gc
+import os
+
+import pyfbsdk
+import tank
+import tk_motionbuilder
+from tk_motionbuilder import MenuGenerator
+
+from fixtures import BenchContext, BenchEngine, reset_session
+
+# module level name, not mangled
+_engine_refresh = getattr(tk_motionbuilder, "__engine_refresh")
+
+# every that many restarts, the engine fails to start and the "disabled"
+# menu is shown instead
+_DISABLED_EVERY = 10
+
+_TRACKED_TYPES = (BenchEngine, MenuGenerator, pyfbsdk.FBGenericMenu)
+
+
+def _start_session(num_commands, num_restarts):
+    os.environ["TANK_MOTIONBUILDER_CONTEXT_CHANGE_WINDOW"] = "0"
+    reset_session()
+
+    def start_engine(engine_name, tk, context):
+        if context.name.endswith("0"):
+            raise tank.TankEngineInitError("No engine for %s" % context.name)
+        engine = BenchEngine(context, num_commands, menu_generator_class=MenuGenerator)
+        engine.post_app_init()
+        return engine
+
+    tank.platform.set_engine_factory(start_engine)
+    tank.platform.start_engine("tk-motionbuilder", None, BenchContext("shot_1"))
+    return num_restarts
+
+
+def _count_live_objects():
+    """
+    Returns the number of bound event handlers and of live engine, menu
+    generator and menu objects.
+    """
+    gc.collect()
+    handlers = 0
+    retained = 0
+    for obj in gc.get_objects():
+        if isinstance(obj, pyfbsdk.FBEvent):
+            handlers += len(obj.handlers)
+        elif isinstance(obj, _TRACKED_TYPES):
+            retained += 1
+    return (handlers, retained)
+
+
+def _restart(num_restarts):
+    # the first cycle of restarts warms up whatever is created once
+    for index in range(_DISABLED_EVERY):
+        _engine_refresh(None, BenchContext("shot_%d" % (index + 2)))
+    baseline = _count_live_objects()
+
+    for index in range(num_restarts):
+        _engine_refresh(None, BenchContext("shot_%d" % (index + _DISABLED_EVERY + 2)))
+
+    current = _count_live_objects()
+    if current != baseline:
+        raise AssertionError(
+            "handlers and retained objects went from %s to %s after %d restarts"
+            % (baseline, current, num_restarts))
+
+
+def run(runner, num_restarts=1000):
+    """
+    :param runner: Runner the benchmarks are measured with
+    :param num_restarts: Number of engine restarts
+    """
+    runner.measure(
+        "soak.engine_restart[10 commands, x%d]" % num_restarts,
+        _restart,
+        setup=lambda: _start_session(10, num_restarts),
+        repeat=1,
+        restarts=num_restarts,
+    )
@@ -0,0 +1,96 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Benchmarks of the export of takes to their own files by worker processes.
+
+"""
+import os
+import shutil
+import tempfile
+
+import pyfbsdk
+
+from tk_motionbuilder import fbx_file
+
+from bench_publish import _load_hook
+from fixtures import BenchItem, BenchSetting, BenchTakeExporter, reset_session
+
+
+def _publish_takes(state):
+    """
+    Validates every take item, then publishes them like the publisher does,
+    except for the last one, unchecked after being validated.
+    """
+    (plugin, settings, take_items) = state
+    for item in take_items:
+        plugin.validate(settings, item)
+    unchecked_item = take_items.pop()
+    unchecked_item.active = False
+    for item in take_items:
+        plugin.publish(settings, item)
+
+    if os.path.exists(unchecked_item.properties["path"]):
+        raise AssertionError("unchecked take %s exported" % (unchecked_item.properties["take_name"],))
+
+    for item in take_items:
+        metadata = fbx_file.read_metadata(item.properties["path"])
+        if [take["name"] for take in metadata["takes"]] != [item.properties["take_name"]]:
+            raise AssertionError("%s doesn't hold only its take" % (item.properties["path"],))
+
+
+def run(runner, num_takes=8, worker_counts=(1, 4), size_mb=16, startup_seconds=0.25):
+    """
+    :param runner: Runner the benchmarks are measured with
+    :param num_takes: Number of takes published, one more is validated then
+        unchecked
+    :param worker_counts: Maximum numbers of worker processes compared
+    :param size_mb: Size of the scene the takes are exported from, in MB
+    :param startup_seconds: Time every worker process waits before
+        exporting, standing in for the start of MotionBuilder
+    """
+    publish_takes = _load_hook("publish_takes.py")
+
+    class BenchTakePublishPlugin(publish_takes.MotionBuilderTakePublishPlugin):
+        def _get_exporter_backend(self, settings):
+            return BenchTakeExporter(startup_seconds)
+
+    folder = tempfile.mkdtemp(prefix="tk-motionbuilder-bench-")
+    try:
+        for max_workers in worker_counts:
+            def setup():
+                work_area = tempfile.mkdtemp(dir=folder)
+                reset_session()
+                pyfbsdk.FBApplication.save_size = size_mb * 1024 * 1024
+                pyfbsdk.FBApplication.takes = [
+                    ("Take %03d" % index, index * 10, index * 10 + 100)
+                    for index in range(num_takes + 1)
+                ]
+                pyfbsdk.FBApplication().FileSave(os.path.join(work_area, "scene.v001.fbx"))
+
+                session_item = BenchItem()
+                take_items = []
+                for take in pyfbsdk.FBSystem().Scene.Takes:
+                    take_item = BenchItem(session_item)
+                    take_item.properties["take_name"] = take.Name
+                    take_items.append(take_item)
+
+                settings = {"Max Parallel Exports": BenchSetting(max_workers)}
+                return (BenchTakePublishPlugin(), settings, take_items)
+
+            runner.measure(
+                "publish.publish_takes[%d takes, %d workers, %d ms startup]"
+                % (num_takes, max_workers, startup_seconds * 1000),
+                _publish_takes,
+                setup=setup,
+            )
+    finally:
+        reset_session()
+        shutil.rmtree(folder, ignore_errors=True)
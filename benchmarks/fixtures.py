@@ -0,0 +1,305 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Engine, app and publisher stand-ins shared by the benchmarks.
+
+"""
+import os
+import re
+import sys
+
+import tank
+import pyfbsdk
+
+from tk_motionbuilder.take_export import ExporterBackend, WORKER_SCRIPT
+
+
+def reset_session():
+    """
+    Starts over with a pristine MotionBuilder session, including the state
+    the engine keeps across restarts.
+    """
+    pyfbsdk.reset()
+    sys.modules.pop("_tk_motionbuilder_process_state", None)
+
+
+class BenchApp(object):
+    """
+    App exposing the attributes the menu code reads.
+    """
+
+    def __init__(self, engine, display_name):
+        self.engine = engine
+        self.display_name = display_name
+        self.documentation_url = "https://example.com/%s" % display_name
+
+
+class BenchTk(object):
+    """
+    Toolkit API stand-in resolving every context to the same environment.
+    """
+
+    def execute_core_hook(self, hook_name, **kwargs):
+        return "shot_step"
+
+
+class BenchEngine(object):
+    """
+    Engine with the menu related behaviour of MotionBuilderEngine.
+
+    Commands are spread over apps, commands_per_app at a time. The first
+    num_favourites commands are registered as menu favourites. If
+    context_change_allowed is True, the engine supports in-place context
+    changes.
+    """
+
+    def __init__(self, context, num_commands, commands_per_app=10, num_favourites=0,
+                 settings=None, menu_generator_class=None, context_change_allowed=False):
+        self.context = context
+        self.context_change_allowed = context_change_allowed
+        self.environment = {"name": "shot_step"}
+        self.sgtk = BenchTk()
+        self.version = "v0.0.0"
+        self.cache_location = None
+        self.apps = {}
+        self.commands = {}
+        self.logs = []
+        self._settings = {"menu_favourites": []}
+        self._settings.update(settings or {})
+        self._menu_generator_class = menu_generator_class
+        self._menu_generator = None
+
+        app = None
+        for index in range(num_commands):
+            if index % commands_per_app == 0:
+                instance_name = "tk-multi-app%d" % (index // commands_per_app)
+                app = BenchApp(self, "App %d" % (index // commands_per_app))
+                self.apps[instance_name] = app
+            cmd_name = "Command %d" % index
+            self.commands[cmd_name] = {
+                "properties": {"app": app},
+                "callback": lambda: None,
+            }
+            if index < num_favourites:
+                self._settings["menu_favourites"].append(
+                    {"app_instance": instance_name, "name": cmd_name})
+
+    def get_setting(self, name, default=None):
+        return self._settings.get(name, default)
+
+    def log_debug(self, msg):
+        self.logs.append(msg)
+
+    log_info = log_warning = log_error = log_debug
+
+    def post_app_init(self):
+        self._menu_generator = self._menu_generator_class(self, "Shotgun")
+        self._menu_generator.create_menu()
+
+    def change_context(self, new_context):
+        self.context = new_context
+        self._menu_generator.create_menu()
+
+    def destroy(self):
+        self._menu_generator.destroy_menu()
+        tank.platform._engine_destroyed(self)
+
+
+class BenchContext(object):
+    """
+    Context compared by name, like Toolkit contexts compare by entities.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.project = {"type": "Project", "id": 1}
+        self.shotgun_url = "https://example.com/%s" % name
+        self.filesystem_locations = []
+
+    def __eq__(self, other):
+        return isinstance(other, BenchContext) and other.name == self.name
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __str__(self):
+        return "Shot %s" % self.name
+
+
+class BenchItem(object):
+    """
+    Publish item stand-in.
+    """
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.properties = {}
+        self.context_change_allowed = True
+        self.active = True
+
+
+class BenchLogger(object):
+    def __init__(self):
+        self.records = []
+
+    def _log(self, msg, extra=None):
+        self.records.append(msg)
+
+    debug = info = warning = warn = error = _log
+
+
+class BenchPublisherUtil(object):
+    """
+    Zero config path info hook stand-in, recognizing v### versions.
+    """
+
+    _VERSION_REGEX = re.compile(r"(.*[._-]v)(\d+)(.*)$")
+
+    def get_version_number(self, path):
+        match = self._VERSION_REGEX.match(os.path.basename(path))
+        if match:
+            return int(match.group(2))
+        return None
+
+    def get_next_version_path(self, path):
+        folder, file_name = os.path.split(path)
+        match = self._VERSION_REGEX.match(file_name)
+        if not match:
+            return None
+        (prefix, version, suffix) = match.groups()
+        next_version = str(int(version) + 1).zfill(len(version))
+        return os.path.join(folder, "%s%s%s" % (prefix, next_version, suffix))
+
+    def get_version_path(self, path, version):
+        (base, ext) = os.path.splitext(path)
+        return "%s.%s%s" % (base, version, ext)
+
+    def get_file_path_components(self, path):
+        (folder, file_name) = os.path.split(path)
+        return {"path": path, "folder": folder, "filename": file_name}
+
+
+class BenchTemplate(object):
+    """
+    Template resolving to a fixed path, whatever the fields.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def validate(self, path):
+        return True
+
+    def get_fields(self, path):
+        return {}
+
+    def apply_fields(self, fields):
+        return self.path
+
+
+class BenchPublisherEngine(object):
+    def __init__(self):
+        self.apps = {}
+        self.templates = {}
+
+    def get_template_by_name(self, name):
+        return self.templates.get(name)
+
+    def import_module(self, module_name):
+        return __import__(module_name)
+
+
+class BenchPublisher(object):
+    def __init__(self):
+        self.util = BenchPublisherUtil()
+        self.engine = BenchPublisherEngine()
+        self.cache_location = None
+
+
+class BenchSetting(object):
+    def __init__(self, value):
+        self.value = value
+
+
+class BenchPublishPlugin(object):
+    """
+    Stand-in for the base publish file plugin of the publisher.
+    """
+
+    name = "Publish to Shotgun"
+
+    def __init__(self):
+        self.parent = BenchPublisher()
+        self.logger = BenchLogger()
+        self.disk_location = os.path.dirname(__file__)
+
+    @property
+    def settings(self):
+        return {}
+
+    def _get_next_version_info(self, path, item):
+        if not path:
+            return (None, None)
+        next_path = self.parent.util.get_next_version_path(path)
+        if not next_path:
+            return (None, None)
+        return (next_path, self.parent.util.get_version_number(next_path))
+
+    def get_publish_path(self, settings, item):
+        publish_template = item.properties.get("publish_template")
+        if publish_template:
+            return publish_template.apply_fields({})
+        return item.properties["path"]
+
+    def _copy_work_to_publish(self, settings, item):
+        pass
+
+    def _save_to_next_version(self, path, item, save_callback):
+        (next_version_path, version) = self._get_next_version_info(path, item)
+        if next_version_path is None or os.path.exists(next_version_path):
+            return None
+        save_callback(next_version_path)
+        return next_version_path
+
+    def validate(self, settings, item):
+        return True
+
+    def publish(self, settings, item):
+        self._copy_work_to_publish(settings, item)
+
+    def finalize(self, settings, item):
+        pass
+
+
+class BenchTakeExporter(ExporterBackend):
+    """
+    Exports takes with python processes running the take export worker
+    against the pyfbsdk stand-in, instead of batch MotionBuilder processes.
+    The processes wait startup_seconds before running the worker, to mimic
+    the start of MotionBuilder.
+    """
+
+    def __init__(self, startup_seconds=0.0):
+        self.startup_seconds = startup_seconds
+
+    def get_command(self, job):
+        return [
+            sys.executable,
+            "-c",
+            "import time; time.sleep(%r); execfile(%r)" % (self.startup_seconds, WORKER_SCRIPT),
+        ]
+
+    def get_environment(self, job):
+        environment = super(BenchTakeExporter, self).get_environment(job)
+        standins = os.path.dirname(os.path.abspath(pyfbsdk.__file__))
+        environment["PYTHONPATH"] = os.pathsep.join(
+            [standins, os.path.join(standins, os.pardir, os.pardir, "python")])
+        return environment
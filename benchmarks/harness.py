@@ -0,0 +1,152 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Timing harness and result history of the benchmarks.
+
+"""
+import os
+import json
+import time
+import socket
+import platform
+import subprocess
+from timeit import default_timer
+
+import pyfbsdk
+
+
+class Runner(object):
+    """
+    Times benchmark functions and collects their results.
+    """
+
+    def __init__(self, repeat=5, name_filter=None):
+        """
+        :param repeat: Number of timed runs of every benchmark
+        :param name_filter: Only benchmarks whose name contains this string
+            are run
+        """
+        self.repeat = repeat
+        self.name_filter = name_filter
+        self.results = {}
+
+    def measure(self, name, func, setup=None, repeat=None, **extra):
+        """
+        Times a benchmark. The reported pyfbsdk call counts are those of the
+        last run.
+
+        :param name: Name of the benchmark
+        :param func: Callable timed. It is passed the value returned by setup,
+            if a setup callable is provided
+        :param setup: Optional callable run, untimed, before every run
+        :param repeat: Number of runs, defaults to the runner's repeat
+        :param extra: Additional values stored with the result
+        """
+        if self.name_filter and self.name_filter not in name:
+            return
+
+        times = []
+        for run_index in range(repeat or self.repeat):
+            if setup:
+                state = setup()
+                pyfbsdk.CALL_COUNTS.clear()
+                start = default_timer()
+                func(state)
+            else:
+                pyfbsdk.CALL_COUNTS.clear()
+                start = default_timer()
+                func()
+            times.append(default_timer() - start)
+
+        times.sort()
+        result = {
+            "min_ms": times[0] * 1000.0,
+            "median_ms": times[len(times) // 2] * 1000.0,
+            "runs": len(times),
+            "calls": dict(pyfbsdk.CALL_COUNTS),
+        }
+        result.update(extra)
+        self.results[name] = result
+
+        print "%-55s %10.2f ms %10.2f ms %8d calls" % (
+            name, result["min_ms"], result["median_ms"], sum(result["calls"].values()))
+
+
+def _get_commit():
+    """
+    Returns the git commit of the working copy, if it can be determined.
+    """
+    try:
+        process = subprocess.Popen(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        (out, err) = process.communicate()
+    except OSError:
+        return None
+    return out.strip() or None
+
+
+def load_history(path):
+    """
+    Reads all results recorded in a history file.
+
+    :param path: Path to a JSON lines history file
+    :returns: List of result records, oldest first
+    """
+    if not os.path.exists(path):
+        return []
+    fh = open(path, "r")
+    try:
+        return [json.loads(line) for line in fh if line.strip()]
+    finally:
+        fh.close()
+
+
+def append_history(path, results):
+    """
+    Records benchmark results in a history file.
+
+    :param path: Path to a JSON lines history file
+    :param results: Dictionary of results, as collected by a Runner
+    :returns: The record written
+    """
+    record = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _get_commit(),
+        "host": socket.gethostname(),
+        "python": platform.python_version(),
+        "results": results,
+    }
+    fh = open(path, "a")
+    try:
+        fh.write(json.dumps(record, sort_keys=True) + "\n")
+    finally:
+        fh.close()
+    return record
+
+
+def compare(previous, current):
+    """
+    Prints the change of the median time of every benchmark against a
+    previous record.
+    """
+    print
+    print "Compared to %s (%s):" % (previous["commit"], previous["time"])
+    for name in sorted(current["results"]):
+        if name not in previous["results"]:
+            continue
+        before = previous["results"][name]["median_ms"]
+        after = current["results"][name]["median_ms"]
+        change = ((after - before) / before * 100.0) if before else 0.0
+        print "%-55s %10.2f ms -> %10.2f ms %+8.1f%%" % (name, before, after, change)
@@ -0,0 +1,87 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Runs the engine benchmarks outside of MotionBuilder, against the pyfbsdk
+stand-in, and records the results in a history file.
+
+Usage:
+
+    python benchmarks/run_benchmarks.py [--quick] [--filter menu] [--repeat 5]
+
+"""
+import os
+import sys
+import optparse
+
+BENCHMARKS_FOLDER = os.path.dirname(os.path.abspath(__file__))
+
+sys.path[:0] = [
+    os.path.join(BENCHMARKS_FOLDER, "standins"),
+    os.path.join(BENCHMARKS_FOLDER, os.pardir, "python"),
+    BENCHMARKS_FOLDER,
+]
+
+import harness
+import bench_anim_curves
+import bench_menu
+import bench_context_switch
+import bench_dialog_parent
+import bench_fbx_file
+import bench_publish
+import bench_pyside_bootstrap
+import bench_soak
+import bench_take_export
+
+
+def main():
+    parser = optparse.OptionParser(usage="%prog [options]")
+    parser.add_option("--repeat", type="int", default=5,
+                      help="number of timed runs of every benchmark")
+    parser.add_option("--filter", dest="name_filter", default=None,
+                      help="only run benchmarks whose name contains this string")
+    parser.add_option("--quick", action="store_true", default=False,
+                      help="skip the largest configurations")
+    parser.add_option("--history", default=os.path.join(BENCHMARKS_FOLDER, "history.jsonl"),
+                      help="JSON lines file the results are appended to")
+    parser.add_option("--no-history", action="store_true", default=False,
+                      help="don't record the results")
+    (options, args) = parser.parse_args()
+
+    sizes = (10, 1000, 10000)
+    file_sizes = (64, 512)
+    if options.quick:
+        sizes = (10, 1000)
+        file_sizes = (64,)
+
+    runner = harness.Runner(options.repeat, options.name_filter)
+    print "%-55s %13s %13s %14s" % ("benchmark", "min", "median", "pyfbsdk")
+
+    bench_menu.run(runner, sizes)
+    bench_context_switch.run(runner, sizes[:-1])
+    bench_publish.run(runner)
+    bench_dialog_parent.run(runner)
+    bench_pyside_bootstrap.run(runner)
+    bench_fbx_file.run(runner, file_sizes)
+    bench_take_export.run(runner)
+    bench_anim_curves.run(runner)
+    bench_soak.run(runner)
+
+    if options.no_history or not runner.results:
+        return
+
+    history = harness.load_history(options.history)
+    record = harness.append_history(options.history, runner.results)
+    if history:
+        harness.compare(history[-1], record)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+QtGui stand-in. TOP_LEVEL_WIDGETS lists the windows QApplication reports, in
+order, and every widget method call is counted.
+
+"""
+import pyfbsdk
+
+TOP_LEVEL_WIDGETS = []
+
+
+class QWidget(object):
+    def __init__(self, title="", parent=None):
+        self._title = title
+        self._parent = parent
+        self._deleted = False
+
+    def _check(self, method):
+        pyfbsdk._count(method)
+        if self._deleted:
+            raise RuntimeError("Internal C++ object already deleted.")
+
+    def windowTitle(self):
+        self._check("QWidget.windowTitle")
+        return self._title
+
+    def parentWidget(self):
+        self._check("QWidget.parentWidget")
+        return self._parent
+
+    def deleteLater(self):
+        """
+        Deletes the underlying Qt object right away, the python wrapper stays.
+        """
+        self._deleted = True
+        if self in TOP_LEVEL_WIDGETS:
+            TOP_LEVEL_WIDGETS.remove(self)
+
+
+class QDialog(QWidget):
+    pass
+
+
+class QApplication(object):
+    @staticmethod
+    def topLevelWidgets():
+        pyfbsdk._count("QApplication.topLevelWidgets")
+        return list(TOP_LEVEL_WIDGETS)
@@ -0,0 +1,533 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Headless stand-in for the parts of MotionBuilder's pyfbsdk module used by the
+engine, its menus and its publish hooks.
+
+Every API call is counted in CALL_COUNTS so that benchmarks can report how
+much work was asked of MotionBuilder, not just how long it took.
+
+"""
+import os
+import time
+import zlib
+import struct
+
+# version reported by FBSystem().Version
+VERSION = 16000.0
+
+# name of an API call -> number of times it was called
+CALL_COUNTS = {}
+
+# top level menus, by name
+MENUS = {}
+
+# (title, message) of every message box shown
+MESSAGES = []
+
+
+def reset(version=16000.0):
+    """
+    Resets the stand-in to a pristine MotionBuilder session.
+    """
+    global VERSION
+    VERSION = version
+    CALL_COUNTS.clear()
+    MENUS.clear()
+    del MESSAGES[:]
+    FBApplication._fbx_file_name = ""
+    FBApplication.save_size = 0
+    FBApplication.scene_revision = 0
+    FBApplication.takes = [("Take 001", 0, 100)]
+    FBApplication.animation = None
+    FBSystem.OnUIIdle = FBEvent()
+
+
+def _count(name):
+    CALL_COUNTS[name] = CALL_COUNTS.get(name, 0) + 1
+
+
+class FBEvent(object):
+    """
+    Event that python handlers can be added to and removed from.
+    """
+
+    def __init__(self):
+        self.handlers = []
+
+    def Add(self, handler):
+        _count("FBEvent.Add")
+        self.handlers.append(handler)
+
+    def Remove(self, handler):
+        _count("FBEvent.Remove")
+        self.handlers.remove(handler)
+
+    def fire(self, control, event):
+        """
+        Calls every handler, as MotionBuilder does when the event occurs.
+        """
+        for handler in list(self.handlers):
+            handler(control, event)
+
+
+def idle(duration=0.0):
+    """
+    Fires OnUIIdle until the given number of seconds has elapsed, or once if
+    no duration is given.
+    """
+    end = time.time() + duration
+    while True:
+        # the last event always fires once the duration has elapsed
+        now = time.time()
+        FBSystem.OnUIIdle.fire(None, None)
+        if now >= end:
+            break
+        time.sleep(0.001)
+
+
+class FBEventMenu(object):
+    """
+    Event passed to OnMenuActivate handlers.
+    """
+
+    def __init__(self, item_id, name):
+        self.Id = item_id
+        self.Name = name
+
+
+class FBGenericMenuItem(object):
+    def __init__(self, caption, item_id, menu):
+        self.Caption = caption
+        self.Id = item_id
+        self.Menu = menu
+
+
+class FBGenericMenu(object):
+    def __init__(self):
+        _count("FBGenericMenu")
+        self.items = []
+        self.OnMenuActivate = FBEvent()
+
+    def _insert(self, position, caption, item_id, sub_menu):
+        self.items.insert(position, FBGenericMenuItem(caption, item_id, sub_menu))
+
+    def InsertFirst(self, caption, item_id, sub_menu=None):
+        _count("FBGenericMenu.InsertFirst")
+        self._insert(0, caption, item_id, sub_menu)
+
+    def InsertLast(self, caption, item_id, sub_menu=None):
+        _count("FBGenericMenu.InsertLast")
+        self._insert(len(self.items), caption, item_id, sub_menu)
+
+    def InsertAfter(self, after_item, caption, item_id, sub_menu=None):
+        _count("FBGenericMenu.InsertAfter")
+        self._insert(self.items.index(after_item) + 1, caption, item_id, sub_menu)
+
+    def InsertBefore(self, before_item, caption, item_id, sub_menu=None):
+        _count("FBGenericMenu.InsertBefore")
+        self._insert(self.items.index(before_item), caption, item_id, sub_menu)
+
+    def GetItem(self, item_id):
+        _count("FBGenericMenu.GetItem")
+        for item in self.items:
+            if item.Id == item_id:
+                return item
+        return None
+
+    def GetFirstItem(self):
+        _count("FBGenericMenu.GetFirstItem")
+        if self.items:
+            return self.items[0]
+        return None
+
+    def GetNextItem(self, item):
+        _count("FBGenericMenu.GetNextItem")
+        position = self.items.index(item) + 1
+        if position < len(self.items):
+            return self.items[position]
+        return None
+
+    def DeleteItem(self, item):
+        _count("FBGenericMenu.DeleteItem")
+        self.items.remove(item)
+
+    def click(self, item_id):
+        """
+        Simulates an artist clicking the item with the given id.
+        """
+        item = self.GetItem(item_id)
+        self.OnMenuActivate.fire(self, FBEventMenu(item.Id, item.Caption))
+
+
+class FBMenuManager(object):
+    def GetMenu(self, path):
+        _count("FBMenuManager.GetMenu")
+        return MENUS.get(path)
+
+    def InsertBefore(self, path, before_name, name):
+        _count("FBMenuManager.InsertBefore")
+        MENUS.setdefault(name, FBGenericMenu())
+
+    def InsertAfter(self, path, after_name, name):
+        _count("FBMenuManager.InsertAfter")
+        MENUS.setdefault(name, FBGenericMenu())
+
+    def InsertFirst(self, path, name):
+        _count("FBMenuManager.InsertFirst")
+        MENUS.setdefault(name, FBGenericMenu())
+
+    def InsertLast(self, path, name):
+        _count("FBMenuManager.InsertLast")
+        MENUS.setdefault(name, FBGenericMenu())
+
+
+class FBSystem(object):
+    # events are shared by all FBSystem instances, as in MotionBuilder
+    OnUIIdle = None
+
+    @property
+    def Version(self):
+        _count("FBSystem.Version")
+        return VERSION
+
+    @property
+    def Scene(self):
+        _count("FBSystem.Scene")
+        return FBScene()
+
+
+class FBTime(object):
+    def __init__(self, frame):
+        self._frame = frame
+
+    def GetFrame(self):
+        return self._frame
+
+
+class FBTimeSpan(object):
+    def __init__(self, start, stop):
+        self._start = start
+        self._stop = stop
+
+    def GetStart(self):
+        return self._start
+
+    def GetStop(self):
+        return self._stop
+
+
+class FBTake(object):
+    def __init__(self, name, first, last):
+        self.Name = name
+        self.LocalTimeSpan = FBTimeSpan(FBTime(first), FBTime(last))
+
+
+class FBScene(object):
+    """
+    Scene stand-in, listing the takes of FBApplication.takes.
+    """
+
+    @property
+    def Takes(self):
+        _count("FBScene.Takes")
+        return [FBTake(*take) for take in FBApplication.takes]
+
+
+class FBFbxOptions(object):
+    """
+    Save options stand-in, supporting take selection.
+    """
+
+    def __init__(self, load):
+        self._selected = [True] * len(FBApplication.takes)
+
+    def GetTakeCount(self):
+        return len(self._selected)
+
+    def GetTakeName(self, index):
+        return FBApplication.takes[index][0]
+
+    def SetTakeSelect(self, index, selected):
+        self._selected[index] = selected
+
+
+class FBApplication(object):
+    """
+    Application stand-in. Saving writes a binary FBX file of about save_size
+    bytes to the target path. Like MotionBuilder, every save is stamped with
+    the time it was made, so saving the same scene twice gives files that
+    only differ by their stamps. Bump scene_revision to change the scene.
+
+    The saved file holds a 64x64 thumbnail and the takes listed in takes, as
+    (name, first frame, last frame) at 30 fps. Set animation to (number of
+    joints, number of keys) to save a skeleton whose joints have translation
+    and rotation curves with that many keys.
+    """
+
+    _fbx_file_name = ""
+    save_size = 0
+    scene_revision = 0
+    takes = []
+    animation = None
+
+    def _get_fbx_file_name(self):
+        _count("FBApplication.FBXFileName")
+        return FBApplication._fbx_file_name
+
+    def _set_fbx_file_name(self, path):
+        FBApplication._fbx_file_name = path
+
+    FBXFileName = property(_get_fbx_file_name, _set_fbx_file_name)
+
+    def FileSave(self, path=None, options=None):
+        _count("FBApplication.FileSave")
+        path = path or FBApplication._fbx_file_name
+        takes = FBApplication.takes
+        if options is not None:
+            takes = [take for (take, selected) in zip(takes, options._selected) if selected]
+        fh = open(path, "wb")
+        try:
+            _write_fbx(fh, path, FBApplication.save_size, FBApplication.scene_revision, takes,
+                       FBApplication.animation)
+        finally:
+            fh.close()
+        FBApplication._fbx_file_name = path
+        return True
+
+    def FileOpen(self, path, show_options=False):
+        _count("FBApplication.FileOpen")
+        if not os.path.exists(path):
+            return False
+        FBApplication._fbx_file_name = path
+        # restore the takes and the size of the saved scene
+        from tk_motionbuilder import fbx_file
+        metadata = fbx_file.read_metadata(path)
+        if metadata:
+            FBApplication.takes = [
+                (take["name"], int(take["start"]), int(take["end"]))
+                for take in metadata["takes"]
+            ]
+            FBApplication.save_size = os.path.getsize(path)
+        return True
+
+    def FileNew(self):
+        _count("FBApplication.FileNew")
+        FBApplication._fbx_file_name = ""
+
+
+def _write_fbx(fh, path, size, revision, takes, animation=None):
+    """
+    Writes a binary FBX 7.4 file laid out like the ones MotionBuilder saves:
+    the header extension, with the path and time of the save in the scene
+    info, the save stamps, the global settings, an Objects node padded to the
+    requested size, the takes and the footer.
+    """
+    stamp = "%.6f" % time.time()
+    now = time.localtime()
+    gmt = time.strftime("%d/%m/%Y %H:%M:%S.000", time.gmtime())
+    scene_info_properties = [
+        ("P", [("S", "DocumentUrl"), ("S", "KString"), ("S", "Url"), ("S", ""), ("S", path)]),
+        ("P", [("S", "SrcDocumentUrl"), ("S", "KString"), ("S", "Url"), ("S", ""),
+               ("S", path)]),
+    ]
+    for compound in ("Original", "LastSaved"):
+        scene_info_properties.extend([
+            ("P", [("S", compound), ("S", "Compound"), ("S", ""), ("S", "")]),
+            ("P", [("S", compound + "|ApplicationName"), ("S", "KString"), ("S", ""), ("S", ""),
+                   ("S", "MotionBuilder")]),
+            ("P", [("S", compound + "|DateTime_GMT"), ("S", "DateTime"), ("S", ""), ("S", ""),
+                   ("S", gmt)]),
+            ("P", [("S", compound + "|FileName"), ("S", "KString"), ("S", ""), ("S", ""),
+                   ("S", path)]),
+        ])
+    fh.write("Kaydara FBX Binary  \x00\x1a\x00" + struct.pack("<I", 7400))
+
+    _write_fbx_node(fh, "FBXHeaderExtension", [], [
+        ("FBXHeaderVersion", [("I", 1003)]),
+        ("FBXVersion", [("I", 7400)]),
+        ("CreationTimeStamp", [], [
+            (field, [("I", value)]) for (field, value) in zip(
+                ("Year", "Month", "Day", "Hour", "Minute", "Second"), now[:6])
+        ]),
+        ("Creator", [("S", _FBX_CREATOR)]),
+        ("SceneInfo", [("S", "GlobalInfo\x00\x01SceneInfo"), ("S", "UserData")], [
+            ("Type", [("S", "UserData")]),
+            ("Thumbnail", [], [
+                ("Version", [("I", 100)]),
+                ("Format", [("I", 0)]),
+                ("Size", [("I", 64), ("I", 64)]),
+                ("Encoding", [("I", 0)]),
+                ("ImageData", [("R", "\x80" * 64 * 64 * 3)]),
+            ]),
+            ("Properties70", [], scene_info_properties),
+        ]),
+    ])
+    _write_fbx_node(fh, "FileId", [("R", stamp)])
+    _write_fbx_node(fh, "CreationTime", [("S", stamp)])
+    _write_fbx_node(fh, "Creator", [("S", _FBX_CREATOR)])
+    _write_fbx_node(fh, "GlobalSettings", [], [
+        ("Version", [("I", 1000)]),
+        ("Properties70", [], [
+            ("P", [("S", "TimeMode"), ("S", "enum"), ("S", ""), ("S", ""), ("I", 6)]),
+            ("P", [("S", "TimeSpanStart"), ("S", "KTime"), ("S", "Time"), ("S", ""),
+                   ("L", 0)]),
+            ("P", [("S", "TimeSpanStop"), ("S", "KTime"), ("S", "Time"), ("S", ""),
+                   ("L", 100 * _FBX_TICKS_PER_FRAME)]),
+        ]),
+    ])
+    (objects, connections) = _animation_nodes(takes, *(animation or (0, 0)))
+    _write_fbx_node(fh, "Objects", [
+        ("R", ("revision %d" % revision).ljust(max(size, 16), "\0")),
+    ], objects)
+    _write_fbx_node(fh, "Connections", [], connections)
+    take_nodes = []
+    for (name, first, last) in takes:
+        time_range = [("L", first * _FBX_TICKS_PER_FRAME), ("L", last * _FBX_TICKS_PER_FRAME)]
+        take_nodes.append(("Take", [("S", name)], [
+            ("FileName", [("S", name.replace(" ", "_") + ".tak")]),
+            ("LocalTime", time_range),
+            ("ReferenceTime", time_range),
+        ]))
+    if takes:
+        take_nodes.insert(0, ("Current", [("S", takes[0][0])]))
+    _write_fbx_node(fh, "Takes", [], take_nodes)
+
+    # null record ending the top level nodes, then the footer
+    fh.write("\0" * 13 + stamp.ljust(16, "\0"))
+
+
+_FBX_CREATOR = "FBX SDK/FBX Plugins version 2015.1 (MotionBuilder stand-in)"
+
+# FBX time ticks per frame at 30 fps
+_FBX_TICKS_PER_FRAME = 46186158000 / 30
+
+
+def _write_fbx_node(fh, name, properties, children=()):
+    """
+    Writes a node record and its children, then fills in its end offset.
+    """
+    start = fh.tell()
+    payload = "".join(_pack_fbx_property(code, value) for (code, value) in properties)
+    fh.write(struct.pack("<IIIB", 0, len(properties), len(payload), len(name)))
+    fh.write(name)
+    fh.write(payload)
+    if children:
+        for child in children:
+            _write_fbx_node(fh, *child)
+        fh.write("\0" * 13)
+    end = fh.tell()
+    fh.seek(start)
+    fh.write(struct.pack("<I", end))
+    fh.seek(end)
+
+
+def _animation_nodes(takes, num_joints, num_keys):
+    """
+    Returns the Objects children and the connections of the animation stacks
+    and layers of the takes, and of a skeleton of num_joints joints driven by
+    a character. The translation and rotation curves of the joints have
+    num_keys keys each, in the first take.
+    """
+    objects = []
+    connections = []
+    for (index, take) in enumerate(takes):
+        (stack_id, layer_id) = (10000 + index, 20000 + index)
+        objects.append(("AnimationStack", [("L", stack_id), ("S", take[0] + "\x00\x01AnimStack"),
+                                           ("S", "")]))
+        objects.append(("AnimationLayer", [("L", layer_id), ("S", "BaseLayer\x00\x01AnimLayer"),
+                                           ("S", "")]))
+        connections.append(("C", [("S", "OO"), ("L", layer_id), ("L", stack_id)]))
+    times = [frame * _FBX_TICKS_PER_FRAME for frame in range(num_keys)]
+    character_id = 90000
+    if num_joints:
+        objects.append(("Constraint", [("L", character_id),
+                                       ("S", "Character1\x00\x01Constraint"),
+                                       ("S", "Character")]))
+    for joint in range(num_joints):
+        model_id = 100000 + joint
+        objects.append(("Model", [("L", model_id), ("S", "joint%d\x00\x01Model" % joint),
+                                  ("S", "LimbNode")]))
+        connections.append(("C", [("S", "OP"), ("L", model_id), ("L", character_id),
+                                  ("S", "Joint%dLink" % joint)]))
+        for (channel, property_name) in enumerate(("Lcl Translation", "Lcl Rotation")):
+            curve_node_id = 200000 + joint * 2 + channel
+            objects.append(("AnimationCurveNode", [
+                ("L", curve_node_id), ("S", "TR"[channel] + "\x00\x01AnimCurveNode"), ("S", ""),
+            ]))
+            connections.append(("C", [("S", "OO"), ("L", curve_node_id), ("L", 20000)]))
+            connections.append(("C", [("S", "OP"), ("L", curve_node_id), ("L", model_id),
+                                      ("S", property_name)]))
+            for (axis, component) in enumerate("XYZ"):
+                curve_id = 300000 + (joint * 2 + channel) * 3 + axis
+                offset = joint + channel * 10 + axis
+                objects.append(("AnimationCurve", [
+                    ("L", curve_id), ("S", "\x00\x01AnimCurve"), ("S", ""),
+                ], [
+                    ("Default", [("D", 0.0)]),
+                    ("KeyVer", [("I", 4009)]),
+                    ("KeyTime", [("l", times)]),
+                    ("KeyValueFloat", [("f", [offset + key * 0.01 for key in range(num_keys)])]),
+                    # the first key has its own tangents, the others share
+                    # the second attribute group
+                    ("KeyAttrFlags", [("i", [264, 264])]),
+                    ("KeyAttrDataFloat", [("f", [1.0, 2.0, 0.0, 0.0, 0.3, 0.3, 0.0, 0.0])]),
+                    ("KeyAttrRefCount", [("i", [1, num_keys - 1])]),
+                ]))
+                connections.append(("C", [("S", "OP"), ("L", curve_id), ("L", curve_node_id),
+                                          ("S", "d|" + component)]))
+    return (objects, connections)
+
+
+def _pack_fbx_property(code, value):
+    if code in "SR":
+        return code + struct.pack("<I", len(value)) + value
+    if code in "fdli":
+        # arrays are compressed, as MotionBuilder saves them
+        data = zlib.compress(struct.pack("<%d%s" % (len(value), {"l": "q"}.get(code, code)), *value))
+        return code + struct.pack("<III", len(value), 1, len(data)) + data
+    return code + struct.pack({"I": "<i", "L": "<q", "D": "<d"}[code], value)
+
+
+def FBMessageBox(title, message, *buttons):
+    _count("FBMessageBox")
+    MESSAGES.append((title, message))
+    return 1
+
+
+class FBFilePopupStyle(object):
+    kFBFilePopupOpen = 0
+    kFBFilePopupSave = 1
+
+
+class FBFilePopup(object):
+    """
+    File dialog stand-in. Execute() returns the result set on the class.
+    """
+
+    result = None
+
+    def __init__(self):
+        self.Style = FBFilePopupStyle.kFBFilePopupOpen
+        self.Filter = "*"
+        self.Caption = ""
+        self.FileName = ""
+        self.FullFilename = ""
+
+    def Execute(self):
+        _count("FBFilePopup.Execute")
+        if FBFilePopup.result:
+            self.FullFilename = FBFilePopup.result
+            return True
+        return False
+
+
+reset()
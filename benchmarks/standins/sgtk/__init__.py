@@ -0,0 +1,23 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Toolkit exposes the same API under the sgtk and tank names.
+
+"""
+import sys
+
+from tank import *
+from tank import platform, util, get_hook_baseclass, TankError, TankEngineInitError
+import tank.platform.qt
+
+# make "from sgtk.platform.qt import QtCore" resolve to the tank modules
+sys.modules["sgtk.platform"] = tank.platform
+sys.modules["sgtk.platform.qt"] = tank.platform.qt
@@ -0,0 +1,34 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Minimal stand-in for the parts of the Toolkit core used by the engine code
+exercised by the benchmarks. It is not a replacement for tk-core.
+
+"""
+from . import platform
+from . import util
+
+
+class TankError(Exception):
+    pass
+
+
+class TankEngineInitError(TankError):
+    pass
+
+
+# class returned by get_hook_baseclass(), set by the benchmarks before
+# loading a hook
+hook_baseclass = object
+
+
+def get_hook_baseclass():
+    return hook_baseclass
@@ -0,0 +1,46 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Engine management stand-in. start_engine() creates engines through the
+factory set with set_engine_factory().
+
+"""
+_current_engine = None
+_engine_factory = None
+
+
+def set_engine_factory(factory):
+    """
+    :param factory: Callable taking (engine_name, tk, context) and returning
+        a started engine
+    """
+    global _engine_factory
+    _engine_factory = factory
+
+
+def current_engine():
+    return _current_engine
+
+
+def start_engine(engine_name, tk, context):
+    global _current_engine
+    _current_engine = _engine_factory(engine_name, tk, context)
+    return _current_engine
+
+
+def change_context(new_context):
+    _current_engine.change_context(new_context)
+
+
+def _engine_destroyed(engine):
+    global _current_engine
+    if _current_engine is engine:
+        _current_engine = None
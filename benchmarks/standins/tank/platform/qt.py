@@ -0,0 +1,40 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+"""
+Qt stand-in. Timer callbacks are queued and run by process_events(), like
+the Qt event loop would once control returns to it, no earlier than their
+delay.
+
+"""
+import time
+
+_pending = []
+
+
+class _QTimer(object):
+    @staticmethod
+    def singleShot(msec, callback):
+        _pending.append((time.time() + msec / 1000.0, callback))
+
+
+class QtCore(object):
+    QTimer = _QTimer
+
+
+def process_events():
+    """
+    Runs the queued timer callbacks, waiting for each one to be due.
+    """
+    while _pending:
+        (due, callback) = _pending.pop(0)
+        delay = due - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        callback()
@@ -15,16 +15,13 @@ A MotionBuilder engine for Shotgun.
 
 import os
 import sys
+import socket
 
 # tank libs
 import tank
 
-# application libs
-from pyfbsdk import FBMessageBox
-from pyfbsdk import FBSystem
-
 # custom exception handler for motion builder
-def tank_mobu_exception_trap(ex_cls, ex, tb):
+def tank_mobu_exception_trap(ex_cls, ex, tb, repeats=0):
     # careful about infinite loops here - 
     # MUST NOT RAISE EXCEPTIONS :)
     
@@ -34,6 +31,8 @@ def tank_mobu_exception_trap(ex_cls, ex, tb):
         import traceback
         tb_str = "\n".join(traceback.format_tb(tb))
         error_message = "A Python Exception was Caught!\n\nDetails: %s\nError Type: %s\n\nTraceback:\n%s" % (ex, ex_cls, tb_str)
+        if repeats:
+            error_message += "\n\nThis exception was raised %d more times since it was last shown." % repeats
     except:
         pass
 
@@ -48,8 +47,31 @@ def tank_mobu_exception_trap(ex_cls, ex, tb):
             pass
         
 
+def _traced(span_name):
+    """
+    Decorator timing an engine method as a startup trace span.
+
+    :param span_name: Name of the span in the trace
+    """
+    def decorator(method):
+        def wrapper(self, *args, **kwargs):
+            with self._tracer.span(span_name):
+                return method(self, *args, **kwargs)
+        wrapper.__name__ = method.__name__
+        wrapper.__doc__ = method.__doc__
+        return wrapper
+    return decorator
+
+
 class MotionBuilderEngine(tank.platform.Engine):
 
+    __tk_motionbuilder = None
+    __tracer = None
+    __log_buffer = None
+    __error_queue = None
+    __host_capabilities = None
+    __image_plugins_folder = None
+
     @property
     def host_info(self):
         """
@@ -69,18 +91,102 @@ class MotionBuilderEngine(tank.platform.Engine):
                 "version: "unknown"
             }
         """
-        host_info = {"name": "Motionbuilder", "version": "unknown"}
+        return {"name": "Motionbuilder", "version": self.host_capabilities.version_string}
 
+    @property
+    def host_capabilities(self):
+        """
+        Version of Motionbuilder and the features it supports, probed once
+        per process.
+        """
+        if self.__host_capabilities is None:
+            self.__host_capabilities = self._tk_motionbuilder.get_host_capabilities()
+        return self.__host_capabilities
+
+    @property
+    def _tk_motionbuilder(self):
+        """
+        The tk_motionbuilder package of this engine. import_module loads the
+        package again on every call, so it is imported once, the first time
+        the engine needs it during startup, and reused afterwards.
+        """
+        if self.__tk_motionbuilder is None:
+            self.__tk_motionbuilder = self.import_module("tk_motionbuilder")
+        return self.__tk_motionbuilder
+
+    @property
+    def context_change_allowed(self):
+        """
+        Whether the engine supports changing context without being restarted.
+        Only the context dependent parts of the menu need refreshing.
+        """
+        return True
+
+    @property
+    def _tracer(self):
+        """
+        Tracer recording the startup phases of the engine. Spans are only
+        recorded if the startup_trace_folder setting is set.
+        """
+        if self.__tracer is None:
+            trace_folder = self.get_setting("startup_trace_folder", None)
+            if trace_folder:
+                trace_folder = os.path.expanduser(os.path.expandvars(trace_folder))
+            self.__tracer = self._tk_motionbuilder.StartupTracer(trace_folder)
+        return self.__tracer
+
+    @property
+    def _log_buffer(self):
+        """
+        Buffer the log messages go through. The debug_logging setting is
+        resolved once, when the buffer is created.
+        """
+        if self.__log_buffer is None:
+            debug_logging = self.get_setting("debug_logging", False)
+            log_file = self.get_setting("log_file", None)
+            if log_file:
+                log_file = os.path.expanduser(os.path.expandvars(log_file))
+            try:
+                self.__log_buffer = self._tk_motionbuilder.EngineLogBuffer(debug_logging, log_file)
+            except Exception, e:
+                self.__log_buffer = self._tk_motionbuilder.EngineLogBuffer(debug_logging)
+                self.__log_buffer.warning("Could not open the log file %s: %s" % (log_file, e))
+        return self.__log_buffer
+
+    @property
+    def _error_queue(self):
+        """
+        Queue errors are reported through, shown together in a non-modal
+        panel unless the headless_error_reporting setting is set.
+        """
+        if self.__error_queue is None:
+            self.__error_queue = self._tk_motionbuilder.ErrorQueue(
+                self.get_setting("headless_error_reporting", False),
+                self._get_dialog_parent
+            )
+        return self.__error_queue
+
+    def _write_trace(self):
+        """
+        Writes the spans recorded so far to the trace folder.
+        """
+        if not self._tracer.enabled:
+            return
         try:
-            # NOTE: The 'Version' returns a double value
-            # we really need the conversion to string.
-            host_info["version"] = str(FBSystem().Version)
-        except:
-            # Fallback to initialized values above
-            pass
+            path = self._tracer.write({
+                "engine_version": self.version,
+                "host_version": self.host_info["version"],
+                "host_capabilities": self.host_capabilities.to_dict(),
+                "pyside_bootstrap": self._tk_motionbuilder.get_bootstrap_manifest(),
+                "context": str(self.context),
+                "hostname": socket.gethostname(),
+            })
+        except Exception, e:
+            self.log_warning("Could not write the startup trace: %s" % e)
+        else:
+            self.log_debug("Startup trace written to %s" % path)
 
-        return host_info
-    
+    @_traced("MotionBuilderEngine.init_engine")
     def init_engine(self):
         self.log_debug("%s: Initializing..." % self)
         
@@ -92,9 +198,14 @@ class MotionBuilderEngine(tank.platform.Engine):
         # import pyside QT UI libraries
         self._init_pyside()
 
-        # motionbuilder doesn't have good exception handling, so install our own trap
-        sys.excepthook = tank_mobu_exception_trap
+        # motionbuilder doesn't have good exception handling, so install our own trap.
+        # the same exception is only shown once a minute.
+        spool_folder = self.get_setting("exception_spool_folder", None)
+        if spool_folder:
+            spool_folder = os.path.expanduser(os.path.expandvars(spool_folder))
+        sys.excepthook = self._tk_motionbuilder.ExceptionTrap(tank_mobu_exception_trap, spool_folder)
 
+    @_traced("MotionBuilderEngine._init_pyside")
     def _init_pyside(self):
         """
         Handles the pyside init
@@ -104,75 +215,97 @@ class MotionBuilderEngine(tank.platform.Engine):
 
         # first see if pyside is already present - in that case skip!
         try:
-            from PySide import QtGui
+            with self._tracer.span("import PySide.QtGui"):
+                (QtGui, elapsed) = self._tk_motionbuilder.timed_import("PySide.QtGui")
         except:
             # fine, we don't expect pyside to be present just yet
             self.log_debug("PySide not detected - it will be added to the setup now...")
         else:
             # pyside was found. we will ensure the image format plugins are
-            # available
-            self.log_debug("PySide detected - the existing version will be used.")
-            self._add_image_format_plugins_to_library_path(pyside_folder)
+            # available once they are needed
+            self.log_debug("PySide detected - the existing version will be used "
+                           "(import took %.1f ms)." % (elapsed * 1000.0))
+            self.__image_plugins_folder = pyside_folder
             return
 
-        if sys.platform == "win32":
+        if self.host_capabilities.bundled_pyside:
+            # the folders are only added once per process, however many
+            # times the engine is restarted
             pyside_path = os.path.join(self.disk_location, "resources", pyside_folder, "python")
-            sys.path.append(pyside_path)
             dll_path = os.path.join(self.disk_location, "resources", pyside_folder, "lib")
-            path = os.environ.get("PATH", "")
-            path += ";%s" % dll_path
-            os.environ["PATH"] = path
+            if not self._tk_motionbuilder.add_pyside_paths(pyside_path, dll_path):
+                self.log_debug("PySide folders already on sys.path and PATH.")
 
         else:
             self.log_error("Unknown platform - cannot initialize PySide!")
 
         # now try to import it
         try:
-            from PySide import QtCore
+            with self._tracer.span("import PySide.QtCore"):
+                (QtCore, elapsed) = self._tk_motionbuilder.timed_import("PySide.QtCore")
         except Exception, e:
             self.log_error("PySide could not be imported! Apps using pyside will not "
                            "operate correctly! Error reported: %s" % e)
         else:
-            self._add_image_format_plugins_to_library_path(pyside_folder)
+            self.log_debug("PySide imported in %.1f ms." % (elapsed * 1000.0))
+            self.__image_plugins_folder = pyside_folder
+
+    def ensure_image_format_support(self):
+        """
+        Makes the image formats supported by the plugins bundled with PySide
+        (jpeg, tiff, mng, ...) available to Qt. Registering the plugins is
+        deferred from startup until an app widget is created or an app calls
+        this before loading images, so sessions that never decode an image
+        don't pay for it.
+        """
+        pyside_folder = self.__image_plugins_folder
+        if pyside_folder is None:
+            return
+        self.__image_plugins_folder = None
+        self._add_image_format_plugins_to_library_path(pyside_folder)
+
+    def _create_widget(self, *args, **kwargs):
+        """
+        Creates the app widgets shown by show_dialog, show_modal and
+        show_panel, once the image format plugins are available to them.
+        Widgets often load their images as they are built, before the dialog
+        holding them is created.
+        """
+        self.ensure_image_format_support()
+        return super(MotionBuilderEngine, self)._create_widget(*args, **kwargs)
 
+    @_traced("MotionBuilderEngine._add_image_format_plugins_to_library_path")
     def _add_image_format_plugins_to_library_path(self, pyside_folder):
         """
         Add image format plugins to path so they can be loaded and used
 
         :param: pyside_folder Filesystem location where the plugins live
         """
-        from PySide import QtCore
-
         plugin_path = os.path.join(self.disk_location, "resources", pyside_folder, "qt_plugins")
 
         self.log_debug(
             "Adding support for various image formats via qplugins."
             "Plugin path: %s" % (plugin_path,)
         )
-        QtCore.QCoreApplication.addLibraryPath(plugin_path)
+        elapsed = self._tk_motionbuilder.add_qt_plugin_path(plugin_path)
+        if elapsed is None:
+            self.log_debug("Image format plugins were already registered by a previous engine.")
+        else:
+            self.log_debug("Image format plugins registered in %.1f ms, deferred from startup."
+                           % (elapsed * 1000.0))
 
     def _get_dialog_parent(self):
         """
         Find the main Motionbuilder window/QWidget.  This
         will be used as the parent for all dialogs created
-        by show_modal or show_dialog
+        by show_modal or show_dialog.  The window is looked up
+        once and reused until it is destroyed.
         
         :returns: QWidget if found or None if not
         """
-        from PySide import QtGui
-        
-        # get all top level windows:
-        top_level_windows = QtGui.QApplication.topLevelWidgets()
-        
-        # from this list, find the main application window.
-        for w in top_level_windows:
-            if (type(w) == QtGui.QWidget        # window is always QWidget 
-                and len(w.windowTitle()) > 0    # window always has a title/caption
-                and w.parentWidget() == None):  # parent widget is always None
-                return w
-        
-        return None
+        return self._tk_motionbuilder.get_main_window()
 
+    @_traced("MotionBuilderEngine.__get_pyside_folder")
     def __get_pyside_folder(self):
         """
         Get the correct pyside folder name according to the 
@@ -180,48 +313,60 @@ class MotionBuilderEngine(tank.platform.Engine):
 
         :returns: String of the correct pyside distribution folder name (not the entire path)
         """
-        version = FBSystem().Version
-        folder = ''
-
-        # MotionBuilder 2012 and 2013 use a qt compiled with vs2008 (even though mobu 2013 itself is compiled with 2010).
-        # Use a dumpbin /headers on MoBu's qtcore4.dll to see which linker version was used, since versioning can
-        # easily get confusing.
-        if version < 14000:
-            folder = "pyside112_py26_qt470_win64_vs2008"
-        else:
-            folder = "pyside112_py26_qt470_win64_vs2010"
-
-        return folder
+        return self.host_capabilities.pyside_folder
 
     def post_app_init(self):
-        # default menu name is Shotgun but this can be overriden
-        # in the configuration to be Sgtk in case of conflicts
-        menu_name = "Shotgun"
-        if self.get_setting("use_sgtk_as_menu_name", False):
-            menu_name = "Sgtk"
-            
-        tk_motionbuilder = self.import_module("tk_motionbuilder")                
-        self._menu_generator = tk_motionbuilder.MenuGenerator(self, menu_name)
+        with self._tracer.span("MotionBuilderEngine.post_app_init"):
+            # default menu name is Shotgun but this can be overriden
+            # in the configuration to be Sgtk in case of conflicts
+            menu_name = "Shotgun"
+            if self.get_setting("use_sgtk_as_menu_name", False):
+                menu_name = "Sgtk"
+
+            self._menu_generator = self._tk_motionbuilder.MenuGenerator(self, menu_name)
+            with self._tracer.span("MenuGenerator.create_menu"):
+                self._menu_generator.create_menu()
+
+        # startup is complete
+        self._write_trace()
+
+    @_traced("MotionBuilderEngine.post_context_change")
+    def post_context_change(self, old_context, new_context):
+        """
+        Refreshes the menu after an in-place context change. The context entry
+        is relabeled and commands that are no longer, or newly, available are
+        removed or added. The rest of the menu is left untouched.
+
+        :param old_context: The context being changed away from
+        :param new_context: The new context
+        """
         self._menu_generator.create_menu()
 
     def destroy_engine(self):
-        self.log_debug('%s: Destroying...' % self)
-        self._menu_generator.destroy_menu()
+        with self._tracer.span("MotionBuilderEngine.destroy_engine"):
+            self.log_debug('%s: Destroying...' % self)
+            with self._tracer.span("MenuGenerator.destroy_menu"):
+                self._menu_generator.destroy_menu()
+
+        # add the shutdown to the startup trace
+        self._write_trace()
+
+        # anything logged from now on is printed right away
+        self._log_buffer.close()
+        self._error_queue.close()
 
     def log_debug(self, msg):
-        if self.get_setting("debug_logging", False):
-            print msg
+        self._log_buffer.debug(msg)
 
     def log_info(self, msg):
-        msg = "Shotgun: %s" % msg
-        print msg
+        self._log_buffer.info(msg)
 
     def log_error(self, msg):
-        FBMessageBox( "Shotgun Error",  str(msg), "OK" )
+        self._log_buffer.error(msg)
+        self._error_queue.report(msg)
 
     def log_warning(self, msg):
-        msg = "Shotgun Warning: %s" % msg
-        print msg
+        self._log_buffer.warning(msg)
 
 
 
@@ -11,7 +11,7 @@
 import os
 import sgtk
 
-from pyfbsdk import FBApplication
+from pyfbsdk import FBApplication, FBSystem
 
 mb_app = FBApplication()
 
@@ -58,6 +58,21 @@ class MotionBuilderSessionCollector(HookBaseClass):
                                "to publish plugins via the collected item's "
                                "properties. ",
             },
+            "Collect Takes": {
+                "type": "bool",
+                "default": False,
+                "description": "Create an item for every take of the scene, "
+                               "under the session item, so that takes can be "
+                               "published to their own files.",
+            },
+            "Collect Animation Curves": {
+                "type": "bool",
+                "default": False,
+                "description": "Create an item, under the session item, for "
+                               "the skeleton animation curves of the scene, "
+                               "so that they can be published to a NumPy "
+                               "archive.",
+            },
         }
 
         # update the base settings with these settings
@@ -76,6 +91,15 @@ class MotionBuilderSessionCollector(HookBaseClass):
         # create an item representing the current motion builder session
         item = self.collect_current_motion_builder_session(settings, parent_item)
 
+        # and items representing its takes
+        collect_takes_setting = settings.get("Collect Takes")
+        if collect_takes_setting and collect_takes_setting.value:
+            self.collect_takes(settings, item)
+
+        collect_curves_setting = settings.get("Collect Animation Curves")
+        if collect_curves_setting and collect_curves_setting.value:
+            self.collect_animation_curves(settings, item)
+
     def collect_current_motion_builder_session(self, settings, parent_item):
         """
         Creates an item that represents the current motion builder session.
@@ -117,6 +141,13 @@ class MotionBuilderSessionCollector(HookBaseClass):
         project_root = path
         session_item.properties["project_root"] = project_root
 
+        # describe the session as last saved, read from the file on disk
+        # without loading it
+        if path and os.path.exists(path):
+            fbx_metadata = self._read_fbx_metadata(path)
+            if fbx_metadata:
+                session_item.properties["fbx_metadata"] = fbx_metadata
+
         # if a work template is defined, add it to the item properties so
         # that it can be used by attached publish plugins
         work_template_setting = settings.get("Work Template")
@@ -137,3 +168,89 @@ class MotionBuilderSessionCollector(HookBaseClass):
 
         return session_item
 
+    def collect_takes(self, settings, parent_item):
+        """
+        Creates an item for every take of the current scene.
+
+        :param parent_item: Session item the take items are parented under
+        :returns: List of items of type motionbuilder.fbx.take
+        """
+
+        icon_path = os.path.join(
+            self.disk_location,
+            os.pardir,
+            "icons",
+            "motionbuilder.png"
+        )
+
+        take_items = []
+        for take in FBSystem().Scene.Takes:
+            time_span = take.LocalTimeSpan
+            frame_range = (time_span.GetStart().GetFrame(), time_span.GetStop().GetFrame())
+
+            take_item = parent_item.create_item(
+                "motionbuilder.fbx.take",
+                "Motion Builder Take",
+                "%s (%d-%d)" % (take.Name, frame_range[0], frame_range[1])
+            )
+            take_item.set_icon_from_path(icon_path)
+
+            # used by the take publish plugin to export the take
+            take_item.properties["take_name"] = take.Name
+            take_item.properties["frame_range"] = frame_range
+            take_items.append(take_item)
+
+        self.logger.info("Collected %d Motion Builder take(s)" % (len(take_items),))
+
+        return take_items
+
+    def collect_animation_curves(self, settings, parent_item):
+        """
+        Creates an item representing the skeleton animation curves of the
+        current scene.
+
+        :param parent_item: Session item the curves item is parented under
+        :returns: Item of type motionbuilder.fbx.curves
+        """
+
+        curves_item = parent_item.create_item(
+            "motionbuilder.fbx.curves",
+            "Motion Builder Animation Curves",
+            "Skeleton Animation Curves"
+        )
+
+        icon_path = os.path.join(
+            self.disk_location,
+            os.pardir,
+            "icons",
+            "motionbuilder.png"
+        )
+        curves_item.set_icon_from_path(icon_path)
+
+        self.logger.info("Collected Motion Builder animation curves")
+
+        return curves_item
+
+    def _read_fbx_metadata(self, path):
+        """
+        Reads the version, creator, takes and frame ranges of a saved FBX file.
+
+        :param path: Path of the FBX file
+        :returns: Dictionary of metadata, see fbx_file.read_metadata(), or None
+            if the file isn't a binary FBX file or can't be read
+        """
+        tk_motionbuilder = self.parent.engine.import_module("tk_motionbuilder")
+        fbx_file = tk_motionbuilder.load_publish_support().fbx_file
+        try:
+            metadata = fbx_file.read_metadata(path)
+        except (IOError, OSError, ValueError), e:
+            self.logger.debug("Could not read the FBX metadata of %s: %s" % (path, e))
+            return None
+
+        if metadata:
+            self.logger.debug(
+                "Saved session is FBX %s with %d take(s), written by %s."
+                % (metadata["version"], len(metadata["takes"]), metadata["creator"])
+            )
+        return metadata
+
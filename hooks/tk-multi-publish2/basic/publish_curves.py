@@ -0,0 +1,260 @@
+# Copyright (c) 2017 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import os
+import time
+import sgtk
+
+from pyfbsdk import FBApplication
+
+mb_app = FBApplication()
+
+HookBaseClass = sgtk.get_hook_baseclass()
+
+
+class MotionBuilderCurvesPublishPlugin(HookBaseClass):
+    """
+    Plugin for publishing the skeleton animation curves of a Motion Builder
+    session to a NumPy archive.
+
+    This hook relies on functionality found in the base file publisher hook in
+    the publish2 app and should inherit from it in the configuration. The hook
+    setting for this plugin should look something like this::
+
+        hook: "{self}/publish_file.py:{engine}/tk-multi-publish2/basic/publish_curves.py"
+
+    The curves item is created by the collector when its "Collect Animation
+    Curves" setting is enabled. NumPy must be importable in Motion Builder.
+    """
+
+    @property
+    def name(self):
+        """
+        One line display name describing the plugin
+        """
+        return "Publish animation curves to Shotgun"
+
+    @property
+    def description(self):
+        """
+        Verbose, multi-line description of what the plugin does. This can
+        contain simple html for formatting.
+        """
+        return """
+        Extracts the animation curves of the skeletons in the session to a
+        NumPy <code>.npz</code> archive and publishes it to Shotgun. Tools can
+        then read the curves without loading the scene.<br><br>
+
+        The archive holds the times, values and tangents of the keys of every
+        joint channel of the current take. Unless <code>Compress</code> is
+        set, the arrays are stored uncompressed so that they can be memory
+        mapped.<br><br>
+
+        Curves are read from the session as last saved, so publish the
+        session as well, or save it, for the archive to include the latest
+        changes.<br><br>
+
+        Characters animated through their control rig only have keys on the
+        rig until the animation is plotted to their skeleton. A warning is
+        shown for every character whose skeleton has no keys in the take.
+        """
+
+    @property
+    def settings(self):
+        """
+        Dictionary defining the settings that this plugin expects to receive
+        through the settings parameter in the accept, validate, publish and
+        finalize methods.
+
+        A dictionary on the following form::
+
+            {
+                "Settings Name": {
+                    "type": "settings_type",
+                    "default": "default_value",
+                    "description": "One line description of the setting"
+            }
+
+        The type string should be one of the data types that toolkit accepts as
+        part of its environment configuration.
+        """
+
+        # inherit the settings from the base publish plugin
+        base_settings = super(MotionBuilderCurvesPublishPlugin, self).settings or {}
+
+        # settings specific to this class
+        curves_publish_settings = {
+            "Publish Template": {
+                "type": "template",
+                "default": None,
+                "description": "Template path for published curve archives. "
+                               "Should correspond to a template defined in "
+                               "templates.yml.",
+            },
+            "Compress": {
+                "type": "bool",
+                "default": False,
+                "description": "Compress the archive. Compressed archives are "
+                               "smaller but can't be memory mapped.",
+            },
+            "Model Types": {
+                "type": "list",
+                "values": {"type": "str"},
+                "default": ["LimbNode", "Root"],
+                "description": "FBX types of the models whose curves are "
+                               "extracted.",
+            },
+        }
+
+        # update the base settings
+        base_settings.update(curves_publish_settings)
+
+        return base_settings
+
+    @property
+    def item_filters(self):
+        """
+        List of item types that this plugin is interested in.
+
+        Only items matching entries in this list will be presented to the
+        accept() method. Strings can contain glob patters such as *, for example
+        ["motionbuilder.*", "file.motionbuilder"]
+        """
+        return ["motionbuilder.fbx.curves"]
+
+    def accept(self, settings, item):
+        """
+        Method called by the publisher to determine if an item is of any
+        interest to this plugin. Only items matching the filters defined via the
+        item_filters property will be presented to this method.
+
+        :param settings: Dictionary of Settings. The keys are strings, matching
+            the keys returned in the settings property. The values are `Setting`
+            instances.
+        :param item: Item to process
+
+        :returns: dictionary with boolean keys accepted, required and enabled
+        """
+
+        tk_motionbuilder = self.parent.engine.import_module("tk_motionbuilder")
+        if not tk_motionbuilder.load_anim_curves().is_available():
+            self.logger.debug("NumPy can't be imported, animation curves won't be published.")
+            return {"accepted": False}
+
+        # because a publish template is configured, disable context change. This
+        # is a temporary measure until the publisher handles context switching
+        # natively.
+        publish_util = tk_motionbuilder.load_publish_support().publish_util
+        if publish_util.setting_value(settings, "Publish Template", None):
+            item.context_change_allowed = False
+
+        return {
+            "accepted": True,
+            "checked": True
+        }
+
+    def validate(self, settings, item):
+        """
+        Validates the given item to check that it is ok to publish. Returns a
+        boolean to indicate validity.
+
+        :param settings: Dictionary of Settings. The keys are strings, matching
+            the keys returned in the settings property. The values are `Setting`
+            instances.
+        :param item: Item to process
+        :returns: True if item is valid, False otherwise.
+        """
+
+        session_path = _session_path()
+        if not session_path:
+            error_msg = "The Motion Builder session has not been saved."
+            self.logger.error(error_msg)
+            raise Exception(error_msg)
+
+        # the path the curves are written to is the one published
+        item.properties["path"] = self._get_archive_path(
+            settings, item, sgtk.util.ShotgunPath.normalize(session_path))
+
+        # run the base class validation
+        return super(MotionBuilderCurvesPublishPlugin, self).validate(settings, item)
+
+    def publish(self, settings, item):
+        """
+        Executes the publish logic for the given item and settings.
+
+        :param settings: Dictionary of Settings. The keys are strings, matching
+            the keys returned in the settings property. The values are `Setting`
+            instances.
+        :param item: Item to process
+        """
+        tk_motionbuilder = self.parent.engine.import_module("tk_motionbuilder")
+        anim_curves = tk_motionbuilder.load_anim_curves()
+        setting_value = tk_motionbuilder.load_publish_support().publish_util.setting_value
+
+        session_path = _session_path()
+        path = item.properties["path"]
+
+        start = time.time()
+        curves = anim_curves.extract_curves(
+            session_path,
+            tuple(setting_value(settings, "Model Types", anim_curves.SKELETON_MODEL_TYPES)),
+        )
+        extracted = time.time()
+        for character_name in curves["unkeyed_characters"]:
+            self.logger.warning(
+                "The skeleton of the character '%s' has no keys in the take. Plot "
+                "its animation to the skeleton for its curves to be published."
+                % (character_name,)
+            )
+        anim_curves.write_archive(curves, path, setting_value(settings, "Compress", False))
+
+        self.logger.info(
+            "Extracted %d keys of %d channels in %.2f s, wrote %.1f MB to %s in %.2f s."
+            % (len(curves["times"]), len(curves["channel_names"]), extracted - start,
+               os.path.getsize(path) / (1024.0 * 1024.0), path, time.time() - extracted)
+        )
+
+        # register the archive
+        super(MotionBuilderCurvesPublishPlugin, self).publish(settings, item)
+
+    def _get_archive_path(self, settings, item, session_path):
+        """
+        Returns the path the curves are written to.
+
+        :param settings: Dictionary of Settings
+        :param item: Curves item
+        :param session_path: Path of the saved session
+        """
+        tk_motionbuilder = self.parent.engine.import_module("tk_motionbuilder")
+        publish_util = tk_motionbuilder.load_publish_support().publish_util
+
+        publish_template = None
+        publish_template_name = publish_util.setting_value(settings, "Publish Template", None)
+        if publish_template_name:
+            publish_template = self.parent.engine.get_template_by_name(publish_template_name)
+        work_template = item.parent.properties.get("work_template")
+
+        if publish_template and work_template and work_template.validate(session_path):
+            return publish_template.apply_fields(work_template.get_fields(session_path))
+
+        # next to the session
+        return publish_util.derived_path(session_path, "curves", ".npz")
+
+
+def _session_path():
+    """
+    Return the path to the current session
+    :return:
+    """
+    path = mb_app.FBXFileName
+    if isinstance(path, unicode):
+        path = path.encode("utf-8")
+
+    return path
@@ -9,6 +9,8 @@
 # not expressly granted therein are reserved by Shotgun Software Inc.
 
 import os
+import sys
+import time
 import sgtk
 
 from pyfbsdk import FBApplication, FBFilePopup, FBFilePopupStyle
@@ -30,6 +32,12 @@ class MotionBuilderSessionPublishPlugin(HookBaseClass):
 
     """
 
+    def __init__(self, *args, **kwargs):
+        super(MotionBuilderSessionPublishPlugin, self).__init__(*args, **kwargs)
+        # names of the files in the work folders checked for existing
+        # versions, see _version_exists()
+        self._version_listings = {}
+
     # NOTE: The plugin icon and name are defined by the base file plugin.
     @property
     def description(self):
@@ -118,6 +126,34 @@ class MotionBuilderSessionPublishPlugin(HookBaseClass):
                                "correspond to a template defined in "
                                "templates.yml.",
             },
+            "Save Once": {
+                "type": "bool",
+                "default": True,
+                "description": "Create the next version of the work file by "
+                               "copying the file saved for the publish, "
+                               "instead of saving the scene a second time.",
+            },
+            "Copy Buffer Size": {
+                "type": "int",
+                "default": 16,
+                "description": "Size in MB of the chunks the session file is "
+                               "copied in, to the publish location and to "
+                               "the next version.",
+            },
+            "Checksum Field": {
+                "type": "str",
+                "default": None,
+                "description": "Optional PublishedFile field the checksum of "
+                               "the published session file is stored in.",
+            },
+            "Deduplicate Publishes": {
+                "type": "bool",
+                "default": False,
+                "description": "Hardlink the published session file to an "
+                               "earlier publish with the same content, "
+                               "leaving out the save time stamps, to save "
+                               "disk space.",
+            },
         }
 
         # update the base settings
@@ -254,11 +290,11 @@ class MotionBuilderSessionPublishPlugin(HookBaseClass):
         # disk. if so, warn the user and provide the ability to jump to save
         # to that version now
         (next_version_path, version) = self._get_next_version_info(path, item)
-        if next_version_path and os.path.exists(next_version_path):
+        if next_version_path and self._version_exists(next_version_path):
 
             # determine the next available version_number. just keep asking for
             # the next one until we get one that doesn't exist.
-            while os.path.exists(next_version_path):
+            while next_version_path and self._version_exists(next_version_path):
                 (next_version_path, version) = self._get_next_version_info(
                     next_version_path, item)
 
@@ -270,7 +306,7 @@ class MotionBuilderSessionPublishPlugin(HookBaseClass):
                         "label": "Save to v%s" % (version,),
                         "tooltip": "Save to the next available version number, "
                                    "v%s" % (version,),
-                        "callback": lambda: _save_session(next_version_path)
+                        "callback": lambda: self._save_version(next_version_path)
                     }
                 }
             )
@@ -312,7 +348,14 @@ class MotionBuilderSessionPublishPlugin(HookBaseClass):
         # update the item with the saved session path
         item.properties["path"] = path
 
-        # let the base class register the publish
+        # remember what was saved, so that finalize can version up by copying
+        # the file rather than saving the scene again
+        tk_motionbuilder = self.parent.engine.import_module("tk_motionbuilder")
+        publish_util = tk_motionbuilder.load_publish_support().publish_util
+        item.properties["saved_session"] = (path, publish_util.file_signature(path))
+
+        # let the base class copy the file to the publish location, see
+        # _copy_work_to_publish(), and register the publish
         super(MotionBuilderSessionPublishPlugin, self).publish(settings, item)
 
     def finalize(self, settings, item):
@@ -330,7 +373,215 @@ class MotionBuilderSessionPublishPlugin(HookBaseClass):
         super(MotionBuilderSessionPublishPlugin, self).finalize(settings, item)
 
         # bump the session file to the next version
-        self._save_to_next_version(item.properties["path"], item, _save_session)
+        tk_motionbuilder = self.parent.engine.import_module("tk_motionbuilder")
+        publish_util = tk_motionbuilder.load_publish_support().publish_util
+        saved_session = None
+        if publish_util.setting_value(settings, "Save Once", True):
+            saved_session = item.properties.get("saved_session")
+        self._save_to_next_version(
+            item.properties["path"],
+            item,
+            lambda next_version_path: self._save_version(
+                next_version_path,
+                saved_session,
+                publish_util.setting_value(settings, "Copy Buffer Size", 16)
+            )
+        )
+
+    def _copy_work_to_publish(self, settings, item):
+        """
+        Copies the saved session to the publish location, if a publish
+        template is configured.
+
+        The file is streamed in large chunks, reporting progress to the
+        publisher log, and its MD5 checksum is computed along the way. The
+        checksum is stored in the "publish_checksum" item property and, if the
+        "Checksum Field" setting is set, in that field of the publish.
+
+        If the "Deduplicate Publishes" setting is set and a file published
+        earlier from this machine may have the same content, the session is
+        hashed first. If it matches, the publish is hardlinked to that file
+        and nothing is copied, see _link_to_earlier_publish(). Otherwise the
+        content hash is computed during the copy, so that later publishes can
+        be matched against this one.
+
+        :param settings: Dictionary of Settings
+        :param item: Item to process
+        """
+        work_template = item.properties.get("work_template")
+        publish_template = item.properties.get("publish_template")
+        if not work_template or not publish_template:
+            self.logger.debug(
+                "Work and publish templates are required to copy the work "
+                "file to the publish location.")
+            return
+
+        work_path = item.properties["path"]
+        publish_path = self.get_publish_path(settings, item)
+        if not publish_path or publish_path == work_path:
+            return
+
+        tk_motionbuilder = self.parent.engine.import_module("tk_motionbuilder").load_publish_support()
+        publish_util = tk_motionbuilder.publish_util
+        publish_index = None
+        content_hasher = None
+        if publish_util.setting_value(settings, "Deduplicate Publishes", False):
+            publish_index = self._get_publish_index()
+            if publish_index is not None:
+                content_hasher = tk_motionbuilder.fbx_file.ContentHasher(work_path)
+
+        checksum = None
+        content_hash = None
+        if content_hasher is not None and publish_index.has_content_size(
+                content_hasher.content_size):
+            # an earlier publish may be identical, hash the session before
+            # copying it
+            start = time.time()
+            content_hash = content_hasher.hash_file()
+            checksum = self._link_to_earlier_publish(
+                publish_index, publish_path, content_hash, content_hasher.content_size,
+                time.time() - start)
+
+        if checksum is None:
+            self.logger.info("Copying the session to the publish location...")
+            (checksum, size, seconds) = publish_util.stream_copy(
+                work_path,
+                publish_path,
+                publish_util.setting_value(settings, "Copy Buffer Size", 16),
+                publish_util.ProgressLog(self.logger, "Copied to the publish location"),
+                content_hasher=content_hasher if content_hash is None else None,
+            )
+            self.logger.info(
+                "Copied %.1f MB to %s in %.1f s (%.1f MB/s)."
+                % (size / publish_util.MB, publish_path, seconds,
+                   publish_util.throughput(size, seconds))
+            )
+            if content_hasher is not None:
+                if content_hash is None:
+                    content_hash = content_hasher.hexdigest()
+                publish_index.add(publish_path, checksum, content_hash,
+                                  content_hasher.content_size, seconds)
+
+        if publish_index is not None:
+            try:
+                publish_index.save()
+            except (IOError, OSError), e:
+                self.logger.debug("Could not save the publish index: %s" % (e,))
+
+        item.properties["publish_checksum"] = checksum
+        checksum_field = publish_util.setting_value(settings, "Checksum Field", None)
+        if checksum_field:
+            publish_kwargs = item.properties.setdefault("publish_kwargs", {})
+            publish_kwargs.setdefault("sg_fields", {})[checksum_field] = checksum
+
+    def _get_publish_index(self):
+        """
+        Returns the index of the sessions published from this machine, None
+        if the publisher has no cache location to store it in.
+        """
+        cache_location = getattr(self.parent, "cache_location", None)
+        if not cache_location:
+            self.logger.debug("No cache location, publishes won't be deduplicated.")
+            return None
+        tk_motionbuilder = self.parent.engine.import_module("tk_motionbuilder").load_publish_support()
+        return tk_motionbuilder.publish_index.PublishHashIndex(
+            os.path.join(cache_location, "motionbuilder_publish_index.json"))
+
+    def _link_to_earlier_publish(self, publish_index, publish_path, content_hash, content_size,
+                                 hash_seconds):
+        """
+        Hardlinks the publish location to an earlier publish with the same
+        content as the saved session, if there is one, instead of copying the
+        session. Published files are never written to again, so they can
+        safely share their data.
+
+        Motionbuilder records the time and the path of the save in every FBX
+        file, so content is compared leaving those out. The earlier publish
+        is linked, as is, rather than the new file.
+
+        :param publish_index: PublishHashIndex of earlier publishes
+        :param publish_path: Path of the new publish
+        :param content_hash: Content hash of the saved session
+        :param content_size: Number of bytes hashed of the saved session
+        :param hash_seconds: Time it took to hash the saved session
+        :returns: Checksum of the linked file, or None if the session needs
+            to be copied
+        """
+        entry = publish_index.find(content_hash, content_size)
+        if entry is None or entry["path"] == publish_path:
+            return None
+
+        folder = os.path.dirname(publish_path)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+
+        # link next to the publish location first, so that it never holds a
+        # partial file
+        link_path = "%s.link" % (publish_path,)
+        if os.path.exists(link_path):
+            os.remove(link_path)
+        if not _link_file(entry["path"], link_path):
+            self.logger.debug("Could not hardlink %s, the session will be copied."
+                              % (entry["path"],))
+            return None
+        if os.path.exists(publish_path):
+            os.remove(publish_path)
+        os.rename(link_path, publish_path)
+
+        self.logger.info(
+            "The session is identical to the publish %s, linked it instead of "
+            "copying %.1f MB, saving about %.1f s."
+            % (entry["path"], entry["size"] / (1024.0 * 1024.0),
+               max(entry["copy_seconds"] - hash_seconds, 0.0))
+        )
+
+        publish_index.add(publish_path, entry["checksum"], entry["content_hash"],
+                          entry["content_size"], entry["copy_seconds"])
+        return entry["checksum"]
+
+    def _version_exists(self, path):
+        """
+        Checks if a version of the work file exists on disk.
+
+        The folder holding the versions is listed once, the first time one
+        of its files is checked, and the listing is kept for the rest of the
+        publish session. Work areas with many versions then don't need a
+        file system round-trip per version.
+
+        :param path: Path of the version to check
+        :returns: True if the file exists
+        """
+        (folder, file_name) = os.path.split(path)
+        if folder not in self._version_listings:
+            try:
+                names = os.listdir(folder)
+            except OSError:
+                # the folder doesn't exist (yet)
+                names = []
+            self._version_listings[folder] = set(os.path.normcase(name) for name in names)
+        return os.path.normcase(file_name) in self._version_listings[folder]
+
+    def _save_version(self, path, saved_session=None, buffer_size=16):
+        """
+        Saves the session to a new version and records it in the listing
+        used by _version_exists().
+
+        :param path: Path to save the session to
+        :param saved_session: Optional tuple of the path and signature of the
+            file the session was last saved to. If the session is still
+            current and the file hasn't changed since, it is copied to the
+            new version instead of saving the scene again.
+        :param buffer_size: Size in MB of the chunks the file is copied in
+        """
+        tk_motionbuilder = self.parent.engine.import_module("tk_motionbuilder")
+        publish_util = tk_motionbuilder.load_publish_support().publish_util
+        if not (saved_session and publish_util.copy_saved_session(saved_session, path,
+                                                                  self.logger, buffer_size)):
+            _save_session(path)
+        (folder, file_name) = os.path.split(path)
+        listing = self._version_listings.get(folder)
+        if listing is not None:
+            listing.add(os.path.normcase(file_name))
 
 def _session_path():
     """
@@ -352,6 +603,35 @@ def _save_session(path):
     mb_app.FileSave(path)
 
 
+def _link_file(source, destination):
+    """
+    Creates a hardlink, returns False if the platform or file system doesn't
+    support it.
+    """
+    try:
+        if hasattr(os, "link"):
+            os.link(source, destination)
+            return True
+        if sys.platform == "win32":
+            # python 2 has no os.link on windows
+            import ctypes
+            return bool(ctypes.windll.kernel32.CreateHardLinkW(
+                _to_unicode(destination), _to_unicode(source), None))
+    except (OSError, UnicodeDecodeError):
+        # the file is copied instead
+        pass
+    return False
+
+
+def _to_unicode(path):
+    """
+    Decodes a path encoded in UTF-8, like the session path.
+    """
+    if isinstance(path, unicode):
+        return path
+    return path.decode("utf-8")
+
+
 def _save_as_session():
     """
     Save the current session to the supplied path.
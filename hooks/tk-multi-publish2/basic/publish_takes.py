@@ -0,0 +1,357 @@
+# Copyright (c) 2017 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import re
+import time
+import sgtk
+
+from pyfbsdk import FBApplication, FBSystem
+
+mb_app = FBApplication()
+
+HookBaseClass = sgtk.get_hook_baseclass()
+
+
+class MotionBuilderTakePublishPlugin(HookBaseClass):
+    """
+    Plugin for publishing the takes of a Motion Builder session to their own
+    files.
+
+    This hook relies on functionality found in the base file publisher hook in
+    the publish2 app and should inherit from it in the configuration. The hook
+    setting for this plugin should look something like this::
+
+        hook: "{self}/publish_file.py:{engine}/tk-multi-publish2/basic/publish_takes.py"
+
+    The take items are created by the collector when its "Collect Takes"
+    setting is enabled.
+    """
+
+    @property
+    def name(self):
+        """
+        One line display name describing the plugin
+        """
+        return "Publish take to Shotgun"
+
+    @property
+    def description(self):
+        """
+        Verbose, multi-line description of what the plugin does. This can
+        contain simple html for formatting.
+        """
+        return """
+        Exports the take to its own FBX file and publishes that file to
+        Shotgun.<br><br>
+
+        Takes are exported from the session as last saved, so publish the
+        session as well, or save it, for the takes to include the latest
+        changes.<br><br>
+
+        All the takes being published are exported at the same time, each by
+        its own batch Motion Builder process. The
+        <code>Max Parallel Exports</code> setting limits how many of these
+        processes run at once.<br><br>
+
+        If a publish template is configured, takes are exported to the path it
+        gives, using the fields of the session work file and the take name as
+        the <code>take</code> field. Otherwise, takes are exported to a
+        <code>takes</code> folder next to the session file.
+        """
+
+    @property
+    def settings(self):
+        """
+        Dictionary defining the settings that this plugin expects to receive
+        through the settings parameter in the accept, validate, publish and
+        finalize methods.
+
+        A dictionary on the following form::
+
+            {
+                "Settings Name": {
+                    "type": "settings_type",
+                    "default": "default_value",
+                    "description": "One line description of the setting"
+            }
+
+        The type string should be one of the data types that toolkit accepts as
+        part of its environment configuration.
+        """
+
+        # inherit the settings from the base publish plugin
+        base_settings = super(MotionBuilderTakePublishPlugin, self).settings or {}
+
+        # settings specific to this class
+        take_publish_settings = {
+            "Publish Template": {
+                "type": "template",
+                "default": None,
+                "description": "Template path for published takes. Should "
+                               "correspond to a template defined in "
+                               "templates.yml, with a take key.",
+            },
+            "Max Parallel Exports": {
+                "type": "int",
+                "default": 4,
+                "description": "Maximum number of Motion Builder processes "
+                               "exporting takes at the same time. Every "
+                               "process loads the whole scene.",
+            },
+            "Export Timeout": {
+                "type": "int",
+                "default": 0,
+                "description": "Time in seconds after which a take export is "
+                               "abandoned, 0 to wait as long as it takes.",
+            },
+            "Motion Builder Executable": {
+                "type": "str",
+                "default": None,
+                "description": "Motion Builder executable the takes are "
+                               "exported with, defaults to the running one.",
+            },
+        }
+
+        # update the base settings
+        base_settings.update(take_publish_settings)
+
+        return base_settings
+
+    @property
+    def item_filters(self):
+        """
+        List of item types that this plugin is interested in.
+
+        Only items matching entries in this list will be presented to the
+        accept() method. Strings can contain glob patters such as *, for example
+        ["motionbuilder.*", "file.motionbuilder"]
+        """
+        return ["motionbuilder.fbx.take"]
+
+    def accept(self, settings, item):
+        """
+        Method called by the publisher to determine if an item is of any
+        interest to this plugin. Only items matching the filters defined via the
+        item_filters property will be presented to this method.
+
+        :param settings: Dictionary of Settings. The keys are strings, matching
+            the keys returned in the settings property. The values are `Setting`
+            instances.
+        :param item: Item to process
+
+        :returns: dictionary with boolean keys accepted, required and enabled
+        """
+
+        # because a publish template is configured, disable context change. This
+        # is a temporary measure until the publisher handles context switching
+        # natively.
+        tk_motionbuilder = self.parent.engine.import_module("tk_motionbuilder")
+        publish_util = tk_motionbuilder.load_publish_support().publish_util
+        if publish_util.setting_value(settings, "Publish Template", None):
+            item.context_change_allowed = False
+
+        return {
+            "accepted": True,
+            "checked": True
+        }
+
+    def validate(self, settings, item):
+        """
+        Validates the given item to check that it is ok to publish. Returns a
+        boolean to indicate validity.
+
+        :param settings: Dictionary of Settings. The keys are strings, matching
+            the keys returned in the settings property. The values are `Setting`
+            instances.
+        :param item: Item to process
+        :returns: True if item is valid, False otherwise.
+        """
+
+        session_path = _session_path()
+        if not session_path:
+            error_msg = "The Motion Builder session has not been saved."
+            self.logger.error(error_msg)
+            raise Exception(error_msg)
+
+        take_name = item.properties["take_name"]
+        if take_name not in [take.Name for take in FBSystem().Scene.Takes]:
+            error_msg = "The take '%s' no longer exists in the scene." % (take_name,)
+            self.logger.error(error_msg)
+            raise Exception(error_msg)
+
+        # the path the take is exported to is the one published
+        path = self._get_take_path(settings, item, sgtk.util.ShotgunPath.normalize(session_path))
+        item.properties["path"] = path
+
+        # register the take with the session item, all the takes validated
+        # and still checked are exported together when the first one is
+        # published
+        tk_motionbuilder = self.parent.engine.import_module("tk_motionbuilder").load_publish_support()
+        job = tk_motionbuilder.take_export.TakeExportJob(
+            session_path, take_name, path, item.properties.get("frame_range"))
+        item.properties.pop("take_export_result", None)
+        item.parent.properties.setdefault("take_exports", {})[take_name] = (item, job)
+
+        self.logger.info("Take '%s' will be exported to %s" % (take_name, path))
+
+        # run the base class validation
+        return super(MotionBuilderTakePublishPlugin, self).validate(settings, item)
+
+    def publish(self, settings, item):
+        """
+        Executes the publish logic for the given item and settings.
+
+        :param settings: Dictionary of Settings. The keys are strings, matching
+            the keys returned in the settings property. The values are `Setting`
+            instances.
+        :param item: Item to process
+        """
+
+        if "take_export_result" not in item.properties:
+            self._export_takes(settings, item.parent)
+
+        result = item.properties["take_export_result"]
+        if not result.succeeded:
+            error_msg = "Could not export the take '%s': %s" % (
+                item.properties["take_name"], result.error)
+            self.logger.error(error_msg, extra={
+                "action_show_more_info": {
+                    "label": "Show Output",
+                    "tooltip": "Show the output of the export process",
+                    "text": "<pre>%s</pre>" % (result.output,),
+                }
+            })
+            raise Exception(error_msg)
+
+        item.properties["export_seconds"] = result.seconds
+
+        # register the exported take
+        super(MotionBuilderTakePublishPlugin, self).publish(settings, item)
+
+    def _export_takes(self, settings, session_item):
+        """
+        Exports every take registered with the session item that hasn't been
+        exported yet, in parallel, and stores the outcome of each export in
+        the "take_export_result" property of its item.
+
+        Takes are registered when validated. Those unchecked since are no
+        longer part of the publish, they are forgotten instead of exported.
+
+        :param settings: Dictionary of Settings
+        :param session_item: Session item the take items are parented under
+        """
+        tk_motionbuilder = self.parent.engine.import_module("tk_motionbuilder").load_publish_support()
+        setting_value = tk_motionbuilder.publish_util.setting_value
+
+        # export the session as it is now saved
+        session_path = _session_path()
+        take_exports = session_item.properties.get("take_exports", {})
+        pending = []
+        for (take_name, (take_item, job)) in take_exports.items():
+            if not take_item.active:
+                self.logger.debug("Take '%s' was unchecked, it won't be exported." % (take_name,))
+                del take_exports[take_name]
+            elif "take_export_result" not in take_item.properties:
+                job.source_path = session_path
+                pending.append((take_item, job))
+
+        max_workers = max(1, setting_value(settings, "Max Parallel Exports", 4))
+        pool = tk_motionbuilder.take_export.TakeExportPool(
+            self._get_exporter_backend(settings),
+            max_workers,
+            setting_value(settings, "Export Timeout", 0) or None,
+        )
+
+        self.logger.info(
+            "Exporting %d take(s), %d at a time..."
+            % (len(pending), min(max_workers, len(pending)))
+        )
+
+        def log_result(result):
+            if result.succeeded:
+                self.logger.info(
+                    "Exported take '%s' in %.1f s." % (result.job.take_name, result.seconds))
+            else:
+                self.logger.warning(
+                    "Export of take '%s' failed after %.1f s."
+                    % (result.job.take_name, result.seconds))
+
+        start = time.time()
+        results = pool.export([job for (take_item, job) in pending], log_result)
+        elapsed = time.time() - start
+
+        for ((take_item, job), result) in zip(pending, results):
+            take_item.properties["take_export_result"] = result
+
+        self.logger.info(
+            "Exported %d of %d take(s) in %.1f s, %.1f s of export time."
+            % (len([result for result in results if result.succeeded]), len(results),
+               elapsed, sum(result.seconds for result in results))
+        )
+
+    def _get_exporter_backend(self, settings):
+        """
+        Returns the backend starting the processes that export the takes.
+        Override this method to export takes with another program.
+
+        :param settings: Dictionary of Settings
+        :returns: tk_motionbuilder.take_export.ExporterBackend instance
+        """
+        tk_motionbuilder = self.parent.engine.import_module("tk_motionbuilder").load_publish_support()
+        return tk_motionbuilder.take_export.ExporterBackend(
+            tk_motionbuilder.publish_util.setting_value(
+                settings, "Motion Builder Executable", None))
+
+    def _get_take_path(self, settings, item, session_path):
+        """
+        Returns the path a take is exported to.
+
+        :param settings: Dictionary of Settings
+        :param item: Take item
+        :param session_path: Path of the saved session
+        """
+        take_name = _sanitize_name(item.properties["take_name"])
+        tk_motionbuilder = self.parent.engine.import_module("tk_motionbuilder")
+        publish_util = tk_motionbuilder.load_publish_support().publish_util
+
+        publish_template = None
+        publish_template_name = publish_util.setting_value(settings, "Publish Template", None)
+        if publish_template_name:
+            publish_template = self.parent.engine.get_template_by_name(publish_template_name)
+        work_template = item.parent.properties.get("work_template")
+
+        if publish_template and work_template and work_template.validate(session_path):
+            fields = work_template.get_fields(session_path)
+            fields["take"] = take_name
+            return publish_template.apply_fields(fields)
+
+        # in a takes folder next to the session
+        return publish_util.derived_path(session_path, take_name, folder_name="takes")
+
+
+def _session_path():
+    """
+    Return the path to the current session
+    :return:
+    """
+    path = mb_app.FBXFileName
+    if isinstance(path, unicode):
+        path = path.encode("utf-8")
+
+    return path
+
+
+def _sanitize_name(name):
+    """
+    Returns a take name usable in a file name.
+    """
+    if isinstance(name, unicode):
+        name = name.encode("utf-8")
+    return re.sub(r"[^\w.-]+", "_", name).strip("_") or "take"
@@ -97,7 +97,15 @@ class MotionBuilderStartVersionControlPlugin(HookBaseClass):
         The type string should be one of the data types that toolkit accepts as
         part of its environment configuration.
         """
-        return {}
+        return {
+            "Save Once": {
+                "type": "bool",
+                "default": True,
+                "description": "Create the versioned file by copying the "
+                               "saved session, instead of saving the scene a "
+                               "second time.",
+            },
+        }
 
     def accept(self, settings, item):
         """
@@ -222,14 +230,27 @@ class MotionBuilderStartVersionControlPlugin(HookBaseClass):
         # are appropriate for current os, no double separators, etc.
         path = sgtk.util.ShotgunPath.normalize(_session_path())
 
-        # ensure the session is saved in its current state
-        _save_session(path)
-
         # get the path to a versioned copy of the file.
         version_path = publisher.util.get_version_path(path, "v001")
 
-        # save to the new version path
-        _save_session(version_path)
+        # the file may have been created since the validation
+        if os.path.exists(version_path):
+            error_msg = "A file already exists with a version number. Please choose another name."
+            self.logger.error(error_msg, extra=_get_save_as_action())
+            raise Exception(error_msg)
+
+        # ensure the session is saved in its current state
+        _save_session(path)
+
+        # save to the new version path. the scene was just saved, so a copy
+        # of that file is all that's needed
+        tk_motionbuilder = self.parent.engine.import_module("tk_motionbuilder")
+        publish_util = tk_motionbuilder.load_publish_support().publish_util
+        if not publish_util.setting_value(settings, "Save Once", True):
+            _save_session(version_path)
+        elif not publish_util.copy_saved_session(
+                (path, publish_util.file_signature(path)), version_path, self.logger):
+            _save_session(version_path)
         self.logger.info("A version number has been added to the Motion Builder file...")
         self.logger.info("  Motion Builder file path: %s" % (version_path,))
 
@@ -24,7 +24,42 @@ from pyfbsdk import FBMessageBox
 from pyfbsdk import FBMenuManager
 
 # local libs
+from .context_change import ContextChangeScheduler
+from .process_state import get_process_state
 from .menu_generation import MenuGenerator
+from .menu_generation import set_menu_retained, discard_retained_menus
+from .menu_generation import clear_menu, get_menu_bindings
+from .tracing import StartupTracer
+from .log_buffer import EngineLogBuffer
+from .error_reporting import ErrorQueue
+from .exception_trap import ExceptionTrap
+from .main_window import get_main_window
+from .host_capabilities import get_host_capabilities
+from .pyside_bootstrap import add_pyside_paths, add_qt_plugin_path
+from .pyside_bootstrap import get_bootstrap_manifest, timed_import
+
+
+def load_publish_support():
+    """
+    Imports the modules only used by the publish hooks: fbx_file,
+    publish_index, publish_util and take_export. They are left out of the
+    import of the package, which runs on every engine start.
+
+    :returns: This package, holding the modules as attributes
+    """
+    from . import fbx_file, publish_index, publish_util, take_export
+    return sys.modules[__name__]
+
+
+def load_anim_curves():
+    """
+    Imports the anim_curves module, only used when publishing animation
+    curves. It imports NumPy.
+
+    :returns: The anim_curves module
+    """
+    from . import anim_curves
+    return anim_curves
 
 
 def __show_tank_disabled_message(details):
@@ -47,11 +82,13 @@ def __create_tank_disabled_menu(details):
     if not menu:
         menu_mgr.InsertBefore(None, "Help", "Shotgun")
         menu = menu_mgr.GetMenu("Shotgun")
+    # drop any entry and handler left by a previous disabled menu
+    clear_menu("Shotgun", menu)
     menu.InsertLast("Sgtk is disabled.", 1)
 
     def menu_event(control, event):
         __show_tank_disabled_message(details)
-    menu.OnMenuActivate.Add(menu_event)
+    get_menu_bindings("Shotgun").bind(menu, "OnMenuActivate", menu_event)
 
 
 def __create_tank_error_menu():
@@ -72,14 +109,77 @@ def __create_tank_error_menu():
     if not menu:
         menu_mgr.InsertBefore(None, "Help", "Shotgun")
         menu = menu_mgr.GetMenu("Shotgun")
+    clear_menu("Shotgun", menu)
     menu.InsertLast("[Shotgun Error - Click for details]", 1)
 
     def menu_event(control, event):
         FBMessageBox( "Shotgun Error",  message, "OK" )
-    menu.OnMenuActivate.Add(menu_event)
+    get_menu_bindings("Shotgun").bind(menu, "OnMenuActivate", menu_event)
+
+
+def __can_change_context_in_place(tk, engine, new_context):
+    """
+    Checks if the running engine can switch to the new context without being
+    restarted. This is the case when the core supports context changes and
+    the new context resolves to the same environment as the current one.
+    """
+    if not hasattr(tank.platform, "change_context") or not engine.context_change_allowed:
+        return False
+
+    try:
+        env_name = (tk or engine.sgtk).execute_core_hook("pick_environment", context=new_context)
+    except Exception, e:
+        engine.log_debug("Could not determine the environment of %s: %s" % (new_context, e))
+        return False
+
+    return env_name == engine.environment["name"]
+
+
+def __get_context_change_scheduler():
+    """
+    Returns the process-wide scheduler of engine refreshes. The coalescing
+    window, in milliseconds, is read from TANK_MOTIONBUILDER_CONTEXT_CHANGE_WINDOW.
+    Coalescing is off unless it is set, so that scripts and batch sessions,
+    which have no idle loop, get the new engine as soon as a file is opened.
+    """
+    def create_scheduler():
+        try:
+            window = int(os.environ.get("TANK_MOTIONBUILDER_CONTEXT_CHANGE_WINDOW", 0))
+        except ValueError:
+            window = 0
+        return ContextChangeScheduler(window / 1000.0)
+
+    return get_process_state("context_change_scheduler", create_scheduler)
+
+
+def flush_engine_refresh():
+    """
+    Runs any pending engine refresh right away. Scripts that open a file and
+    need the engine for the new context straight after should call this.
+    """
+    __get_context_change_scheduler().flush()
+
+
+def get_engine_refresh_stats():
+    """
+    Returns counters of the engine refreshes: how many were requested, how
+    many were run and how many were avoided by coalescing bursts.
+
+    :returns: Dictionary with keys requested, run and coalesced
+    """
+    return dict(__get_context_change_scheduler().stats)
 
 
 def __engine_refresh(tk, new_context):
+    """
+    Requests the Shotgun engine to be refreshed for a new context. If a
+    coalescing window is set, bursts of requests are coalesced and only the
+    last one is run.
+    """
+    __get_context_change_scheduler().request(__run_engine_refresh, tk, new_context)
+
+
+def __run_engine_refresh(tk, new_context):
     """
     Checks the the Shotgun engine should be
     """
@@ -92,15 +192,35 @@ def __engine_refresh(tk, new_context):
         if new_context == curr_engine.context:
             # no need to restart the engine!
             return
+        elif __can_change_context_in_place(tk, curr_engine, new_context):
+            # same environment - the apps stay loaded and only the context
+            # dependent parts of the engine are refreshed
+            try:
+                tank.platform.change_context(new_context)
+            except tank.TankEngineInitError, e:
+                # the core fell back to a restart, which failed
+                discard_retained_menus()
+                __create_tank_disabled_menu(e)
+            return
         else:
-            # shut down the engine
-            curr_engine.destroy()
+            # shut down the engine, but leave its menu in place so that the
+            # new engine only needs to update the entries that changed
+            set_menu_retained(True)
+            try:
+                curr_engine.destroy()
+            finally:
+                set_menu_retained(False)
 
     # try to create new engine
     try:
         tank.platform.start_engine(engine_name, tk, new_context)
     except tank.TankEngineInitError, e:
         # context was not sufficient! - disable tank!
+        discard_retained_menus()
         __create_tank_disabled_menu(e)
+    except:
+        # don't leave a stale menu behind
+        discard_retained_menus()
+        raise
 
 
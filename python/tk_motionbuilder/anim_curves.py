@@ -0,0 +1,379 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Extraction of the skeleton animation curves of a saved FBX file to NumPy
+arrays, and their storage in .npz archives.
+
+FBX files store the keys of every curve as arrays of times, values and
+tangent attributes. These arrays are read straight from the saved file and
+converted with numpy.frombuffer, without any python call per key.
+
+The curves of all the channels are concatenated into single arrays, indexed
+by channel_offsets:
+
+- channel_names: Name of every channel, "<joint>.<property>.<axis>", for
+  example "Hips.Lcl Rotation.X"
+- channel_offsets: int64, the keys of channel i are in [offsets[i], offsets[i + 1])
+- times: float64, time of every key in seconds
+- values: float32, value of every key
+- left_tangents, right_tangents: float32, derivatives on both sides of every key
+- flags: int32, FBX key attribute flags of every key, holding the
+  interpolation and tangent modes
+- unkeyed_characters: Names of the characters whose skeleton has no keys in
+  the take, usually because they are animated through their control rig and
+  haven't been plotted to the skeleton
+
+NumPy is not shipped with Motionbuilder. is_available() tells whether it
+can be imported.
+
+"""
+import os
+import mmap
+import zlib
+import struct
+import zipfile
+
+try:
+    import numpy
+    from numpy.lib import format as npy_format
+except ImportError:
+    numpy = None
+
+from . import fbx_file
+
+# bump this whenever the layout of the archives changes
+ARCHIVE_FORMAT_VERSION = 2
+
+# types of the models whose curves are extracted: the joints of skeletons,
+# which the characters drive. Control rigs only drive them once plotted.
+SKELETON_MODEL_TYPES = ("LimbNode", "Root")
+
+# numpy types of the FBX array property types
+_ARRAY_DTYPES = {"f": "<f4", "d": "<f8", "l": "<i8", "i": "<i4", "b": "u1"}
+
+# separator of the name and class of FBX objects
+_NAME_CLASS_SEPARATOR = "\x00\x01"
+
+# size of the fixed part of a zip local file header
+_ZIP_LOCAL_HEADER_SIZE = 30
+
+
+def is_available():
+    """
+    :returns: True if NumPy can be imported
+    """
+    return numpy is not None
+
+
+def extract_curves(path, model_types=SKELETON_MODEL_TYPES, take_name=None):
+    """
+    Reads the animation curves of the given model types from a binary FBX
+    file.
+
+    :param path: Path of the FBX file
+    :param model_types: Types of the models whose curves are extracted
+    :param take_name: Take whose curves are extracted, defaults to the take
+        that was current when the file was saved
+    :returns: Dictionary of arrays, see the module documentation
+    :raises ValueError: If the file isn't a binary FBX file or is malformed
+    """
+    fh = open(path, "rb")
+    try:
+        if fbx_file.read_version(fh) is None:
+            raise ValueError("%s is not a binary FBX file" % (path,))
+        data = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return _extract_curves(data, model_types, take_name)
+        except (struct.error, zlib.error), e:
+            raise ValueError("Malformed FBX file %s: %s" % (path, e))
+        finally:
+            data.close()
+    finally:
+        fh.close()
+
+
+def write_archive(curves, path, compress=False):
+    """
+    Writes curves to a .npz archive.
+
+    Uncompressed archives can be memory mapped by load_archive(), compressed
+    ones are smaller but have to be read whole.
+
+    :param curves: Dictionary of arrays returned by extract_curves()
+    :param path: Path of the archive
+    :param compress: Whether to compress the arrays
+    """
+    folder = os.path.dirname(path)
+    if folder and not os.path.isdir(folder):
+        os.makedirs(folder)
+
+    arrays = dict(curves)
+    arrays["format_version"] = numpy.array(ARCHIVE_FORMAT_VERSION)
+
+    # write to a temporary file first so that the archive is never seen
+    # partially written
+    partial_path = "%s.part" % (path,)
+    fh = open(partial_path, "wb")
+    try:
+        if compress:
+            numpy.savez_compressed(fh, **arrays)
+        else:
+            numpy.savez(fh, **arrays)
+    finally:
+        fh.close()
+
+    if os.path.exists(path):
+        os.remove(path)
+    os.rename(partial_path, path)
+
+
+def load_archive(path, mmap_mode="r"):
+    """
+    Reads the arrays of a .npz archive.
+
+    Arrays stored uncompressed are memory mapped, so only the parts of them
+    that are used are read from disk.
+
+    :param path: Path of the archive
+    :param mmap_mode: Mode of the memory maps, see numpy.memmap, or None to
+        read every array in memory
+    :returns: Dictionary of arrays, by name
+    """
+    arrays = {}
+    archive = zipfile.ZipFile(path)
+    try:
+        fh = open(path, "rb")
+        try:
+            for info in archive.infolist():
+                name = info.filename
+                if name.endswith(".npy"):
+                    name = name[:-len(".npy")]
+                if mmap_mode and info.compress_type == zipfile.ZIP_STORED:
+                    arrays[name] = _map_member(fh, path, info, mmap_mode)
+                else:
+                    member = archive.open(info)
+                    try:
+                        arrays[name] = npy_format.read_array(member)
+                    finally:
+                        member.close()
+        finally:
+            fh.close()
+    finally:
+        archive.close()
+    return arrays
+
+
+def iter_channels(curves):
+    """
+    Walks the channels of extracted or loaded curves.
+
+    :param curves: Dictionary of arrays
+    :returns: Generator yielding (name, times, values, left_tangents,
+        right_tangents) for every channel, the arrays being views of the
+        concatenated ones
+    """
+    offsets = curves["channel_offsets"]
+    for (index, name) in enumerate(curves["channel_names"]):
+        keys = slice(offsets[index], offsets[index + 1])
+        yield (name, curves["times"][keys], curves["values"][keys],
+               curves["left_tangents"][keys], curves["right_tangents"][keys])
+
+
+def _extract_curves(data, model_types, take_name):
+    """
+    Finds the curves driving the models of the given types in a take and
+    reads them.
+    """
+    objects = None
+    connections = None
+    for node in fbx_file.iter_nodes(data):
+        if node.name == "Objects":
+            objects = node
+        elif node.name == "Connections":
+            connections = node
+        elif node.name == "Takes" and take_name is None:
+            take_name = node.find_value("Current")
+
+    # model id -> name, curve id -> node, take id -> name, character id -> name
+    models = {}
+    curve_nodes = {}
+    stacks = {}
+    characters = {}
+    if objects is not None:
+        for node in objects.children():
+            if node.name == "Model":
+                values = node.properties
+                if len(values) > 2 and values[2] in model_types:
+                    models[values[0]] = _object_name(values[1])
+            elif node.name == "AnimationCurve":
+                curve_nodes[node.properties[0]] = node
+            elif node.name == "AnimationStack":
+                values = node.properties
+                stacks[values[0]] = _object_name(values[1])
+            elif node.name == "Constraint":
+                # characters are saved as constraints
+                values = node.properties
+                if len(values) > 2 and values[2] == "Character":
+                    characters[values[0]] = _object_name(values[1])
+
+    # curves connect to a component of a curve node, curve nodes to a
+    # property of a model and to the layer of a take, layers to their take,
+    # skeleton joints to a link property of their character
+    curve_targets = {}
+    property_targets = {}
+    parents = {}
+    character_models = {}
+    if connections is not None:
+        for connection in connections.children():
+            values = connection.properties
+            if len(values) < 3:
+                continue
+            (child, parent) = values[1:3]
+            if values[0] == "OO":
+                parents.setdefault(child, []).append(parent)
+            elif values[0] == "OP" and len(values) > 3:
+                if parent in characters:
+                    character_models.setdefault(parent, set()).add(child)
+                elif child in curve_nodes:
+                    curve_targets[child] = (parent, values[3])
+                else:
+                    property_targets[child] = (parent, values[3])
+
+    # files saved with several takes hold curves for every take
+    take_layers = None
+    if stacks:
+        take_ids = [stack_id for (stack_id, name) in stacks.iteritems() if name == take_name]
+        if not take_ids and take_name is None and len(stacks) == 1:
+            take_ids = stacks.keys()
+        if not take_ids:
+            raise ValueError("No take named %s" % (take_name,))
+        take_layers = set(layer_id for (layer_id, layer_parents) in parents.iteritems()
+                          if take_ids[0] in layer_parents)
+
+    channels = []
+    keyed_models = set()
+    for (curve_id, (curve_node_id, component)) in curve_targets.iteritems():
+        target = property_targets.get(curve_node_id)
+        if target is None:
+            continue
+        if take_layers is not None and take_layers.isdisjoint(parents.get(curve_node_id, ())):
+            continue
+        keyed_models.add(target[0])
+        if target[0] not in models:
+            continue
+        name = "%s.%s.%s" % (models[target[0]], target[1], component.split("|")[-1])
+        channels.append((name, curve_nodes[curve_id]))
+    channels.sort()
+
+    unkeyed_characters = sorted(
+        name for (character_id, name) in characters.iteritems()
+        if character_models.get(character_id)
+        and character_models[character_id].isdisjoint(keyed_models)
+    )
+
+    keys = [_read_curve(node) for (name, node) in channels]
+    offsets = numpy.zeros(len(keys) + 1, dtype=numpy.int64)
+    numpy.cumsum([len(curve[0]) for curve in keys], out=offsets[1:])
+
+    def concatenate(index, dtype):
+        if not keys:
+            return numpy.zeros(0, dtype=dtype)
+        return numpy.concatenate([curve[index] for curve in keys]).astype(dtype, copy=False)
+
+    return {
+        "channel_names": numpy.array([name for (name, node) in channels], dtype=numpy.string_),
+        "channel_offsets": offsets,
+        "times": concatenate(0, numpy.float64) / fbx_file.TICKS_PER_SECOND,
+        "values": concatenate(1, numpy.float32),
+        "left_tangents": concatenate(2, numpy.float32),
+        "right_tangents": concatenate(3, numpy.float32),
+        "flags": concatenate(4, numpy.int32),
+        "unkeyed_characters": numpy.array(unkeyed_characters, dtype=numpy.string_),
+    }
+
+
+def _object_name(name):
+    """
+    Returns the name of an FBX object, without its class.
+    """
+    return name.split(_NAME_CLASS_SEPARATOR)[0]
+
+
+def _read_curve(node):
+    """
+    Reads the keys of an AnimationCurve node.
+
+    :returns: Tuple of the times in FBX ticks, values, left and right
+        tangents and flags of the keys
+    """
+    arrays = {}
+    for child in node.children():
+        values = child.raw_properties()
+        if values and isinstance(values[0], tuple):
+            (code, length, raw) = values[0]
+            arrays[child.name] = numpy.frombuffer(raw, dtype=_ARRAY_DTYPES[code])
+
+    times = arrays.get("KeyTime", numpy.zeros(0, dtype=numpy.int64))
+    values = arrays.get("KeyValueFloat")
+    if values is None:
+        values = arrays.get("KeyValueDouble", numpy.zeros(0, dtype=numpy.float32))
+    if len(values) != len(times):
+        raise ValueError("Curve %s has %d times for %d values"
+                         % (node.properties[0], len(times), len(values)))
+
+    # the key attributes are shared by runs of consecutive keys, each
+    # attribute holding the right derivative of its keys and the left
+    # derivative of the keys that follow them
+    ref_counts = arrays.get("KeyAttrRefCount", numpy.zeros(0, dtype=numpy.int32))
+    attributes = numpy.repeat(numpy.arange(len(ref_counts)), ref_counts)
+    if len(attributes) != len(times):
+        raise ValueError("Curve %s has attributes for %d of its %d keys"
+                         % (node.properties[0], len(attributes), len(times)))
+    attribute_data = arrays.get("KeyAttrDataFloat", numpy.zeros(0, dtype=numpy.float32))
+    attribute_data = attribute_data.reshape(-1, 4)
+
+    right_tangents = attribute_data[attributes, 0]
+    left_tangents = numpy.empty_like(right_tangents)
+    left_tangents[1:] = attribute_data[attributes[:-1], 1]
+    # the first key has nothing on its left
+    left_tangents[:1] = right_tangents[:1]
+    flags = arrays.get("KeyAttrFlags", numpy.zeros(0, dtype=numpy.int32))[attributes]
+
+    return (times, values, left_tangents, right_tangents, flags)
+
+
+def _map_member(fh, path, info, mmap_mode):
+    """
+    Memory maps an array stored uncompressed in a .npz archive.
+    """
+    # the member data follows its local header, whose variable fields may
+    # differ in size from those of the central directory
+    fh.seek(info.header_offset)
+    local_header = fh.read(_ZIP_LOCAL_HEADER_SIZE)
+    (name_length, extra_length) = struct.unpack("<HH", local_header[26:30])
+    start = info.header_offset + _ZIP_LOCAL_HEADER_SIZE + name_length + extra_length
+    fh.seek(start)
+
+    version = npy_format.read_magic(fh)
+    if version == (1, 0):
+        (shape, fortran_order, dtype) = npy_format.read_array_header_1_0(fh)
+    else:
+        (shape, fortran_order, dtype) = npy_format.read_array_header_2_0(fh)
+
+    if dtype.hasobject:
+        raise ValueError("%s in %s holds python objects" % (info.filename, path))
+    if 0 in shape or not shape:
+        # empty arrays and scalars can't be mapped
+        fh.seek(start)
+        return npy_format.read_array(fh)
+
+    return numpy.memmap(path, dtype=dtype, mode=mmap_mode, offset=fh.tell(), shape=shape,
+                        order="F" if fortran_order else "C")
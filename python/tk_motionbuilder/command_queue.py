@@ -0,0 +1,96 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Queue running menu commands on the main thread, outside of the menu event.
+
+Commands must not run from within the OnMenuActivate handler: apps that
+restart the engine rebuild the menu, which crashes Motionbuilder if it
+happens while the menu event is still being processed. Commands are queued
+instead and run from a zero delay Qt timer, which fires on the next pass of
+the event loop once the menu event has returned.
+
+"""
+import collections
+from timeit import default_timer
+
+
+class CommandQueue(object):
+    """
+    Runs queued commands in order on the next event loop pass, and records
+    the time each one waited between the click and its execution.
+    """
+
+    def __init__(self, log_debug=None):
+        """
+        :param log_debug: Optional callable used to log the latency of every
+            command that is run
+        """
+        self._log_debug = log_debug
+        self._pending = collections.deque()
+        self._scheduled = False
+        # per command: number of runs, total and max latency in seconds
+        self.latencies = {}
+
+    def put(self, name, callback):
+        """
+        Queues a command to be run once control returns to the event loop.
+
+        :param name: Name of the command, used to record its latency
+        :param callback: Callable run without arguments
+        """
+        self._pending.append((name, callback, default_timer()))
+        self._schedule()
+
+    def clear(self):
+        """
+        Discards all queued commands. Commands already running are not
+        affected.
+        """
+        self._pending.clear()
+
+    def _schedule(self):
+        """
+        Makes sure the queue is drained on the next event loop pass.
+        """
+        if not self._scheduled:
+            self._scheduled = True
+            from sgtk.platform.qt import QtCore
+            QtCore.QTimer.singleShot(0, self._drain)
+
+    def _drain(self):
+        """
+        Runs every queued command, including those queued while draining.
+        """
+        try:
+            while self._pending:
+                (name, callback, queued_at) = self._pending.popleft()
+                self._record(name, default_timer() - queued_at)
+                callback()
+        finally:
+            self._scheduled = False
+            # a failing command must not hold up the ones queued after it
+            if self._pending:
+                self._schedule()
+
+    def _record(self, name, latency):
+        """
+        Stores the latency of a command that is about to run.
+        """
+        entry = self.latencies.get(name)
+        if entry is None:
+            entry = self.latencies[name] = {"count": 0, "total": 0.0, "max": 0.0}
+        entry["count"] += 1
+        entry["total"] += latency
+        entry["max"] = max(entry["max"], latency)
+
+        if self._log_debug:
+            self._log_debug("Running menu command '%s', %.1f ms after it was clicked."
+                            % (name, latency * 1000.0))
@@ -0,0 +1,103 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Coalescing of the engine refreshes triggered by file operations.
+
+Opening, merging and re-opening files in quick succession restarts the engine
+for every single file. When a coalescing window is set, refresh requests are
+held for that window, and only the last one of a burst is run once
+MotionBuilder is idle. Without a window, requests are run right away.
+
+"""
+import time
+
+from pyfbsdk import FBSystem
+
+
+class ContextChangeScheduler(object):
+    """
+    Runs the last of a burst of refresh requests, one at a time.
+    """
+
+    def __init__(self, window):
+        """
+        :param window: Time in seconds a request is held for, waiting for a
+            more recent one. Requests are run immediately if this is 0.
+        """
+        self._window = window
+        self._pending = None
+        self._deadline = None
+        self._running = False
+        self._idle_event = None
+        self.stats = {"requested": 0, "run": 0, "coalesced": 0}
+
+    def request(self, run_refresh, tk, context):
+        """
+        Requests a refresh of the engine for the given context. Any request
+        still pending is replaced.
+
+        The scheduler outlives the package copy that created it, so every
+        request brings the refresh function of the copy making it.
+
+        :param run_refresh: Callable taking (tk, context) that refreshes the
+            engine for the given context
+        :param tk: Toolkit API instance
+        :param context: Context to refresh the engine for
+        """
+        self.stats["requested"] += 1
+        if self._pending is not None:
+            self.stats["coalesced"] += 1
+        self._pending = (run_refresh, tk, context)
+
+        if self._window <= 0:
+            self.flush()
+            return
+
+        self._deadline = time.time() + self._window
+        if self._idle_event is None:
+            self._idle_event = FBSystem().OnUIIdle
+            self._idle_event.Add(self._on_idle)
+
+    def flush(self):
+        """
+        Runs the pending refresh, if any, right away. A refresh requested
+        while another one runs is run after it, never concurrently.
+        """
+        if self._running:
+            return
+
+        self._unbind_idle()
+        self._running = True
+        try:
+            while self._pending is not None:
+                (run_refresh, tk, context) = self._pending
+                self._pending = None
+                self.stats["run"] += 1
+                run_refresh(tk, context)
+        finally:
+            self._running = False
+
+    def _on_idle(self, control, event):
+        """
+        Runs the pending refresh once its window has elapsed.
+        """
+        if self._pending is None:
+            self._unbind_idle()
+        elif time.time() >= self._deadline:
+            self.flush()
+
+    def _unbind_idle(self):
+        """
+        Stops listening to idle events.
+        """
+        if self._idle_event is not None:
+            self._idle_event.Remove(self._on_idle)
+            self._idle_event = None
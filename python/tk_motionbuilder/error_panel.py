@@ -0,0 +1,64 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Non-modal panel listing the errors recorded by an ErrorQueue. Qt is only
+available once the engine has initialized PySide, so this module must be
+imported lazily.
+
+"""
+from sgtk.platform.qt import QtCore, QtGui
+
+
+class ErrorPanel(QtGui.QWidget):
+    """
+    Tool window listing errors with their number of occurrences.
+    """
+
+    def __init__(self, error_queue, parent=None):
+        """
+        :param error_queue: ErrorQueue whose errors are displayed
+        :param parent: Parent widget
+        """
+        super(ErrorPanel, self).__init__(parent, QtCore.Qt.Tool)
+        self._error_queue = error_queue
+
+        self.setWindowTitle("Shotgun Errors")
+        self.resize(600, 300)
+
+        self._list = QtGui.QListWidget(self)
+        self._list.setWordWrap(True)
+
+        clear_button = QtGui.QPushButton("Clear", self)
+        clear_button.clicked.connect(self._error_queue.clear)
+        close_button = QtGui.QPushButton("Close", self)
+        close_button.clicked.connect(self.hide)
+
+        buttons = QtGui.QHBoxLayout()
+        buttons.addStretch()
+        buttons.addWidget(clear_button)
+        buttons.addWidget(close_button)
+
+        layout = QtGui.QVBoxLayout(self)
+        layout.addWidget(self._list)
+        layout.addLayout(buttons)
+
+    def refresh(self):
+        """
+        Updates the list from the error queue.
+        """
+        self._list.clear()
+        for entry in self._error_queue.entries:
+            text = entry["message"]
+            if entry["count"] > 1:
+                text = "(x%d) %s" % (entry["count"], text)
+            self._list.addItem(text)
+        if not self._error_queue.entries:
+            self.hide()
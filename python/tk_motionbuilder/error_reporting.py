@@ -0,0 +1,140 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Queued reporting of engine errors.
+
+Errors used to be shown one modal FBMessageBox at a time, blocking
+MotionBuilder until each one was dismissed. They are now aggregated,
+deduplicated and shown together in a single non-modal panel once
+MotionBuilder is idle. In headless mode they are printed to the console
+instead.
+
+"""
+import time
+
+from pyfbsdk import FBMessageBox
+from pyfbsdk import FBSystem
+
+
+class ErrorQueue(object):
+    """
+    Collects errors and shows them in a non-modal panel.
+    """
+
+    def __init__(self, headless=False, get_parent=None, max_entries=200):
+        """
+        :param headless: If True, errors are printed to the console instead
+            of being shown in the panel
+        :param get_parent: Optional callable returning the parent widget of
+            the panel
+        :param max_entries: Number of distinct errors kept. The oldest are
+            dropped beyond that.
+        """
+        self._headless = headless
+        self._get_parent = get_parent
+        self._max_entries = max_entries
+        self._entries = []
+        self._entries_by_message = {}
+        self._panel = None
+        self._idle_event = None
+
+    def report(self, msg):
+        """
+        Records an error. An error identical to one already recorded only
+        increments its count.
+
+        :param msg: Error message
+        """
+        if isinstance(msg, unicode):
+            msg = msg.encode("utf-8", "replace")
+        else:
+            msg = str(msg)
+        if self._headless:
+            # there is no one to show the panel to
+            print "Shotgun Error: %s" % msg
+
+        entry = self._entries_by_message.get(msg)
+        if entry:
+            entry["count"] += 1
+            entry["last_time"] = time.time()
+        else:
+            entry = {"message": msg, "count": 1, "first_time": time.time()}
+            entry["last_time"] = entry["first_time"]
+            self._entries.append(entry)
+            self._entries_by_message[msg] = entry
+            if len(self._entries) > self._max_entries:
+                dropped = self._entries.pop(0)
+                del self._entries_by_message[dropped["message"]]
+
+        if not self._headless and self._idle_event is None:
+            # show the whole burst at once, when MotionBuilder is idle
+            self._idle_event = FBSystem().OnUIIdle
+            self._idle_event.Add(self._on_idle)
+
+    @property
+    def entries(self):
+        """
+        List of recorded errors, oldest first. Each entry is a dictionary
+        with keys message, count, first_time and last_time.
+        """
+        return list(self._entries)
+
+    def clear(self):
+        """
+        Forgets all recorded errors.
+        """
+        self._entries = []
+        self._entries_by_message = {}
+        if self._panel:
+            self._panel.refresh()
+
+    def close(self):
+        """
+        Stops showing errors. The panel, if shown, stays open for the artist
+        to dismiss.
+        """
+        self._unbind_idle()
+
+    def _on_idle(self, control, event):
+        """
+        Shows the recorded errors.
+        """
+        self._unbind_idle()
+        if not self._entries:
+            return
+
+        try:
+            if self._panel is None:
+                from .error_panel import ErrorPanel
+                parent = self._get_parent() if self._get_parent else None
+                self._panel = ErrorPanel(self, parent)
+            self._panel.refresh()
+            self._panel.show()
+            self._panel.raise_()
+        except Exception:
+            # no Qt available - fall back to a single summary message box
+            lines = []
+            for entry in self._entries:
+                if entry["count"] > 1:
+                    lines.append("%s (x%d)" % (entry["message"], entry["count"]))
+                else:
+                    lines.append(entry["message"])
+            self._entries = []
+            self._entries_by_message = {}
+            FBMessageBox("Shotgun Error", "\n\n".join(lines), "OK")
+
+    def _unbind_idle(self):
+        """
+        Stops listening to idle events.
+        """
+        if self._idle_event is not None:
+            self._idle_event.Remove(self._on_idle)
+            self._idle_event = None
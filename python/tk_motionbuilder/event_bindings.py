@@ -0,0 +1,73 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Registry of the Motionbuilder event handlers bound by the engine.
+
+Handlers added to an FBEvent stay bound, along with everything their closures
+reference, until they are explicitly removed. Binding through a registry
+makes it possible to remove them all again when a menu is torn down.
+
+"""
+
+
+class EventBindings(object):
+    """
+    Binds event handlers and remembers them so they can be unbound.
+    """
+
+    def __init__(self):
+        # id of the event source -> (source, list of (event name, handler)).
+        # the source is kept so that its id stays valid.
+        self._bindings = {}
+
+    def __len__(self):
+        """
+        Number of handlers currently bound.
+        """
+        return sum(len(handlers) for (_, handlers) in self._bindings.itervalues())
+
+    def bind(self, source, event_name, handler):
+        """
+        Adds a handler to an event of an object.
+
+        :param source: Object owning the event, for example an FBGenericMenu
+        :param event_name: Name of the event attribute, for example "OnMenuActivate"
+        :param handler: Callable bound to the event
+        """
+        getattr(source, event_name).Add(handler)
+        entry = self._bindings.setdefault(id(source), (source, []))
+        entry[1].append((event_name, handler))
+
+    def unbind(self, source):
+        """
+        Removes every handler bound to the events of an object.
+
+        :param source: Object passed to bind()
+        """
+        entry = self._bindings.pop(id(source), None)
+        if entry is not None:
+            self.__remove(*entry)
+
+    def unbind_all(self):
+        """
+        Removes every handler bound through this registry.
+        """
+        bindings = self._bindings
+        self._bindings = {}
+        for (source, handlers) in bindings.itervalues():
+            self.__remove(source, handlers)
+
+    def __remove(self, source, handlers):
+        """
+        Removes handlers from the events of an object.
+        """
+        for (event_name, handler) in handlers:
+            getattr(source, event_name).Remove(handler)
@@ -0,0 +1,210 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Rate limited handling of uncaught exceptions.
+
+A callback failing on every timeline tick used to show a new dialog for each
+failure. Exceptions are now fingerprinted by type and stack, each fingerprint
+is shown at most once per window, and repeats are counted. Reports can be
+spooled to a folder, from a background thread, for later analysis. The thread
+is shared by all the traps installed in the process. Each machine writes to,
+and prunes, its own subfolder, so the spool folder can be shared.
+
+"""
+import os
+import re
+import sys
+import time
+import Queue
+import socket
+import getpass
+import hashlib
+import threading
+import traceback
+
+from .process_state import get_process_state
+
+
+class ExceptionTrap(object):
+    """
+    Callable to install as sys.excepthook.
+    """
+
+    def __init__(self, show_exception, spool_folder=None, window=60.0, max_reports=500):
+        """
+        :param show_exception: Callable taking (ex_cls, ex, tb, repeats) that
+            shows an exception to the artist
+        :param spool_folder: Optional folder reports are written to, in a
+            subfolder named after the machine
+        :param window: Time in seconds during which an exception is only shown
+            once
+        :param max_reports: Number of reports of this machine kept in the
+            spool folder
+        """
+        self._show_exception = show_exception
+        self._window = window
+        # survives engine restarts, so that a new engine doesn't show again
+        # what the previous one already showed
+        self._fingerprints = get_process_state("exception_fingerprints", dict)
+
+        self._spool_queue = None
+        if spool_folder:
+            self._host = socket.gethostname()
+            self._user = _get_user()
+            host_folder = re.sub(r"[^\w.-]+", "_", self._host)
+            self._spool_queue = _get_spool_queue(
+                os.path.join(spool_folder, host_folder), max_reports)
+
+    def __call__(self, ex_cls, ex, tb):
+        # careful about infinite loops here -
+        # MUST NOT RAISE EXCEPTIONS :)
+        try:
+            stack = traceback.extract_tb(tb)
+            fingerprint = _get_fingerprint(ex_cls, stack)
+
+            now = time.time()
+            record = self._fingerprints.get(fingerprint)
+            if record is None:
+                record = {"count": 0, "repeats": 0, "shown_time": None}
+                self._fingerprints[fingerprint] = record
+            record["count"] += 1
+
+            if record["shown_time"] is not None and now - record["shown_time"] < self._window:
+                # already shown recently, just count it
+                record["repeats"] += 1
+                return
+
+            repeats = record["repeats"]
+            record["repeats"] = 0
+            record["shown_time"] = now
+
+            if self._spool_queue:
+                self._spool_queue.put(_format_report(
+                    ex_cls, ex, stack, fingerprint, record["count"], repeats, now,
+                    self._host, self._user))
+        except:
+            repeats = 0
+
+        self._show_exception(ex_cls, ex, tb, repeats)
+
+
+def _get_fingerprint(ex_cls, stack):
+    """
+    Fingerprints an exception by its type and the code locations of its
+    stack, ignoring the message which often holds varying values.
+    """
+    parts = [getattr(ex_cls, "__name__", str(ex_cls))]
+    for (file_name, line_number, function_name, text) in stack:
+        parts.append("%s:%s:%s" % (file_name, line_number, function_name))
+    return hashlib.sha1("\n".join(parts)).hexdigest()
+
+
+def _get_user():
+    """
+    Returns the name of the user running MotionBuilder, or "unknown" if it
+    can't be determined.
+    """
+    try:
+        return getpass.getuser()
+    except Exception:
+        return "unknown"
+
+
+def _format_report(ex_cls, ex, stack, fingerprint, count, repeats, report_time, host, user):
+    """
+    Formats the full report of an exception.
+
+    :returns: Tuple of the report file name and its contents
+    """
+    lines = [
+        "Fingerprint: %s" % fingerprint,
+        "Time: %s" % time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(report_time)),
+        "Host: %s" % host,
+        "User: %s" % user,
+        "Process: %d" % os.getpid(),
+        "Occurrences in this session: %d" % count,
+        "Repeats since last report: %d" % repeats,
+        "Error Type: %s" % ex_cls,
+        "Details: %s" % ex,
+        "",
+        "Traceback:",
+        "".join(traceback.format_list(stack)),
+    ]
+    file_name = "%s_%d_%s_%d.txt" % (
+        time.strftime("%Y%m%d-%H%M%S", time.localtime(report_time)),
+        os.getpid(),
+        fingerprint[:12],
+        count,
+    )
+    return (file_name, "\n".join(lines))
+
+
+def _get_spool_queue(spool_folder, max_reports):
+    """
+    Returns the queue of the process-wide thread writing reports to the spool
+    folder, starting the thread if needed.
+
+    Engines install a new trap every time they start, they all share the same
+    writer. The writer is only replaced when the spool folder or the number
+    of reports kept change.
+
+    :param spool_folder: Folder reports are written to, only used by this
+        machine
+    :param max_reports: Number of reports kept in the spool folder
+    :returns: Queue.Queue the reports are put in
+    """
+    writer = get_process_state("exception_spool_writer", dict)
+    key = (spool_folder, max_reports)
+    if writer.get("key") != key:
+        if writer.get("queue") is not None:
+            # tell the previous writer to finish
+            writer["queue"].put(None)
+
+        queue = Queue.Queue()
+        thread = threading.Thread(target=_write_reports, args=(spool_folder, max_reports, queue))
+        thread.daemon = True
+        thread.start()
+        writer.update(key=key, queue=queue)
+
+    return writer["queue"]
+
+
+def _write_reports(spool_folder, max_reports, queue):
+    """
+    Writes the reports put in the queue to the spool folder, deleting the
+    oldest ones beyond max_reports, until None is received. Runs in a
+    background thread. The folder is only written to by this machine, other
+    machines' reports are never deleted.
+    """
+    while True:
+        report = queue.get()
+        if report is None:
+            break
+        (file_name, contents) = report
+        try:
+            if not os.path.exists(spool_folder):
+                os.makedirs(spool_folder)
+
+            fh = open(os.path.join(spool_folder, file_name), "w")
+            try:
+                fh.write(contents)
+            finally:
+                fh.close()
+
+            # report names start with their time, so they sort oldest first
+            reports = sorted(f for f in os.listdir(spool_folder) if f.endswith(".txt"))
+            for old_report in reports[:-max_reports]:
+                os.remove(os.path.join(spool_folder, old_report))
+        except Exception, e:
+            try:
+                sys.stderr.write("Could not spool exception report: %s\n" % e)
+            except:
+                pass
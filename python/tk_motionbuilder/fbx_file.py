@@ -0,0 +1,564 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Reading of FBX files saved by Motionbuilder, without loading them.
+
+Binary FBX files are a header followed by a list of top level node records,
+each starting with the offset at which it ends, which makes it possible to
+walk the top level nodes without parsing their contents.
+
+Metadata is read through a memory map of the file. Only the pages holding
+the nodes that are looked at are read from disk, the scene data making up
+most of the file is skipped over.
+
+"""
+import os
+import mmap
+import zlib
+import struct
+import hashlib
+
+BINARY_MAGIC = "Kaydara FBX Binary  \x00"
+
+# magic, two unknown bytes and the version as a uint32
+_HEADER_SIZE = len(BINARY_MAGIC) + 2 + 4
+
+# top level nodes stamped with the time of the save, or derived from it
+SAVE_STAMP_NODES = ("FileId", "CreationTime")
+
+# children of the FBXHeaderExtension node stamped with the time of the save
+HEADER_STAMP_NODES = ("CreationTimeStamp",)
+
+# SceneInfo properties holding the path the file was saved to, which changes
+# with every version of a work file
+SCENE_INFO_PATH_PROPERTIES = ("DocumentUrl", "SrcDocumentUrl")
+
+# SceneInfo compound properties describing the first and the last save,
+# including their path and time
+SCENE_INFO_SAVE_COMPOUNDS = ("Original", "LastSaved")
+
+_READ_SIZE = 4 * 1024 * 1024
+
+# FBX times are expressed in ticks of this many per second
+TICKS_PER_SECOND = 46186158000
+
+# frame rate of every GlobalSettings TimeMode value, the custom mode uses
+# the CustomFrameRate setting instead
+_TIME_MODE_FRAME_RATES = {
+    0: 30.0, 1: 120.0, 2: 100.0, 3: 60.0, 4: 50.0, 5: 48.0, 6: 30.0,
+    7: 30.0, 8: 29.97, 9: 29.97, 10: 25.0, 11: 24.0, 12: 1000.0,
+    13: 23.976, 15: 96.0, 16: 72.0, 17: 59.94, 18: 119.88,
+}
+_CUSTOM_TIME_MODE = 14
+
+# Thumbnail Format values
+_THUMBNAIL_FORMATS = {0: "RGB", 1: "RGBA"}
+
+# struct formats of the scalar property types
+_SCALAR_PROPERTIES = {
+    "Y": struct.Struct("<h"),
+    "C": struct.Struct("<?"),
+    "I": struct.Struct("<i"),
+    "F": struct.Struct("<f"),
+    "D": struct.Struct("<d"),
+    "L": struct.Struct("<q"),
+}
+
+# struct item formats of the array property types
+_ARRAY_PROPERTIES = {"f": "f", "d": "d", "l": "q", "i": "i", "b": "B"}
+
+_UINT32 = struct.Struct("<I")
+_ARRAY_HEADER = struct.Struct("<III")
+
+
+def read_version(fh):
+    """
+    Reads the header of a binary FBX file.
+
+    :param fh: File object opened in binary mode, positioned at the start
+    :returns: FBX version, for example 7400, or None if the file isn't a
+        binary FBX file
+    """
+    header = fh.read(_HEADER_SIZE)
+    if len(header) < _HEADER_SIZE or not header.startswith(BINARY_MAGIC):
+        return None
+    return struct.unpack("<I", header[-4:])[0]
+
+
+def content_hash(path, hash_name="md5"):
+    """
+    Hashes the contents of an FBX file, leaving out what changes every time
+    the same scene is saved again.
+
+    :param path: Path of the file
+    :param hash_name: Name of the hashlib algorithm to use
+    :returns: Hex digest, see ContentHasher
+    """
+    return ContentHasher(path, hash_name).hash_file()
+
+
+class ContentHasher(object):
+    """
+    Hashes the contents of an FBX file fed to it in order, chunk by chunk,
+    leaving out the fields recording when and where the file was saved. Files
+    can then be hashed while they are being copied, without reading them
+    twice.
+
+    For binary FBX files, the save stamps are the FileId and CreationTime
+    nodes, the CreationTimeStamp of the header extension, the file footer,
+    derived from the save time, and the scene info properties holding the
+    path of the file and the details of its first and last saves. Everything
+    else is hashed, including the thumbnail and the rest of the scene info.
+    Any other file, including ASCII FBX files and binary files that can't be
+    walked, is hashed as a whole.
+    """
+
+    def __init__(self, path, hash_name="md5"):
+        """
+        :param path: Path of the file that will be fed to the hasher. The
+            node records locating the save stamps are read from it.
+        :param hash_name: Name of the hashlib algorithm to use
+        """
+        self._path = path
+        self._checksum = hashlib.new(hash_name)
+        self._skipped = _read_save_stamp_ranges(path)
+        self._next_skipped = 0
+        self._offset = 0
+
+        # number of bytes hashed once the whole file is fed, the same for two
+        # saves of a scene even if they were saved to paths of different
+        # lengths
+        self.content_size = os.path.getsize(path) - sum(
+            end - start for (start, end) in self._skipped)
+
+    def update(self, chunk):
+        """
+        Hashes the next chunk of the file, leaving out the save stamps.
+
+        :param chunk: String holding the bytes that follow the previous chunk
+        """
+        start = self._offset
+        end = start + len(chunk)
+        self._offset = end
+
+        skipped = self._skipped
+        position = start
+        while position < end:
+            while (self._next_skipped < len(skipped)
+                   and skipped[self._next_skipped][1] <= position):
+                self._next_skipped += 1
+            if self._next_skipped == len(skipped):
+                skip_start = skip_end = end
+            else:
+                (skip_start, skip_end) = skipped[self._next_skipped]
+
+            if skip_start > position:
+                stop = min(skip_start, end)
+                self._checksum.update(chunk[position - start:stop - start])
+                position = stop
+            else:
+                position = min(skip_end, end)
+
+    def hash_file(self):
+        """
+        Reads and hashes the whole file the hasher was created for.
+
+        :returns: Hex digest of the contents of the file
+        """
+        fh = open(self._path, "rb")
+        try:
+            while True:
+                chunk = fh.read(_READ_SIZE)
+                if not chunk:
+                    break
+                self.update(chunk)
+        finally:
+            fh.close()
+        return self.hexdigest()
+
+    def hexdigest(self):
+        """
+        :returns: Hex digest of the contents hashed so far
+        """
+        return self._checksum.hexdigest()
+
+
+def _read_save_stamp_ranges(path):
+    """
+    Locates the save stamps of a binary FBX file.
+
+    :returns: Sorted list of the (start, end) byte ranges of the save stamps,
+        empty if the file isn't a binary FBX file or can't be walked
+    """
+    fh = open(path, "rb")
+    try:
+        if read_version(fh) is None:
+            return []
+        data = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return _save_stamp_ranges(data)
+        except (ValueError, struct.error):
+            return []
+        finally:
+            data.close()
+    finally:
+        fh.close()
+
+
+def _save_stamp_ranges(data):
+    """
+    Gathers the byte ranges of the save stamps of a binary FBX file held in a
+    buffer, see ContentHasher.
+    """
+    ranges = []
+    nodes_end = _HEADER_SIZE
+    for node in iter_nodes(data):
+        nodes_end = node.end
+        if node.name in SAVE_STAMP_NODES:
+            ranges.append((node.start, node.end))
+        elif node.name == "FBXHeaderExtension":
+            for child in node.children():
+                if child.name in HEADER_STAMP_NODES:
+                    ranges.append((child.start, child.end))
+                elif child.name == "SceneInfo":
+                    properties70 = child.find("Properties70")
+                    if properties70 is None:
+                        continue
+                    for prop in properties70.children():
+                        values = prop.properties
+                        if values and _is_save_property(values[0]):
+                            ranges.append((prop.start, prop.end))
+
+    # the null record ending the top level nodes, then the footer
+    ranges.append((nodes_end, len(data)))
+    ranges.sort()
+    return ranges
+
+
+def _is_save_property(name):
+    """
+    Checks if a SceneInfo property records where or when the file was saved.
+    """
+    if not isinstance(name, basestring):
+        return False
+    return (name in SCENE_INFO_PATH_PROPERTIES
+            or name.split("|")[0] in SCENE_INFO_SAVE_COMPOUNDS)
+
+
+def read_metadata(path, include_thumbnail=False):
+    """
+    Reads the metadata of a binary FBX file without loading the scene.
+
+    The returned dictionary has the following keys:
+
+    - version: FBX version, for example 7400
+    - creator: Application and SDK that wrote the file, None if not recorded
+    - frame_rate: Frames per second of the scene
+    - frame_range: (first, last) frame of the scene time span, None if not
+      recorded
+    - current_take: Name of the take active when the file was saved
+    - takes: List of dictionaries with keys name, file_name, start and end,
+      the frame range of the take
+    - thumbnail: Dictionary with keys width, height, format ("RGB" or "RGBA")
+      and size, plus data, the raw top-down pixels, when include_thumbnail is
+      True. None if the file has no thumbnail.
+
+    :param path: Path of the file
+    :param include_thumbnail: Whether to return the thumbnail pixels
+    :returns: Dictionary of metadata, None if the file isn't a binary FBX file
+    :raises ValueError: If the file is malformed
+    """
+    fh = open(path, "rb")
+    try:
+        if read_version(fh) is None:
+            return None
+        data = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return _read_metadata(data, include_thumbnail)
+        except (struct.error, zlib.error), e:
+            raise ValueError("Malformed FBX file %s: %s" % (path, e))
+        finally:
+            data.close()
+    finally:
+        fh.close()
+
+
+class FBXNode(object):
+    """
+    Node record of a binary FBX file. Properties and children are only
+    decoded when asked for.
+    """
+
+    __slots__ = ("name", "start", "end", "_data", "_record",
+                 "_num_properties", "_properties_start", "_children_start")
+
+    def __init__(self, data, record, start):
+        """
+        :param data: Buffer holding the file, a string or a memory map
+        :param record: Struct of a node record header for the file version
+        :param start: Offset of the node record
+        :raises ValueError: If the node record is malformed
+        """
+        (end, num_properties, property_list_len, name_len) = record.unpack_from(data, start)
+        name_start = start + record.size
+        properties_start = name_start + name_len
+        children_start = properties_start + property_list_len
+        if end != 0 and (children_start > end or end > len(data)):
+            raise ValueError("Invalid node record at offset %d" % start)
+
+        self.name = data[name_start:properties_start]
+        self.start = start
+        self.end = end
+        self._data = data
+        self._record = record
+        self._num_properties = num_properties
+        self._properties_start = properties_start
+        self._children_start = children_start
+
+    @property
+    def properties(self):
+        """
+        Values of the properties of the node. Strings and raw data are
+        returned as str, arrays as tuples.
+        """
+        return self._read_properties(True)
+
+    def raw_properties(self):
+        """
+        Values of the properties of the node, leaving arrays undecoded.
+
+        :returns: List of values, as returned by properties, except for
+            arrays, returned as tuples of the array type code ("f", "d", "l",
+            "i" or "b"), the number of items and the uncompressed little
+            endian data
+        """
+        return self._read_properties(False)
+
+    def _read_properties(self, decode_arrays):
+        """
+        Decodes the properties of the node.
+        """
+        data = self._data
+        offset = self._properties_start
+        values = []
+        for index in xrange(self._num_properties):
+            code = data[offset]
+            offset += 1
+            if code in _SCALAR_PROPERTIES:
+                scalar = _SCALAR_PROPERTIES[code]
+                values.append(scalar.unpack_from(data, offset)[0])
+                offset += scalar.size
+            elif code in "SR":
+                length = _UINT32.unpack_from(data, offset)[0]
+                offset += _UINT32.size
+                values.append(data[offset:offset + length])
+                offset += length
+            elif code in _ARRAY_PROPERTIES:
+                (length, encoding, stored_length) = _ARRAY_HEADER.unpack_from(data, offset)
+                offset += _ARRAY_HEADER.size
+                array_data = data[offset:offset + stored_length]
+                offset += stored_length
+                if encoding == 1:
+                    array_data = zlib.decompress(array_data)
+                if decode_arrays:
+                    values.append(struct.unpack("<%d%s" % (length, _ARRAY_PROPERTIES[code]),
+                                                array_data))
+                else:
+                    values.append((code, length, array_data))
+            else:
+                raise ValueError("Unknown property type %r in node %s at offset %d"
+                                 % (code, self.name, self.start))
+        return values
+
+    def children(self):
+        """
+        :returns: Generator yielding the child nodes
+        """
+        return _iter_nodes(self._data, self._record, self._children_start, self.end)
+
+    def find(self, name):
+        """
+        :param name: Name of the child node
+        :returns: First child node with the given name, None if there is none
+        """
+        for child in self.children():
+            if child.name == name:
+                return child
+        return None
+
+    def find_value(self, name, default=None):
+        """
+        :param name: Name of the child node
+        :param default: Value returned if there is no such node
+        :returns: First property of the first child node with the given name
+        """
+        child = self.find(name)
+        if child is None:
+            return default
+        values = child.properties
+        if not values:
+            return default
+        return values[0]
+
+
+def iter_nodes(data):
+    """
+    Walks the top level nodes of a binary FBX file held in a buffer.
+
+    :param data: Buffer holding the file, a string or a memory map
+    :returns: Generator yielding a FBXNode for every top level node, or
+        nothing if the buffer doesn't hold a binary FBX file
+    :raises ValueError: If a node record is malformed
+    """
+    if len(data) < _HEADER_SIZE or data[:len(BINARY_MAGIC)] != BINARY_MAGIC:
+        return iter(())
+    version = _UINT32.unpack_from(data, _HEADER_SIZE - _UINT32.size)[0]
+    return _iter_nodes(data, _node_record(version), _HEADER_SIZE, len(data))
+
+
+def _node_record(version):
+    """
+    Returns the struct of a node record header for a FBX version.
+    """
+    # files from 7500 on use 64 bit offsets
+    if version >= 7500:
+        return struct.Struct("<QQQB")
+    return struct.Struct("<IIIB")
+
+
+def _iter_nodes(data, record, start, end):
+    """
+    Walks sibling node records, up to the null record ending them.
+    """
+    offset = start
+    while offset + record.size <= end:
+        node = FBXNode(data, record, offset)
+        if node.end == 0:
+            return
+        if node.end <= offset or node.end > end:
+            raise ValueError("Invalid node record at offset %d" % offset)
+        yield node
+        offset = node.end
+
+
+def _read_metadata(data, include_thumbnail):
+    """
+    Gathers the metadata of read_metadata() from the top level nodes.
+    """
+    version = _UINT32.unpack_from(data, _HEADER_SIZE - _UINT32.size)[0]
+    metadata = {
+        "version": version,
+        "creator": None,
+        "frame_rate": _TIME_MODE_FRAME_RATES[0],
+        "frame_range": None,
+        "current_take": None,
+        "takes": [],
+        "thumbnail": None,
+    }
+    takes = None
+    time_span = (None, None)
+
+    for node in iter_nodes(data):
+        if node.name == "FBXHeaderExtension":
+            if metadata["creator"] is None:
+                metadata["creator"] = node.find_value("Creator")
+            scene_info = node.find("SceneInfo")
+            if scene_info is not None:
+                metadata["thumbnail"] = _read_thumbnail(scene_info, include_thumbnail)
+        elif node.name == "Creator" and node.properties:
+            metadata["creator"] = node.properties[0]
+        elif node.name == "GlobalSettings":
+            settings = _read_properties70(node)
+            time_mode = settings.get("TimeMode", 0)
+            if time_mode == _CUSTOM_TIME_MODE:
+                metadata["frame_rate"] = settings.get("CustomFrameRate", _TIME_MODE_FRAME_RATES[0])
+            else:
+                metadata["frame_rate"] = _TIME_MODE_FRAME_RATES.get(
+                    time_mode, _TIME_MODE_FRAME_RATES[0])
+            time_span = (settings.get("TimeSpanStart"), settings.get("TimeSpanStop"))
+        elif node.name == "Takes":
+            takes = node
+
+    frame_rate = metadata["frame_rate"]
+    if None not in time_span:
+        metadata["frame_range"] = tuple(_to_frame(ticks, frame_rate) for ticks in time_span)
+
+    if takes is not None:
+        for take in takes.children():
+            if take.name == "Current":
+                metadata["current_take"] = take.properties[0]
+            elif take.name == "Take":
+                (start, end) = (None, None)
+                local_time = take.find("LocalTime")
+                if local_time is not None:
+                    (start, end) = [_to_frame(ticks, frame_rate)
+                                    for ticks in local_time.properties[:2]]
+                metadata["takes"].append({
+                    "name": take.properties[0],
+                    "file_name": take.find_value("FileName"),
+                    "start": start,
+                    "end": end,
+                })
+
+    return metadata
+
+
+def _read_properties70(node):
+    """
+    Returns the values of the P entries of the Properties70 child of a node,
+    by name. Entries holding several values, like colors, map to tuples.
+    """
+    properties = {}
+    properties70 = node.find("Properties70")
+    if properties70 is None:
+        return properties
+    for entry in properties70.children():
+        # name, type, label and flags, followed by the values
+        values = entry.properties
+        if len(values) == 5:
+            properties[values[0]] = values[4]
+        elif len(values) > 5:
+            properties[values[0]] = tuple(values[4:])
+    return properties
+
+
+def _read_thumbnail(scene_info, include_data):
+    """
+    Returns the description of the thumbnail held by a SceneInfo node.
+    """
+    thumbnail = scene_info.find("Thumbnail")
+    if thumbnail is None:
+        return None
+    size = thumbnail.find("Size")
+    image_data = thumbnail.find("ImageData")
+    if size is None or image_data is None:
+        return None
+    (width, height) = size.properties[:2]
+    data = image_data.properties[0]
+    if isinstance(data, tuple):
+        # stored as an array of bytes
+        data = struct.pack("%dB" % len(data), *data)
+    result = {
+        "width": width,
+        "height": height,
+        "format": _THUMBNAIL_FORMATS.get(thumbnail.find_value("Format"), "RGB"),
+        "size": len(data),
+    }
+    if include_data:
+        result["data"] = data
+    return result
+
+
+def _to_frame(ticks, frame_rate):
+    """
+    Converts a FBX time to a frame number.
+    """
+    return round(ticks * frame_rate / TICKS_PER_SECOND, 3)
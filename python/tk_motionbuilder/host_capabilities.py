@@ -0,0 +1,90 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+What the running Motionbuilder supports, probed once per process.
+
+"""
+import sys
+
+from pyfbsdk import FBSystem
+
+from .process_state import get_process_state
+
+
+class HostCapabilities(object):
+    """
+    Version of the host and the features derived from it.
+    """
+
+    # Motionbuilder 2012 and 2013 use a qt compiled with vs2008 (even though mobu 2013
+    # itself is compiled with 2010). Use a dumpbin /headers on MoBu's qtcore4.dll to
+    # see which linker version was used, since versioning can easily get confusing.
+    PYSIDE_VS2010_VERSION = 14000.0
+
+    # root-level menu items cause Motionbuilder 2011 & 2012 to crash (2013+ works
+    # fine though).
+    ROOT_MENU_ITEMS_VERSION = 13000.0
+
+    def __init__(self, version):
+        """
+        :param version: Version reported by FBSystem, None if it is unknown.
+            Unknown versions are assumed to be recent.
+        """
+        self.version = version
+
+        # NOTE: The 'Version' is a double value, host_info reports it as a string
+        if version is None:
+            self.version_string = "unknown"
+        else:
+            self.version_string = str(version)
+
+        recent = version is None
+
+        # name of the pyside distribution folder bundled for this version
+        if recent or version >= self.PYSIDE_VS2010_VERSION:
+            self.pyside_folder = "pyside112_py26_qt470_win64_vs2010"
+        else:
+            self.pyside_folder = "pyside112_py26_qt470_win64_vs2008"
+
+        # pyside is only bundled for windows
+        self.bundled_pyside = sys.platform == "win32"
+
+        # whether every menu item must live in a submenu
+        self.nested_menus = not recent and version < self.ROOT_MENU_ITEMS_VERSION
+
+    def to_dict(self):
+        """
+        :returns: Dictionary of every capability, for logging and traces
+        """
+        return dict(self.__dict__)
+
+
+def probe_host():
+    """
+    Queries Motionbuilder for its capabilities.
+
+    :returns: HostCapabilities instance
+    """
+    try:
+        version = FBSystem().Version
+    except Exception:
+        version = None
+    return HostCapabilities(version)
+
+
+def get_host_capabilities():
+    """
+    Returns the capabilities of the running Motionbuilder, probing them the
+    first time this is called in the process.
+
+    :returns: HostCapabilities instance
+    """
+    return get_process_state("host_capabilities", probe_host)
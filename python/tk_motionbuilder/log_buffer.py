@@ -0,0 +1,217 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Buffered logging for the engine.
+
+Printing to the MotionBuilder python console is slow, so messages are kept in
+memory and written to the console in batches once MotionBuilder is idle, or
+as soon as a message is logged after flush_interval has elapsed, since batch
+sessions are never idle. A rotating log file can optionally be written from
+a background thread.
+
+"""
+import os
+import sys
+import time
+import Queue
+import logging
+import threading
+import collections
+import logging.handlers
+
+from pyfbsdk import FBSystem
+
+
+class EngineLogBuffer(object):
+    """
+    Buffers engine log messages and writes them to the console in batches.
+    """
+
+    def __init__(self, debug_logging, log_file=None, ring_size=1000,
+                 flush_interval=0.1, max_pending=500):
+        """
+        :param debug_logging: Whether debug messages are logged. This is
+            resolved once, debug() discards messages if False.
+        :param log_file: Optional path of a rotating log file
+        :param ring_size: Number of recent messages kept in memory
+        :param flush_interval: Minimum time in seconds between console writes.
+            A message logged once it has elapsed is written right away.
+        :param max_pending: Number of buffered messages that triggers a
+            console write without waiting for MotionBuilder to be idle
+        """
+        self._flush_interval = flush_interval
+        self._max_pending = max_pending
+        self._recent = collections.deque(maxlen=ring_size)
+        self._pending = []
+        self._last_flush = 0.0
+        self._idle_event = None
+        self._closed = False
+
+        if not debug_logging:
+            self.debug = self._discard
+
+        self._file_queue = None
+        if log_file:
+            # the file is opened here so that errors are raised to the caller
+            folder = os.path.dirname(log_file)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder)
+            handler = logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=5 * 1024 * 1024, backupCount=3)
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+
+            self._file_queue = Queue.Queue()
+            writer = threading.Thread(
+                target=_write_log_file, args=(handler, self._file_queue))
+            writer.daemon = True
+            writer.start()
+
+    def debug(self, msg):
+        """
+        Logs a debug message.
+        """
+        self._log(msg)
+
+    def info(self, msg):
+        """
+        Logs an info message.
+        """
+        self._log("Shotgun: %s" % msg)
+
+    def warning(self, msg):
+        """
+        Logs a warning message.
+        """
+        self._log("Shotgun Warning: %s" % msg)
+
+    def error(self, msg):
+        """
+        Records an error message. Errors are reported to the artist by the
+        engine, they are only written to the log file and kept in memory here.
+        The buffered messages are written to the console first, so that the
+        messages leading to the error can be read when it is reported.
+        """
+        line = _to_line("Shotgun Error: %s" % msg)
+        self._recent.append(line)
+        if self._file_queue:
+            self._file_queue.put(line)
+        self.flush()
+
+    def recent(self):
+        """
+        Returns the most recent messages, oldest first.
+        """
+        return list(self._recent)
+
+    def flush(self):
+        """
+        Writes all buffered messages to the console.
+        """
+        self._last_flush = time.time()
+        if not self._pending:
+            return
+        pending = self._pending
+        self._pending = []
+        print "\n".join(pending)
+
+    def close(self):
+        """
+        Flushes the buffered messages and stops buffering. Messages logged
+        afterwards are printed right away.
+        """
+        self._unbind_idle()
+        self.flush()
+        self._closed = True
+        if self._file_queue:
+            # tell the writer thread to finish
+            self._file_queue.put(None)
+            self._file_queue = None
+
+    def _log(self, line):
+        """
+        Buffers a message for the console and the log file.
+        """
+        line = _to_line(line)
+        self._recent.append(line)
+        if self._file_queue:
+            self._file_queue.put(line)
+
+        if self._closed:
+            print line
+            return
+
+        self._pending.append(line)
+        if (len(self._pending) >= self._max_pending
+                or time.time() - self._last_flush >= self._flush_interval):
+            self.flush()
+            self._unbind_idle()
+        elif self._idle_event is None:
+            self._idle_event = FBSystem().OnUIIdle
+            self._idle_event.Add(self._on_idle)
+
+    def _discard(self, msg):
+        """
+        Drops a message.
+        """
+        pass
+
+    def _on_idle(self, control, event):
+        """
+        Writes buffered messages once flush_interval has elapsed.
+        """
+        if time.time() - self._last_flush >= self._flush_interval:
+            self.flush()
+            self._unbind_idle()
+
+    def _unbind_idle(self):
+        """
+        Stops listening to idle events.
+        """
+        if self._idle_event is not None:
+            self._idle_event.Remove(self._on_idle)
+            self._idle_event = None
+
+
+def _to_line(msg):
+    """
+    Returns a message as a byte string, unicode messages being encoded in
+    UTF-8.
+    """
+    if isinstance(msg, unicode):
+        return msg.encode("utf-8", "replace")
+    return str(msg)
+
+
+def _write_log_file(handler, queue):
+    """
+    Emits the lines put in the queue through a log file handler, until None
+    is received. Runs in a background thread.
+
+    Lines that can't be written are reported on stderr and dropped, so that
+    the queue keeps being emptied. Only the first of a run of failures is
+    reported.
+    """
+    failing = False
+    try:
+        while True:
+            line = queue.get()
+            if line is None:
+                break
+            try:
+                handler.emit(logging.makeLogRecord({"msg": line}))
+            except Exception, e:
+                if not failing:
+                    sys.stderr.write("Shotgun: Could not write to the log file: %s\n" % (e,))
+                failing = True
+            else:
+                failing = False
+    finally:
+        handler.close()
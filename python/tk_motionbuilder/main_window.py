@@ -0,0 +1,79 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Lookup of the main Motionbuilder window, used to parent dialogs.
+
+Finding the window means scanning every top level widget, which gets slow in
+sessions with many floating tool windows. The window found is remembered for
+the whole process through a weak reference and only looked up again once it
+is gone.
+
+"""
+import weakref
+
+from .process_state import get_process_state
+
+
+def get_main_window():
+    """
+    Returns the main Motionbuilder window.
+
+    :returns: QWidget if found or None if not
+    """
+    cache = get_process_state("main_window", dict)
+    ref = cache.get("ref")
+    if ref is not None:
+        window = ref()
+        if window is not None and _is_main_window(window):
+            return window
+
+    window = find_main_window()
+    cache["ref"] = None
+    if window is not None:
+        try:
+            cache["ref"] = weakref.ref(window)
+        except TypeError:
+            # this PySide build can't weakly reference widgets,
+            # the window will be looked up every time.
+            pass
+    return window
+
+
+def find_main_window():
+    """
+    Scans the top level widgets for the main Motionbuilder window.
+
+    :returns: QWidget if found or None if not
+    """
+    from PySide import QtGui
+
+    # from the top level windows, find the main application window.
+    for w in QtGui.QApplication.topLevelWidgets():
+        if _is_main_window(w):
+            return w
+
+    return None
+
+
+def _is_main_window(w):
+    """
+    Checks if a widget looks like the main Motionbuilder window. Widgets whose
+    underlying Qt object has been deleted never do.
+    """
+    from PySide import QtGui
+
+    try:
+        return (type(w) == QtGui.QWidget        # window is always QWidget
+                and len(w.windowTitle()) > 0    # window always has a title/caption
+                and w.parentWidget() == None)   # parent widget is always None
+    except RuntimeError:
+        # the Qt object was deleted
+        return False
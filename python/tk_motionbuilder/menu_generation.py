@@ -14,12 +14,122 @@ Menu handling for Nuke
 """
 import os
 import sys
+import functools
 import webbrowser
 import unicodedata
 
-from pyfbsdk import FBSystem
 from pyfbsdk import FBMenuManager 
-from pyfbsdk import FBGenericMenu
+
+from .command_queue import CommandQueue
+from .event_bindings import EventBindings
+from .host_capabilities import get_host_capabilities
+from .menu_model import MenuNode, MenuReconciler, iter_applied
+from .process_state import get_process_state
+
+
+def _get_menu_state(menu_name):
+    """
+    Returns the process-wide record of what has been applied to a menu.
+
+    :param menu_name: Name of the top level menu
+    :returns: Dictionary with keys applied, next_index and root_bound
+    """
+    states = get_process_state("menu_states", dict)
+    if menu_name not in states:
+        states[menu_name] = {"applied": None, "next_index": 1, "root_bound": False}
+    return states[menu_name]
+
+
+def _get_menu_dispatch(menu_name):
+    """
+    Returns the process-wide event dispatcher of a menu.
+
+    Menus that survive an engine restart stay bound to this dispatcher, which
+    forwards events to whichever MenuGenerator currently owns the menu.
+
+    :param menu_name: Name of the top level menu
+    :returns: Dictionary with keys handler and dispatch
+    """
+    dispatchers = get_process_state("menu_dispatchers", dict)
+    if menu_name not in dispatchers:
+        entry = {"handler": None}
+
+        def dispatch(control, event):
+            handler = entry["handler"]
+            if handler:
+                handler(control, event)
+
+        entry["dispatch"] = dispatch
+        dispatchers[menu_name] = entry
+    return dispatchers[menu_name]
+
+
+def set_menu_retained(retained):
+    """
+    Controls whether destroying the engine leaves its menu in place, so that
+    the next engine can update it instead of rebuilding it from scratch.
+
+    :param retained: True to keep menus when the engine is destroyed
+    """
+    get_process_state("menu_handoff", dict)["retained"] = retained
+
+
+def get_menu_bindings(menu_name):
+    """
+    Returns the process-wide registry of the event handlers bound to a menu
+    and its submenus.
+
+    :param menu_name: Name of the top level menu
+    :returns: EventBindings instance
+    """
+    bindings = get_process_state("menu_bindings", dict)
+    if menu_name not in bindings:
+        bindings[menu_name] = EventBindings()
+    return bindings[menu_name]
+
+
+def clear_menu(menu_name, menu=None):
+    """
+    Deletes every entry of a menu and unbinds every event handler bound to it
+    or to its submenus, so that nothing from a previous engine stays alive.
+
+    :param menu_name: Name of the top level menu
+    :param menu: FBGenericMenu of the menu, looked up by name if not given
+    """
+    if menu is None:
+        menu = FBMenuManager().GetMenu(menu_name)
+    if menu:
+        _delete_menu_items(menu)
+    get_menu_bindings(menu_name).unbind_all()
+
+    state = _get_menu_state(menu_name)
+    state["applied"] = None
+    state["next_index"] = 1
+    state["root_bound"] = False
+
+
+def discard_retained_menus(keep=None):
+    """
+    Deletes the entries of menus left behind by a previous engine.
+
+    :param keep: Optional name of a menu that should not be discarded
+    """
+    for (menu_name, state) in get_process_state("menu_states", dict).items():
+        if menu_name == keep or state["applied"] is None:
+            continue
+        clear_menu(menu_name)
+
+
+def _delete_menu_items(menu):
+    """
+    Deletes every item of a menu.
+    """
+    item = menu.GetFirstItem()
+    while item:
+        next_item = menu.GetNextItem(item)
+        menu.DeleteItem(item)
+        item = next_item
+
 
 class MenuGenerator(object):
     """
@@ -30,13 +140,19 @@ class MenuGenerator(object):
         self._engine = engine
         self._menu_name = menu_name
         self.__menu_index = 1
-        self._callbacks = {}
+        # callbacks indexed by menu index, see _add_event_callback
+        self._callbacks = []
+        self._command_callbacks = {}
+        self._command_queue = CommandQueue(engine.log_debug)
+        self.stats = {}
+
+        # app submenus can be left empty until they are first used
+        self._lazy_app_menus = engine.get_setting("lazy_app_menus", False)
         
         # Currently, root-level menu items seem to cause Motionbuilder 2011 & 2012 to 
         # crash (2013+ works fine though).  sub-menus work correctly so for <=2012 we 
         # force everything to be at least one level deep so at least it's stable!        
-        fb_sys = FBSystem()
-        self.__all_menus_nested = (fb_sys.Version < 13000.0)  
+        self.__all_menus_nested = get_host_capabilities().nested_menus
 
     ##########################################################################################
     # public methods
@@ -44,6 +160,9 @@ class MenuGenerator(object):
     def create_menu(self):
         """
         Render the entire Shotgun menu.
+
+        If a previous engine left its menu in place, only the entries that
+        differ from the new layout are inserted, removed or relabeled.
         """
         # create main menu
         menu_mgr = FBMenuManager()
@@ -51,59 +170,156 @@ class MenuGenerator(object):
         if not sg_menu:
             menu_mgr.InsertBefore(None, "&Help", self._menu_name)
             sg_menu = menu_mgr.GetMenu(self._menu_name)
+
+        # menus left behind under another name are of no use to us
+        discard_retained_menus(keep=self._menu_name)
+
+        state = _get_menu_state(self._menu_name)
+        dispatch = _get_menu_dispatch(self._menu_name)
+        dispatch["handler"] = self.__menu_event
+
+        applied = state["applied"]
+        if applied is None:
+            # nothing to reconcile against - clear out anything else that
+            # may live in the menu, such as the "disabled" entry and its
+            # handler.
+            clear_menu(self._menu_name, sg_menu)
+            applied = []
             
-        if not self.__all_menus_nested:
+        if not self.__all_menus_nested and not state["root_bound"]:
             # need to handle root-level menu items
-            sg_menu.OnMenuActivate.Add(self.__menu_event)
-        
-        # now add the context item on top of the main menu
-        context_menu = self._add_context_menu(sg_menu)
+            get_menu_bindings(self._menu_name).bind(
+                sg_menu, "OnMenuActivate", dispatch["dispatch"])
+            state["root_bound"] = True
+
+        layout = self._build_layout()
+
+        self.__menu_index = state["next_index"]
+        reconciler = self.__create_reconciler()
+        state["applied"] = reconciler.reconcile(sg_menu, applied, layout)
+        state["next_index"] = self.__menu_index
+
+        self._register_callbacks(state["applied"])
+
+        self.stats = dict(reconciler.stats)
+        self._engine.log_debug(
+            "Shotgun menu updated: %d items touched (%d inserted, %d removed, "
+            "%d relabeled, %d unchanged)" % (
+                reconciler.touched,
+                self.stats["inserted"],
+                self.stats["removed"],
+                self.stats["relabeled"],
+                self.stats["unchanged"],
+            )
+        )
+
+    def destroy_menu(self):
+        """
+        Removes the Shotgun menu, unless it is being handed over to the next
+        engine - see set_menu_retained().
+        """
+        _get_menu_dispatch(self._menu_name)["handler"] = None
+        self._callbacks = []
+        self._command_callbacks = {}
+        # commands still queued belong to the engine being destroyed
+        self._command_queue.clear()
+
+        if get_process_state("menu_handoff", dict).get("retained"):
+            return
+
+        clear_menu(self._menu_name)
+        self.__menu_index = 1
+
+    def _register_callbacks(self, applied):
+        """
+        Hooks up the callbacks of the entries currently in the menu.
+
+        :param applied: List of AppliedNodes of the main menu
+        """
+        self._callbacks = [None] * _get_menu_state(self._menu_name)["next_index"]
+        for node in iter_applied(applied):
+            if node.command in self._command_callbacks:
+                self._add_event_callback(node.item_id, self._command_callbacks[node.command])
+            if node.pending is not None:
+                # lazy submenus only hold their placeholder entry
+                self._add_event_callback(
+                    node.children[0].item_id, functools.partial(self._materialize_menu, node))
+
+    def _materialize_menu(self, node):
+        """
+        Fills a lazy submenu with its commands. The commands are then kept
+        for the lifetime of the menu.
+
+        :param node: AppliedNode of the lazy submenu
+        """
+        state = _get_menu_state(self._menu_name)
+        if node.pending is None or state["applied"] is None:
+            return
+
+        self.__menu_index = state["next_index"]
+        self.__create_reconciler().materialize(node)
+        state["next_index"] = self.__menu_index
+
+        self._register_callbacks(state["applied"])
+        self._engine.log_debug("Populated the '%s' menu on first use." % node.label)
+
+    ##########################################################################################
+    # menu layout
+
+    def _build_layout(self):
+        """
+        Describes the entire Shotgun menu as a list of MenuNodes.
+        """
+        self._command_callbacks = {}
+
+        # the context item on top of the main menu
+        context_menu = self._add_context_menu()
+        layout = [context_menu]
 
         # add separator:
-        sg_menu.InsertLast("", self.__next_menu_index())
+        layout.append(MenuNode("separator:context", "", MenuNode.SEPARATOR))
+
+        # index the commands once so that favourites resolve in constant time
+        commands = [
+            (cmd_name, AppCommand(cmd_name, cmd_details))
+            for (cmd_name, cmd_details) in self._engine.commands.items()
+        ]
+        commands_by_instance = self._index_commands(commands)
 
         # now add favourites
-        favourites_menu = None
+        favourites = []
         for fav in self._engine.get_setting("menu_favourites"):
             app_instance_name = fav["app_instance"]
             menu_name = fav["name"]
 
-            # scan through all menu items
-            for (cmd_name, cmd_details) in self._engine.commands.items():
-                cmd = AppCommand(cmd_name, cmd_details)
-                if cmd.get_app_instance_name() == app_instance_name and cmd.name == menu_name:
-                    # found our match!                    
-                    if self.__all_menus_nested:
-                        # workaround for bug in 2012 which causes Motionbuilder to crash
-                        # when clicking on root-level menu items
-                        if not favourites_menu:
-                            favourites_menu = FBGenericMenu()
-                            favourites_menu.OnMenuActivate.Add(self.__menu_event)
-                            sg_menu.InsertLast("Favorites", self.__next_menu_index(), favourites_menu)                            
-                    else:
-                        favourites_menu = sg_menu
-                    
-                    # add to the favourites section of the menu:
-                    cmd.add_command_to_menu(favourites_menu, self.__next_menu_index())
-                    
-                    # mark as a favourite item
-                    cmd.favourite = True            
-
-        if favourites_menu:
+            for (cmd_name, cmd) in commands_by_instance.get((app_instance_name, menu_name), []):
+                # found our match!
+                favourites.append(self._add_command_node(cmd_name, cmd, "favourite"))
+
+                # mark as a favourite item
+                cmd.favourite = True
+
+        if favourites:
+            _make_keys_unique(favourites)
+            if self.__all_menus_nested:
+                # workaround for bug in 2012 which causes Motionbuilder to crash
+                # when clicking on root-level menu items
+                layout.append(
+                    MenuNode("favourites", "Favorites", MenuNode.SUBMENU, children=favourites))
+            else:
+                layout.extend(favourites)
+
             # add separator:
-            sg_menu.InsertLast("", self.__next_menu_index())
+            layout.append(MenuNode("separator:favourites", "", MenuNode.SEPARATOR))
 
         # now go through all of the menu items.
         # separate them out into various sections
         commands_by_app = {}
 
-        for (cmd_name, cmd_details) in self._engine.commands.items():
-            cmd = AppCommand(cmd_name, cmd_details)
-
+        for (cmd_name, cmd) in commands:
             if cmd.get_type() == "context_menu":
                 # context menu!
-                cmd.add_command_to_menu(context_menu, self.__next_menu_index())
-                self._add_event_callback(cmd.name, cmd.callback)
+                context_menu.children.append(self._add_command_node(cmd_name, cmd))
             else:
                 # normal menu
                 app_name = cmd.get_app_name()
@@ -112,55 +328,69 @@ class MenuGenerator(object):
                     app_name = "Other Items"
                 if not app_name in commands_by_app:
                     commands_by_app[app_name] = []
-                commands_by_app[app_name].append(cmd)
+                commands_by_app[app_name].append((cmd_name, cmd))
 
         # now add all apps to main menu
-        self._add_app_menu(sg_menu, commands_by_app)
+        layout.extend(self._add_app_menu(commands_by_app))
+        return layout
 
-    def destroy_menu(self):
-        menu_mgr = FBMenuManager()
-        menu = menu_mgr.GetMenu(self._menu_name)
-        
-        if menu:
-            item = menu.GetFirstItem()
-            while item:
-                next_item = menu.GetNextItem(item)
-                menu.DeleteItem(item)
-                item = next_item
-            self.__menu_index = 1
-            self._callbacks = {}
+    def _index_commands(self, commands):
+        """
+        Indexes commands by app instance name and command name.
+
+        :param commands: List of (command name, AppCommand) tuples
+        :returns: Dictionary mapping (app instance name, menu name) tuples to
+            lists of (command name, AppCommand) tuples
+        """
+        # reverse lookup from app object to its instance name, built once
+        # rather than scanning engine.apps for every command
+        app_instance_names = dict(
+            (app_obj, app_instance_name)
+            for (app_instance_name, app_obj) in self._engine.apps.items()
+        )
+
+        commands_by_instance = {}
+        for (cmd_name, cmd) in commands:
+            key = (cmd.get_app_instance_name(app_instance_names), cmd.name)
+            commands_by_instance.setdefault(key, []).append((cmd_name, cmd))
+        return commands_by_instance
+
+    def _add_command_node(self, cmd_name, cmd, key_prefix="command"):
+        """
+        Creates the menu node of an app command.
+        """
+        self._command_callbacks[cmd_name] = cmd.callback
+        return MenuNode("%s:%s" % (key_prefix, cmd_name), cmd.name, command=cmd_name)
 
     ##########################################################################################
     # context menu and UI
 
-    def _add_context_menu(self, menu):
+    def _add_context_menu(self):
         """
-        Adds a context menu which displays the current context
+        Creates the context menu node which displays the current context
         """
 
         ctx = self._engine.context
         ctx_name = str(ctx)
 
-        # create the menu object
-        ctx_menu = FBGenericMenu()
-
-        ctx_menu.InsertLast("Jump to Shotgun", self.__next_menu_index())
-        self._add_event_callback("Jump to Shotgun", self._jump_to_sg)
-
-        ctx_menu.InsertLast("Jump to File System", self.__next_menu_index())
-        self._add_event_callback("Jump to File System", self._jump_to_fs)
+        self._command_callbacks["jump_to_shotgun"] = self._jump_to_sg
+        self._command_callbacks["jump_to_file_system"] = self._jump_to_fs
 
-        ctx_menu.OnMenuActivate.Add(self.__menu_event)
+        return MenuNode("context", ctx_name, MenuNode.SUBMENU, children=[
+            MenuNode("jump_to_shotgun", "Jump to Shotgun", command="jump_to_shotgun"),
+            MenuNode("jump_to_file_system", "Jump to File System", command="jump_to_file_system"),
+        ])
 
-        menu.InsertFirst(ctx_name, self.__next_menu_index(), ctx_menu)
-        return ctx_menu
-
-    def _add_event_callback(self, event_name, callback):
+    def _add_event_callback(self, item_id, callback):
         """
-        Creates a mapping between the menu item name and the callback that should be
-        run when it is clicked.
+        Creates a mapping between the menu item index and the callback that should be
+        run when it is clicked. Menu indices are unique, so commands sharing a name
+        never overwrite each other. They are also small and sequential, so callbacks
+        are stored in a list indexed by them.
         """
-        self._callbacks[event_name] = callback
+        if item_id >= len(self._callbacks):
+            self._callbacks.extend([None] * (item_id + 1 - len(self._callbacks)))
+        self._callbacks[item_id] = callback
 
     def _jump_to_sg(self):
         """
@@ -197,31 +427,36 @@ class MenuGenerator(object):
     ##########################################################################################
     # app menus
 
-    def _add_app_menu(self, menu, commands_by_app):
+    def _add_app_menu(self, commands_by_app):
         """
-        Add all apps to the main menu, process them one by one.
+        Creates the menu nodes of all apps, process them one by one.
         """
+        nodes = []
 
         for i, app_name in enumerate(sorted(commands_by_app.keys())):
             if self.__all_menus_nested or len(commands_by_app[app_name]) > 1:
                 # more than one menu entry for this app
                 # make a sub menu and put all items in the sub menu
-                app_menu = FBGenericMenu()
-                for j, cmd in enumerate(commands_by_app[app_name]):
-                    cmd.add_command_to_menu(app_menu, self.__next_menu_index())
-                    self._add_event_callback(cmd.name, cmd.callback)
-                app_menu.OnMenuActivate.Add(self.__menu_event)
-                app_name = self.__strip_unicode(app_name)
-                menu.InsertLast(app_name, self.__next_menu_index(), app_menu)
+                children = []
+                for j, (cmd_name, cmd) in enumerate(commands_by_app[app_name]):
+                    children.append(self._add_command_node(cmd_name, cmd))
+                nodes.append(MenuNode(
+                    "app:%s" % app_name,
+                    self.__strip_unicode(app_name),
+                    MenuNode.SUBMENU,
+                    children=children,
+                    lazy=self._lazy_app_menus
+                ))
             else:
                 # this app only has a single entry.
                 # display that on the menu
                 # todo: Should this be labelled with the name of the app
                 # or the name of the menu item? Not sure.
-                cmd_obj = commands_by_app[app_name][0]
+                (cmd_name, cmd_obj) = commands_by_app[app_name][0]
                 if not cmd_obj.favourite:
-                    cmd_obj.add_command_to_menu(menu, self.__next_menu_index())
-                    self._add_event_callback(cmd_obj.name, cmd_obj.callback)
+                    nodes.append(self._add_command_node(cmd_name, cmd_obj))
+
+        return nodes
 
     ##########################################################################################
     # private methods
@@ -236,18 +471,33 @@ class MenuGenerator(object):
         self.__menu_index += 1
         return idx
 
+    def __create_reconciler(self):
+        """
+        Creates a MenuReconciler handing out indices from this generator.
+        """
+        dispatch = _get_menu_dispatch(self._menu_name)["dispatch"]
+        bindings = get_menu_bindings(self._menu_name)
+        return MenuReconciler(
+            self.__next_menu_index,
+            lambda sub_menu: bindings.bind(sub_menu, "OnMenuActivate", dispatch),
+            placeholder_label="Show Commands...",
+            unbind_submenu=bindings.unbind,
+        )
+
     def __menu_event(self, control, event):
         """
         Handles menu events.
         """
-        callback = self._callbacks.get(event.Name)
+        try:
+            callback = self._callbacks[event.Id]
+        except IndexError:
+            callback = None
         if callback:
-            # execute callback through a Qt singleShot timer event
-            # to disconnect the command from the menu.  Otherwise
-            # any apps that restart the engine (causing the menu to
-            # be rebuilt) can cause Motionbuilder to crash!
-            from sgtk.platform.qt import QtCore
-            QtCore.QTimer.singleShot(100, callback)
+            # execute callback through the command queue to disconnect
+            # the command from the menu.  Otherwise any apps that restart
+            # the engine (causing the menu to be rebuilt) can cause
+            # Motionbuilder to crash!
+            self._command_queue.put(event.Name, callback)
             
     def __strip_unicode(self, val):
         """
@@ -258,6 +508,18 @@ class MenuGenerator(object):
         return val   
             
 
+def _make_keys_unique(nodes):
+    """
+    Suffixes the keys of nodes that appear more than once in a list.
+    """
+    seen = {}
+    for node in nodes:
+        count = seen.get(node.key, 0) + 1
+        seen[node.key] = count
+        if count > 1:
+            node.key = "%s#%d" % (node.key, count)
+
+
 class AppCommand(object):
     """
     Wraps around a single command that you get from engine.commands
@@ -283,15 +545,21 @@ class AppCommand(object):
             return self.properties["app"].display_name
         return None
 
-    def get_app_instance_name(self):
+    def get_app_instance_name(self, app_instance_names=None):
         """
         Returns the name of the app instance, as defined in the environment.
         Returns None if not found.
+
+        :param app_instance_names: Optional dictionary mapping app objects to
+            their instance names, used instead of scanning engine.apps
         """
         if "app" not in self.properties:
             return None
 
         app_instance = self.properties["app"]
+        if app_instance_names is not None:
+            return app_instance_names.get(app_instance)
+
         engine = app_instance.engine
 
         for (app_instance_name, app_instance_obj) in engine.apps.items():
@@ -0,0 +1,226 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Menu model used to update the Shotgun menu in place.
+
+The desired menu is described as a tree of MenuNode objects. The tree that is
+currently applied to Motionbuilder is remembered across engine restarts and
+diffed against the desired one, so that only the FBGenericMenu entries that
+actually changed are inserted, removed or relabeled.
+
+"""
+from pyfbsdk import FBGenericMenu
+
+
+class MenuNode(object):
+    """
+    Describes a single entry of the desired menu layout.
+    """
+
+    ITEM = "item"
+    SUBMENU = "submenu"
+    SEPARATOR = "separator"
+
+    def __init__(self, key, label, kind=ITEM, command=None, children=None, lazy=False):
+        """
+        :param key: Identifier of the entry, unique within its parent menu
+        :param label: Text displayed in the menu
+        :param kind: One of ITEM, SUBMENU or SEPARATOR
+        :param command: Name of the command run when the item is clicked
+        :param children: List of child MenuNodes for submenus
+        :param lazy: If True, the children of a submenu are only inserted
+            once the submenu is materialized
+        """
+        self.key = key
+        self.label = label
+        self.kind = kind
+        self.command = command
+        self.children = children or []
+        self.lazy = lazy
+
+
+class AppliedNode(object):
+    """
+    An entry that has been inserted into a Motionbuilder menu.
+    """
+
+    def __init__(self, node, item_id, fb_menu=None):
+        """
+        :param node: MenuNode that was applied
+        :param item_id: Menu index the entry was inserted with
+        :param fb_menu: FBGenericMenu holding the children of a submenu
+        """
+        self.key = node.key
+        self.label = node.label
+        self.kind = node.kind
+        self.command = node.command
+        self.item_id = item_id
+        self.fb_menu = fb_menu
+        self.children = []
+        # children of a lazy submenu that have not been inserted yet
+        self.pending = None
+
+
+class MenuReconciler(object):
+    """
+    Applies the difference between an applied menu tree and a desired one.
+    """
+
+    def __init__(self, next_index, bind_submenu, placeholder_label="...", unbind_submenu=None):
+        """
+        :param next_index: Callable returning the next unused menu index
+        :param bind_submenu: Callable run with every newly created submenu
+        :param placeholder_label: Label of the single entry shown in a lazy
+            submenu until it is materialized
+        :param unbind_submenu: Optional callable run with every submenu that
+            is removed, including nested ones
+        """
+        self._next_index = next_index
+        self._bind_submenu = bind_submenu
+        self._unbind_submenu = unbind_submenu
+        self._placeholder = MenuNode("placeholder", placeholder_label)
+        self.stats = {"inserted": 0, "removed": 0, "relabeled": 0, "unchanged": 0}
+
+    @property
+    def touched(self):
+        """
+        Number of menu entries that were inserted, removed or relabeled.
+        """
+        return self.stats["inserted"] + self.stats["removed"] + self.stats["relabeled"]
+
+    def reconcile(self, fb_menu, applied, desired):
+        """
+        Updates a menu so that it matches the desired list of nodes.
+
+        :param fb_menu: FBGenericMenu to update
+        :param applied: List of AppliedNodes currently in the menu
+        :param desired: List of MenuNodes the menu should contain
+        :returns: List of AppliedNodes now in the menu
+        """
+        desired_by_key = dict((node.key, node) for node in desired)
+
+        # first get rid of the entries that are gone or changed type
+        kept = []
+        for current in applied:
+            wanted = desired_by_key.get(current.key)
+            if wanted is None or wanted.kind != current.kind:
+                self._remove(fb_menu, current)
+            else:
+                kept.append(current)
+
+        result = []
+        previous_item = None
+        kept_by_key = dict((current.key, current) for current in kept)
+        kept_pos = 0
+
+        for wanted in desired:
+            current = kept_by_key.pop(wanted.key, None)
+            if current is not None:
+                # anything kept that sits before this entry has moved further
+                # down the menu. remove it now, it gets reinserted once its
+                # new position is reached.
+                while kept[kept_pos] is not current:
+                    moved = kept[kept_pos]
+                    if kept_by_key.pop(moved.key, None) is not None:
+                        self._remove(fb_menu, moved)
+                    kept_pos += 1
+                kept_pos += 1
+
+                if current.label != wanted.label:
+                    fb_menu.GetItem(current.item_id).Caption = wanted.label
+                    current.label = wanted.label
+                    self.stats["relabeled"] += 1
+                else:
+                    self.stats["unchanged"] += 1
+
+                current.command = wanted.command
+                if current.pending is not None and wanted.lazy:
+                    # still showing its placeholder, nothing to update yet
+                    current.pending = wanted.children
+                elif current.kind == MenuNode.SUBMENU:
+                    current.pending = None
+                    current.children = self.reconcile(
+                        current.fb_menu, current.children, wanted.children)
+            else:
+                current = self._insert(fb_menu, previous_item, wanted)
+
+            previous_item = fb_menu.GetItem(current.item_id)
+            result.append(current)
+
+        return result
+
+    def materialize(self, applied):
+        """
+        Replaces the placeholder of a lazy submenu with its children.
+
+        :param applied: AppliedNode of the lazy submenu
+        """
+        if applied.pending is None:
+            return
+        applied.children = self.reconcile(applied.fb_menu, applied.children, applied.pending)
+        applied.pending = None
+
+    def _insert(self, fb_menu, previous_item, node):
+        """
+        Inserts a node after the given menu item, or first if there is none.
+        """
+        item_id = self._next_index()
+
+        sub_menu = None
+        if node.kind == MenuNode.SUBMENU:
+            sub_menu = FBGenericMenu()
+            self._bind_submenu(sub_menu)
+
+        applied = AppliedNode(node, item_id, sub_menu)
+        if sub_menu is not None:
+            if node.lazy:
+                applied.pending = node.children
+                applied.children = self.reconcile(sub_menu, [], [self._placeholder])
+            else:
+                applied.children = self.reconcile(sub_menu, [], node.children)
+            if previous_item is None:
+                fb_menu.InsertFirst(node.label, item_id, sub_menu)
+            else:
+                fb_menu.InsertAfter(previous_item, node.label, item_id, sub_menu)
+        else:
+            if previous_item is None:
+                fb_menu.InsertFirst(node.label, item_id)
+            else:
+                fb_menu.InsertAfter(previous_item, node.label, item_id)
+
+        self.stats["inserted"] += 1
+        return applied
+
+    def _remove(self, fb_menu, current):
+        """
+        Deletes an applied entry from the menu.
+        """
+        item = fb_menu.GetItem(current.item_id)
+        if item:
+            fb_menu.DeleteItem(item)
+        if self._unbind_submenu is not None:
+            for node in iter_applied([current]):
+                if node.fb_menu is not None:
+                    self._unbind_submenu(node.fb_menu)
+        self.stats["removed"] += 1
+
+
+def iter_applied(applied):
+    """
+    Walks an applied menu tree depth first.
+
+    :param applied: List of AppliedNodes
+    :returns: Generator yielding every AppliedNode in the tree
+    """
+    for current in applied:
+        yield current
+        for child in iter_applied(current.children):
+            yield child
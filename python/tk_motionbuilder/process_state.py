@@ -0,0 +1,46 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Process-wide state that survives engine restarts.
+
+Toolkit loads a fresh copy of this package every time an engine starts, so
+module level globals are lost on every context switch. State that needs to
+outlive a single engine instance is kept on a dedicated module object that is
+registered once in sys.modules.
+
+"""
+import sys
+import types
+
+_STATE_MODULE_NAME = "_tk_motionbuilder_process_state"
+
+
+def get_process_state(name, factory):
+    """
+    Returns the process-wide object stored under the given name, creating it
+    with the supplied factory the first time it is requested.
+
+    Objects stored here may have been created by a previous load of this
+    package, so callers should rely on plain data structures (dicts, lists)
+    or on duck typing rather than on isinstance checks.
+
+    :param name: Name of the state entry
+    :param factory: Callable returning the initial value for the entry
+    :returns: The stored object
+    """
+    module = sys.modules.get(_STATE_MODULE_NAME)
+    if module is None:
+        module = types.ModuleType(_STATE_MODULE_NAME)
+        sys.modules[_STATE_MODULE_NAME] = module
+
+    if not hasattr(module, name):
+        setattr(module, name, factory())
+    return getattr(module, name)
@@ -0,0 +1,152 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Local index of the session files published from this machine.
+
+Every entry records the size and modification time of a published file
+along with its checksum and content hash, see fbx_file.ContentHasher. An
+entry is only trusted while the file on disk still has the recorded size and
+modification time.
+
+"""
+import os
+import json
+
+# bump this whenever the structure of the index changes
+INDEX_FORMAT_VERSION = 3
+
+
+class PublishHashIndex(object):
+    """
+    Finds earlier publishes with the same content as a new session file.
+    """
+
+    def __init__(self, index_path, max_entries=1000):
+        """
+        :param index_path: JSON file the index is stored in
+        :param max_entries: Number of publishes remembered, the oldest ones
+            are forgotten first
+        """
+        self._index_path = index_path
+        self._max_entries = max_entries
+        self._entries = None
+
+    def has_content_size(self, content_size):
+        """
+        Checks if a published file may have the same content as a file with
+        the given content size. Files are only hashed, which means reading
+        them whole, when this is the case.
+
+        :param content_size: Number of bytes hashed of the file, see
+            fbx_file.ContentHasher
+        """
+        for entry in self._get_entries():
+            if entry["content_size"] == content_size and _is_unchanged(entry):
+                return True
+        return False
+
+    def find(self, content_hash, content_size):
+        """
+        Looks for a published file with the given content.
+
+        :param content_hash: Content hash of the file to look for, see
+            fbx_file.ContentHasher
+        :param content_size: Number of bytes hashed of the file
+        :returns: Entry of the matching publish, a dictionary with keys path,
+            size, mtime, checksum, content_hash, content_size and
+            copy_seconds, or None
+        """
+        for entry in self._get_entries():
+            if (entry["content_size"] == content_size and entry["content_hash"] == content_hash
+                    and _is_unchanged(entry)):
+                return entry
+        return None
+
+    def add(self, path, checksum, content_hash, content_size, copy_seconds):
+        """
+        Records a published file.
+
+        :param path: Path of the published file
+        :param checksum: Checksum of the bytes of the file
+        :param content_hash: Content hash of the file
+        :param content_size: Number of bytes hashed of the file
+        :param copy_seconds: Time it took to copy the file to the publish
+            location
+        """
+        stat = os.stat(path)
+        entries = [entry for entry in self._get_entries() if entry["path"] != path]
+        entries.append({
+            "path": path,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "checksum": checksum,
+            "content_hash": content_hash,
+            "content_size": content_size,
+            "copy_seconds": copy_seconds,
+        })
+        self._entries = entries[-self._max_entries:]
+
+    def save(self):
+        """
+        Writes the index to disk.
+        """
+        if self._entries is None:
+            return
+
+        folder = os.path.dirname(self._index_path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+
+        data = {"version": INDEX_FORMAT_VERSION, "entries": self._entries}
+
+        # write to a temporary file first so that a concurrent session never
+        # reads a partially written index
+        tmp_path = "%s.%d.tmp" % (self._index_path, os.getpid())
+        fh = open(tmp_path, "w")
+        try:
+            fh.write(json.dumps(data, separators=(",", ":")))
+        finally:
+            fh.close()
+
+        if os.path.exists(self._index_path):
+            os.remove(self._index_path)
+        os.rename(tmp_path, self._index_path)
+
+    def _get_entries(self):
+        """
+        Returns the entries of the index, reading them from disk once.
+        """
+        if self._entries is None:
+            self._entries = []
+            if os.path.exists(self._index_path):
+                fh = open(self._index_path, "r")
+                try:
+                    data = json.load(fh)
+                except ValueError:
+                    # corrupt index, start over
+                    data = {}
+                finally:
+                    fh.close()
+                if data.get("version") == INDEX_FORMAT_VERSION:
+                    self._entries = data["entries"]
+        return self._entries
+
+
+def _is_unchanged(entry):
+    """
+    Checks that a published file still has the recorded size and modification
+    time.
+    """
+    try:
+        stat = os.stat(entry["path"])
+    except OSError:
+        return False
+    return stat.st_size == entry["size"] and stat.st_mtime == entry["mtime"]
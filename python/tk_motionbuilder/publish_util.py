@@ -0,0 +1,257 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Helpers shared by the publish hooks, mostly copying saved session files.
+
+Saving serializes the whole scene again, so new versions of a session that
+was just saved are made by copying the saved file instead. Files are streamed
+in large chunks and written under a temporary name first.
+
+"""
+import os
+import re
+import time
+import errno
+import hashlib
+
+import tank
+from pyfbsdk import FBApplication
+
+MB = 1024.0 * 1024.0
+
+
+def setting_value(settings, name, default):
+    """
+    Returns the value of a plugin setting, or the default if it isn't set.
+
+    :param settings: Dictionary of Settings given to a publish plugin
+    :param name: Name of the setting
+    :param default: Value returned if the setting isn't in the dictionary
+    """
+    setting = settings.get(name)
+    if setting is None:
+        return default
+    return setting.value
+
+
+def derived_path(session_path, suffix, extension=None, folder_name=None):
+    """
+    Returns the path of a file derived from a session file, named after it
+    with a suffix. The suffix goes before the version number of the session
+    file, which is kept last: "scene.v003.fbx" with the suffix "walk" gives
+    "scene_walk.v003.fbx".
+
+    :param session_path: Path of the session file
+    :param suffix: Suffix added to the name of the session file
+    :param extension: Extension of the derived file, defaults to the one of
+        the session file
+    :param folder_name: Optional folder, next to the session file, the
+        derived file goes in
+    :returns: Path of the derived file
+    """
+    (folder, file_name) = os.path.split(session_path)
+    (base_name, session_extension) = os.path.splitext(file_name)
+    if extension is None:
+        extension = session_extension
+    if folder_name:
+        folder = os.path.join(folder, folder_name)
+
+    match = re.match(r"(.*?)([._-]v\d+)$", base_name)
+    if match:
+        file_name = "%s_%s%s%s" % (match.group(1), suffix, match.group(2), extension)
+    else:
+        file_name = "%s_%s%s" % (base_name, suffix, extension)
+    return os.path.join(folder, file_name)
+
+
+def file_signature(path):
+    """
+    Returns the size and modification time of a file, None if it doesn't
+    exist.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime)
+
+
+def copy_saved_session(saved_session, path, logger, buffer_size=16):
+    """
+    Creates a new version of the session by copying the file it was saved to
+    and pointing the session to the copy, so that the scene doesn't need to be
+    serialized again.
+
+    The copy is only made if the session still points to the saved file and
+    the file hasn't been written to since. Hardlinks are never used, the new
+    version would change along with the original when saved in place.
+
+    :param saved_session: Tuple of the path and signature of the saved file,
+        see file_signature()
+    :param path: Path of the new version
+    :param logger: Logger reporting the copy
+    :param buffer_size: Size in MB of the chunks the file is copied in
+    :returns: True if the new version was created, False if the session needs
+        to be saved instead
+    :raises OSError: If a file already exists at the path of the new version
+    """
+    (saved_path, signature) = saved_session
+    if signature is None:
+        return False
+    if tank.util.ShotgunPath.normalize(_session_path()) != saved_path:
+        return False
+    if file_signature(saved_path) != signature:
+        return False
+
+    (checksum, size, seconds) = stream_copy(
+        saved_path,
+        path,
+        buffer_size,
+        ProgressLog(logger, "Copied to the next version"),
+        hash_name=None,
+        overwrite=False,
+    )
+    try:
+        FBApplication().FBXFileName = path
+    except Exception, e:
+        logger.debug("Could not point the session to the copied file: %s" % (e,))
+        return False
+
+    logger.debug("Versioned up by copying %s to %s (%.1f MB/s)."
+                 % (saved_path, path, throughput(size, seconds)))
+    return True
+
+
+def stream_copy(source, destination, buffer_size, progress_callback=None, hash_name="md5",
+                overwrite=True, content_hasher=None):
+    """
+    Copies a file in large chunks, computing its checksum in the same pass.
+
+    The file is written next to the destination first and renamed once
+    complete, so a failed copy never leaves a truncated file behind.
+
+    :param source: Path of the file to copy
+    :param destination: Path of the copy
+    :param buffer_size: Size in MB of the chunks read and written
+    :param progress_callback: Optional callable taking the number of bytes
+        copied so far and the total size
+    :param hash_name: Name of the hashlib algorithm the checksum is computed
+        with, None to skip computing it
+    :param overwrite: Whether a file already at the destination is replaced
+    :param content_hasher: Optional fbx_file.ContentHasher of the source,
+        fed every chunk copied
+    :returns: Tuple of the hex checksum (None if skipped), the size in bytes
+        and the time the copy took in seconds
+    :raises OSError: If overwrite is False and the destination exists
+    """
+    if not overwrite:
+        _check_not_exists(destination)
+
+    chunk_size = max(1, int(buffer_size * MB))
+    total = os.path.getsize(source)
+    checksum = None
+    if hash_name:
+        checksum = hashlib.new(hash_name)
+    copied = 0
+
+    folder = os.path.dirname(destination)
+    if folder and not os.path.isdir(folder):
+        os.makedirs(folder)
+
+    partial_path = "%s.part" % (destination,)
+    start = time.time()
+    try:
+        src = open(source, "rb")
+        try:
+            dst = open(partial_path, "wb")
+            try:
+                while True:
+                    chunk = src.read(chunk_size)
+                    if not chunk:
+                        break
+                    if checksum is not None:
+                        checksum.update(chunk)
+                    if content_hasher is not None:
+                        content_hasher.update(chunk)
+                    dst.write(chunk)
+                    copied += len(chunk)
+                    if progress_callback:
+                        progress_callback(copied, total)
+            finally:
+                dst.close()
+        finally:
+            src.close()
+
+        if os.path.exists(destination):
+            # the destination may have appeared while copying
+            if not overwrite:
+                _check_not_exists(destination)
+            os.remove(destination)
+        os.rename(partial_path, destination)
+    except:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+
+    if checksum is not None:
+        checksum = checksum.hexdigest()
+    return (checksum, copied, time.time() - start)
+
+
+def throughput(size, seconds):
+    """
+    Returns the throughput of a copy in MB/s.
+    """
+    return size / MB / max(seconds, 1e-6)
+
+
+class ProgressLog(object):
+    """
+    Progress callback logging every tenth of a copy.
+    """
+
+    def __init__(self, logger, message):
+        self._logger = logger
+        self._message = message
+        self._start = time.time()
+        self._next_step = 1
+
+    def __call__(self, copied, total):
+        if not total or copied * 10 < total * self._next_step:
+            return
+        self._next_step = copied * 10 // total + 1
+        self._logger.info(
+            "%s: %d%% (%.1f of %.1f MB, %.1f MB/s)" % (
+                self._message,
+                copied * 100 // total,
+                copied / MB,
+                total / MB,
+                throughput(copied, time.time() - self._start),
+            )
+        )
+
+
+def _check_not_exists(path):
+    """
+    Raises OSError if a file exists at the given path.
+    """
+    if os.path.exists(path):
+        raise OSError(errno.EEXIST, "Refusing to overwrite an existing file", path)
+
+
+def _session_path():
+    """
+    Returns the path of the current session.
+    """
+    path = FBApplication().FBXFileName
+    if isinstance(path, unicode):
+        path = path.encode("utf-8")
+    return path
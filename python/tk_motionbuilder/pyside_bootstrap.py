@@ -0,0 +1,123 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Setup of the PySide distribution bundled with the engine.
+
+Every engine start goes through the PySide setup. The folders added to
+sys.path and PATH are recorded in a process-wide manifest so that they are
+only ever added once, no matter how many times the engine is restarted.
+
+"""
+import os
+import sys
+from timeit import default_timer
+
+from .process_state import get_process_state
+
+
+def get_bootstrap_manifest():
+    """
+    Returns the process-wide record of the PySide setup.
+
+    :returns: Dictionary with keys sys_path and dll_path, listing the folders
+        added to sys.path and PATH, import_times, mapping module names to the
+        time in seconds their first successful import took, and plugin_paths,
+        mapping the Qt plugin folders registered to the time it took
+    """
+    manifest = get_process_state(
+        "pyside_bootstrap",
+        lambda: {"sys_path": [], "dll_path": [], "import_times": {}}
+    )
+    # may have been created by an earlier version of this module
+    manifest.setdefault("plugin_paths", {})
+    return manifest
+
+
+def add_pyside_paths(python_path, dll_path):
+    """
+    Makes a PySide distribution importable by appending its folders to
+    sys.path and PATH, unless they are already listed there.
+
+    :param python_path: Folder holding the PySide python package
+    :param dll_path: Folder holding the Qt and PySide libraries
+    :returns: True if any folder was added
+    """
+    manifest = get_bootstrap_manifest()
+    added = False
+
+    if not _contains(sys.path, python_path):
+        sys.path.append(python_path)
+        manifest["sys_path"].append(python_path)
+        added = True
+
+    env_path = os.environ.get("PATH", "")
+    if not _contains(env_path.split(os.pathsep), dll_path):
+        if env_path:
+            env_path += os.pathsep
+        os.environ["PATH"] = env_path + dll_path
+        manifest["dll_path"].append(dll_path)
+        added = True
+
+    return added
+
+
+def timed_import(module_name):
+    """
+    Imports a module, recording how long its first successful import took.
+
+    :param module_name: Full name of the module, for example "PySide.QtCore"
+    :returns: Tuple of the module and the time the import took, in seconds
+    """
+    start = default_timer()
+    __import__(module_name)
+    elapsed = default_timer() - start
+
+    import_times = get_bootstrap_manifest()["import_times"]
+    if module_name not in import_times:
+        import_times[module_name] = elapsed
+    return (sys.modules[module_name], elapsed)
+
+
+def add_qt_plugin_path(plugin_path):
+    """
+    Adds a folder to the Qt library paths, so the plugins it holds can be
+    loaded. Folders are only added once per process.
+
+    :param plugin_path: Folder holding the Qt plugins
+    :returns: Time the registration took in seconds, or None if the folder
+        had already been added
+    """
+    plugin_paths = get_bootstrap_manifest()["plugin_paths"]
+    if plugin_path in plugin_paths:
+        return None
+
+    from PySide import QtCore
+
+    start = default_timer()
+    QtCore.QCoreApplication.addLibraryPath(plugin_path)
+    elapsed = default_timer() - start
+
+    plugin_paths[plugin_path] = elapsed
+    return elapsed
+
+
+def _contains(paths, path):
+    """
+    Checks if a list of folders holds the given folder, ignoring case and
+    trailing separators where the platform does.
+    """
+    if path in paths:
+        return True
+    path = os.path.normcase(os.path.normpath(path))
+    for entry in paths:
+        if entry and os.path.normcase(os.path.normpath(entry)) == path:
+            return True
+    return False
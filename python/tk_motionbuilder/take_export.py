@@ -0,0 +1,230 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Export of takes to their own FBX files, in parallel worker processes.
+
+The running Motionbuilder can only save one take at a time, and blocks while
+doing so. Takes are exported instead by separate processes, each loading the
+saved scene and saving a single take. The processes are started through an
+exporter backend, which decides what program runs, and at most a fixed
+number of them run at the same time.
+
+"""
+import os
+import sys
+import json
+import time
+import Queue
+import threading
+import subprocess
+
+from . import take_export_worker
+
+# script run by the Motionbuilder worker processes
+WORKER_SCRIPT = os.path.splitext(take_export_worker.__file__)[0] + ".py"
+
+
+class TakeExportJob(object):
+    """
+    A take to export from a saved scene.
+    """
+
+    def __init__(self, source_path, take_name, destination_path, frame_range=None):
+        """
+        :param source_path: Saved scene holding the take
+        :param take_name: Name of the take
+        :param destination_path: FBX file the take is saved to
+        :param frame_range: Optional (first, last) frames of the take, for
+            information only
+        """
+        self.source_path = source_path
+        self.take_name = take_name
+        self.destination_path = destination_path
+        self.frame_range = frame_range
+
+    def to_dict(self):
+        """
+        :returns: Dictionary of the job, as passed to the worker processes
+        """
+        return dict(self.__dict__)
+
+
+class TakeExportResult(object):
+    """
+    Outcome of a take export.
+    """
+
+    def __init__(self, job, seconds, error=None, output=""):
+        """
+        :param job: TakeExportJob exported
+        :param seconds: Time the worker process took, from its start to its exit
+        :param error: Description of the failure, None if the take was exported
+        :param output: Output of the worker process
+        """
+        self.job = job
+        self.seconds = seconds
+        self.error = error
+        self.output = output
+
+    @property
+    def succeeded(self):
+        return self.error is None
+
+
+class ExporterBackend(object):
+    """
+    Decides how the worker process exporting a take is started. Takes are
+    exported by batch Motionbuilder processes running the worker script.
+    Derive from this class to export takes with another program.
+    """
+
+    def __init__(self, executable=None):
+        """
+        :param executable: Motionbuilder executable, defaults to the one
+            running this code
+        """
+        self.executable = executable or sys.executable
+
+    def get_command(self, job):
+        """
+        Returns the command line of the process exporting a take. The process
+        must save the take to the job's destination path and exit with status
+        0 if it succeeded.
+
+        :param job: TakeExportJob to export
+        :returns: List of command line arguments
+        """
+        return [self.executable, "-batch", "-suspendMessages", WORKER_SCRIPT]
+
+    def get_environment(self, job):
+        """
+        Returns the environment of the process exporting a take. The job is
+        passed in the variable the worker script reads it from.
+
+        :param job: TakeExportJob to export
+        :returns: Dictionary of environment variables
+        """
+        environment = dict(os.environ)
+        environment[take_export_worker.JOB_ENV_VAR] = json.dumps(job.to_dict())
+        return environment
+
+
+class TakeExportPool(object):
+    """
+    Runs take exports in worker processes, a bounded number at a time.
+    """
+
+    def __init__(self, backend, max_workers=4, timeout=None):
+        """
+        :param backend: ExporterBackend starting the worker processes
+        :param max_workers: Maximum number of worker processes running at the
+            same time
+        :param timeout: Optional time in seconds after which a worker process
+            is killed and its export reported as failed
+        """
+        self._backend = backend
+        self._max_workers = max(1, max_workers)
+        self._timeout = timeout
+
+    def export(self, jobs, progress_callback=None):
+        """
+        Exports takes, returning once every export is done.
+
+        :param jobs: List of TakeExportJob to export
+        :param progress_callback: Optional callable, passed every
+            TakeExportResult as soon as its export is done. It is called from
+            the calling thread.
+        :returns: List of TakeExportResult, in the order of the jobs
+        """
+        pending = Queue.Queue()
+        for (index, job) in enumerate(jobs):
+            pending.put((index, job))
+        done = Queue.Queue()
+
+        workers = []
+        for worker_index in range(min(self._max_workers, len(jobs))):
+            worker = threading.Thread(target=self._work, args=(pending, done))
+            worker.daemon = True
+            worker.start()
+            workers.append(worker)
+
+        results = [None] * len(jobs)
+        for count in range(len(jobs)):
+            (index, result) = done.get()
+            results[index] = result
+            if progress_callback:
+                progress_callback(result)
+
+        for worker in workers:
+            worker.join()
+        return results
+
+    def _work(self, pending, done):
+        """
+        Exports jobs until there are none left.
+        """
+        while True:
+            try:
+                (index, job) = pending.get_nowait()
+            except Queue.Empty:
+                return
+            try:
+                result = self._run(job)
+            except Exception, e:
+                # never leave export() waiting for a result
+                result = TakeExportResult(job, 0.0, str(e))
+            done.put((index, result))
+
+    def _run(self, job):
+        """
+        Runs the worker process exporting a job.
+        """
+        folder = os.path.dirname(job.destination_path)
+        try:
+            os.makedirs(folder)
+        except OSError:
+            # already exists, possibly created by another worker
+            if not os.path.isdir(folder):
+                raise
+
+        args = self._backend.get_command(job)
+        start = time.time()
+        try:
+            process = subprocess.Popen(
+                args, env=self._backend.get_environment(job),
+                stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        except OSError, e:
+            return TakeExportResult(job, time.time() - start,
+                                    "Could not start %s: %s" % (args[0], e))
+
+        timer = None
+        timed_out = []
+        if self._timeout:
+            def kill():
+                timed_out.append(True)
+                process.kill()
+            timer = threading.Timer(self._timeout, kill)
+            timer.start()
+        try:
+            output = process.communicate()[0]
+        finally:
+            if timer:
+                timer.cancel()
+        seconds = time.time() - start
+
+        error = None
+        if timed_out:
+            error = "Timed out after %d seconds" % (self._timeout,)
+        elif process.returncode != 0:
+            error = "Worker process exited with status %d" % (process.returncode,)
+        elif not os.path.exists(job.destination_path):
+            error = "Worker process did not save %s" % (job.destination_path,)
+        return TakeExportResult(job, seconds, error, output)
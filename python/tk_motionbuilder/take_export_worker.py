@@ -0,0 +1,78 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Script run by a batch Motionbuilder process to export a single take.
+
+The take to export is described by a JSON document in the environment
+variable named by JOB_ENV_VAR, see take_export.TakeExportJob. The process
+exits with status 0 once the take is saved, 1 otherwise.
+
+This file is run as a script in a separate process and must not import
+anything from the engine.
+
+"""
+import os
+import sys
+import json
+import traceback
+
+# environment variable holding the job
+JOB_ENV_VAR = "TK_MOTIONBUILDER_TAKE_EXPORT"
+
+
+def export_take(job):
+    """
+    Opens the source scene and saves the given take to its own file.
+
+    :param job: Dictionary with keys source_path, take_name and
+        destination_path
+    :raises RuntimeError: If the scene can't be opened or saved, or doesn't
+        have the take
+    """
+    from pyfbsdk import FBApplication, FBFbxOptions
+
+    app = FBApplication()
+    if not app.FileOpen(job["source_path"], False):
+        raise RuntimeError("Could not open %s" % (job["source_path"],))
+
+    # only save the requested take
+    options = FBFbxOptions(False)
+    found = False
+    for index in range(options.GetTakeCount()):
+        selected = options.GetTakeName(index) == job["take_name"]
+        options.SetTakeSelect(index, selected)
+        found = found or selected
+    if not found:
+        raise RuntimeError("%s has no take named %s" % (job["source_path"], job["take_name"]))
+
+    if not app.FileSave(job["destination_path"], options):
+        raise RuntimeError("Could not save %s" % (job["destination_path"],))
+
+
+def main():
+    """
+    Exports the take described in the environment and exits the process.
+    """
+    status = 1
+    try:
+        export_take(json.loads(os.environ[JOB_ENV_VAR]))
+        status = 0
+    except Exception:
+        traceback.print_exc()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    # leave right away rather than going back to the batch Motionbuilder
+    # session, reporting whether the export succeeded
+    os._exit(status)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Span tracing of the engine startup and shutdown phases.
+
+Spans are written in the Chrome trace-event format, so a trace can be loaded
+in chrome://tracing or any compatible viewer.
+
+"""
+import os
+import json
+import time
+import thread
+from timeit import default_timer
+
+
+class _Span(object):
+    """
+    Context manager recording a single complete ("X") trace event.
+    """
+
+    def __init__(self, tracer, name, args):
+        self._tracer = tracer
+        self._name = name
+        self._args = args
+        self._start = None
+
+    def __enter__(self):
+        self._start = default_timer()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        end = default_timer()
+        args = self._args
+        if exc_type is not None:
+            args = dict(args, error=str(exc_value))
+        self._tracer.add_event(self._name, self._start, end - self._start, args)
+        # never swallow exceptions
+        return False
+
+
+class _NullSpan(object):
+    """
+    Context manager doing nothing, used when tracing is disabled.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class StartupTracer(object):
+    """
+    Collects timed spans and writes them as a Chrome trace-event file.
+    """
+
+    def __init__(self, trace_folder=None):
+        """
+        :param trace_folder: Folder trace files are written to. Tracing is
+            disabled if this is empty.
+        """
+        self._trace_folder = trace_folder
+        self._events = []
+        self._pid = os.getpid()
+        self._origin = default_timer()
+        self._start_time = time.time()
+        self._file_name = "tk-motionbuilder_%s_%d_%d.json" % (
+            time.strftime("%Y%m%d-%H%M%S", time.localtime(self._start_time)),
+            self._pid,
+            int((self._start_time % 1) * 1000),
+        )
+
+    @property
+    def enabled(self):
+        """
+        True if spans are being recorded.
+        """
+        return bool(self._trace_folder)
+
+    def span(self, name, **args):
+        """
+        Returns a context manager timing the code it wraps.
+
+        :param name: Name of the span
+        :param args: Optional values attached to the span
+        """
+        if not self._trace_folder:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def add_event(self, name, start, duration, args=None):
+        """
+        Records a complete event.
+
+        :param name: Name of the event
+        :param start: Start time, as returned by timeit.default_timer
+        :param duration: Duration in seconds
+        :param args: Optional dictionary of values attached to the event
+        """
+        self._events.append({
+            "name": name,
+            "cat": "tk-motionbuilder",
+            "ph": "X",
+            "ts": (start - self._origin) * 1e6,
+            "dur": duration * 1e6,
+            "pid": self._pid,
+            "tid": thread.get_ident(),
+            "args": args or {},
+        })
+
+    def write(self, metadata=None):
+        """
+        Writes all events recorded so far to the trace file. Calling this
+        again later rewrites the same file with the additional events.
+
+        :param metadata: Optional dictionary stored in the trace, used to
+            compare traces across versions and machines
+        :returns: Path to the trace file, or None if tracing is disabled
+        """
+        if not self._trace_folder:
+            return None
+
+        if not os.path.exists(self._trace_folder):
+            os.makedirs(self._trace_folder)
+
+        other_data = {"start_time": self._start_time}
+        other_data.update(metadata or {})
+
+        path = os.path.join(self._trace_folder, self._file_name)
+        fh = open(path, "w")
+        try:
+            json.dump(
+                {
+                    "traceEvents": self._events,
+                    "displayTimeUnit": "ms",
+                    "otherData": other_data,
+                },
+                fh
+            )
+        finally:
+            fh.close()
+        return path